@@ -8,6 +8,11 @@ import os
 # 将项目根目录添加到Python路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# 无服务器函数不能长时间保持连接，也不应启动后台线程：
+# 首页改为请求一次 /update_time 后在浏览器本地走时
+os.environ.setdefault('EVENTS_ENABLED', '0')
+os.environ.setdefault('BACKGROUND_TASKS', '0')
+
 # 导入应用
 from web_app import app, create_app
 
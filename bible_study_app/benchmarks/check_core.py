@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+"""
+Behaviour checks for core library paths the benchmarks only time.
+
+Like run_benchmarks.py, everything runs offline: before any app module is
+imported, the data directory is pointed at a temporary directory
+(BIBLE_STUDY_DATA_DIR) and getbible.net at a local fake server (GETBIBLE_URL,
+see fake_getbible.py). Each check prints PASS or FAIL; the run exits with
+status 1 if any check failed.
+
+Usage:
+    python benchmarks/check_core.py
+    python benchmarks/check_core.py --filter search
+"""
+
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+import traceback
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+
+from fake_getbible import FakeGetBible
+
+# (name, function) in run order; each function raises CheckFailed on a mismatch
+CHECKS = []
+
+
+class CheckFailed(Exception):
+    """Raised when a check sees something other than what it expected."""
+
+
+def check(func):
+    """Register a check."""
+    CHECKS.append((func.__name__, func))
+    return func
+
+
+def expect(condition, message):
+    """Fail the current check unless condition holds."""
+    if not condition:
+        raise CheckFailed(message)
+
+
+@check
+def search_round_trip():
+    """Indexed passages come back from search, including after many varint gaps."""
+    from bible_api import cache_verse, search_verses
+    from bible_data import advance_verse, make_verse_id
+    from search_index import SearchIndex
+
+    index = SearchIndex()
+    # Enough documents that doc ID gaps need more than one varint byte
+    first = make_verse_id('诗篇', 119, 1)
+    for offset in range(300):
+        verse_id = advance_verse(first, offset)
+        index.add(verse_id, verse_id, f"第{offset + 1}节 耶和华的律法全备")
+    expect(index.add(first, first, "重复的经文") is False, "an indexed range was added twice")
+    index.add(make_verse_id('约翰福音', 11, 35), make_verse_id('约翰福音', 11, 35), "耶稣哭了。")
+
+    results = index.search("耶稣哭了", limit=5)
+    expect(results and results[0][:2] == (make_verse_id('约翰福音', 11, 35),) * 2,
+           f"exact text did not rank first: {results}")
+    expect(len(index.search("耶和华的律法", limit=500)) == 300, "not every indexed passage was found")
+    expect(index.search("没有这样的经文内容") == [], "unrelated text matched")
+
+    # Through bible_api: a newly cached verse is searchable straight away
+    cache_verse('俄巴底亚书_1_21', "必有拯救者上到锡安山审判以扫山，国度就归耶和华了。")
+    references = [result['reference'] for result in search_verses("审判以扫山")]
+    expect('俄巴底亚书 1:21' in references, f"cached verse not found by search: {references}")
+
+
+@check
+def transaction_rollback():
+    """A transaction that fails validation leaves memory and storage as they were."""
+    import datetime
+    from study_plan import StudyPlan
+
+    plan = StudyPlan('check-transaction')
+    plan.add_reading_passage('创世记', 1)
+    before = (list(plan.reading_passages), list(plan.memorization_verses), plan.daily_schedule)
+    generation = plan.store.generation()
+
+    try:
+        with plan.transaction():
+            plan.add_reading_passage('出埃及记', 2)
+            plan.add_memorization_verse('罗马书', 8, 28)
+            # Validated only when the outermost block exits
+            plan.set_daily_schedule([[{'book': '创世记', 'chapter': 51}]], datetime.date.today())
+    except ValueError:
+        pass
+    else:
+        raise CheckFailed("an invalid schedule passed validation")
+
+    after = (plan.reading_passages, plan.memorization_verses, plan.daily_schedule)
+    expect(after == before, f"memory not rolled back: {after}")
+    expect(not plan.dirty, "rolled-back plan is marked dirty")
+    expect(plan.store.generation() == generation, "a failed transaction wrote to storage")
+    expect(not plan.add_reading_passage('创世记', 1), "passage index not rebuilt after rollback")
+    expect(plan.add_reading_passage('出埃及记', 2), "rolled-back passage still counted as present")
+    expect(StudyPlan('check-transaction').reading_passages == plan.reading_passages,
+           "stored plan differs from memory after the next change")
+
+
+@check
+def split_fewer_chapters_than_days():
+    """Short books are spread over more days than chapters by cutting between verses."""
+    from bible_data import BIBLE_BOOKS, get_verse_count
+    from plan_generator import generate_schedule, split_balanced
+
+    try:
+        split_balanced([3, 2], 3)
+    except ValueError:
+        pass
+    else:
+        raise CheckFailed("split_balanced accepted fewer items than days")
+    bounds = split_balanced([100, 1, 1, 1], 3)
+    expect(bounds == [(0, 1), (1, 2), (2, 4)], f"a day was left empty: {bounds}")
+
+    book = '腓立比书'
+    days = 30
+    schedule = generate_schedule(days=days, books=[book])
+    expect(len(schedule) == days and all(schedule), "not every day got a passage")
+    read = []
+    for day in schedule:
+        for passage in day:
+            expect(passage['book'] == book, f"passage outside the selection: {passage}")
+            chapter = passage['chapter']
+            first = passage.get('verse_start', 1)
+            last = passage.get('verse_end') or (
+                first if 'verse_start' in passage else get_verse_count(book, chapter))
+            read.extend((chapter, verse) for verse in range(first, last + 1))
+    expected = [
+        (chapter, verse)
+        for chapter in range(1, BIBLE_BOOKS[book] + 1)
+        for verse in range(1, get_verse_count(book, chapter) + 1)
+    ]
+    expect(read == expected, "the schedule skips, repeats or reorders verses")
+
+    try:
+        generate_schedule(days=len(expected) + 1, books=[book])
+    except ValueError:
+        pass
+    else:
+        raise CheckFailed("more days than verses were accepted")
+
+
+def _create_users(prefix, threads=2, per_thread=25):
+    """Create users from several threads of one process; run in a worker process."""
+    import threading
+    from user_store import UserStore
+
+    store = UserStore()
+    created = []
+
+    def run(thread):
+        for i in range(per_thread):
+            user = store.create(f'{prefix}-{thread}-{i}', 'hash')
+            created.append((user.username, user.id))
+        try:
+            user = store.create('shared-name', 'hash')
+            created.append((user.username, user.id))
+        except ValueError:
+            pass
+
+    workers = [threading.Thread(target=run, args=(thread,)) for thread in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return created
+
+
+@check
+def concurrent_user_create():
+    """Users created at once from several processes and threads get distinct ids."""
+    from multiprocessing import Pool
+    from user_store import UserStore
+
+    processes = 4
+    with Pool(processes) as pool:
+        created = [pair for batch in pool.map(_create_users, [f'p{n}' for n in range(processes)])
+                   for pair in batch]
+
+    ids = [user_id for _, user_id in created]
+    expect(len(set(ids)) == len(ids), f"{len(ids) - len(set(ids))} id(s) handed out twice")
+    shared = [user_id for username, user_id in created if username == 'shared-name']
+    expect(len(shared) == 1, f"'shared-name' was created {len(shared)} times")
+
+    store = UserStore()
+    for username, user_id in created:
+        user = store.find_by_username(username)
+        expect(user is not None and user.id == user_id, f"{username} is not stored under {user_id}")
+    expect(len(store) == len(created), f"{len(store)} users stored, {len(created)} created")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check core Bible Study App behaviour")
+    parser.add_argument('--filter', help="only run checks whose name matches this regex")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='check-data-')
+    fake = FakeGetBible()
+    os.environ['BIBLE_STUDY_DATA_DIR'] = data_dir
+    os.environ['GETBIBLE_URL'] = fake.start()
+    pattern = re.compile(args.filter) if args.filter else None
+
+    failures = 0
+    try:
+        for name, func in CHECKS:
+            if pattern is not None and not pattern.search(name):
+                continue
+            try:
+                func()
+            except CheckFailed as e:
+                failures += 1
+                print(f"FAIL {name}: {e}")
+            except Exception:
+                failures += 1
+                print(f"FAIL {name}: unexpected error")
+                traceback.print_exc()
+            else:
+                print(f"PASS {name}")
+    finally:
+        fake.stop()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    if failures:
+        print(f"\n{failures} check(s) failed")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+"""
+Local stand-in for the getbible.net passage API.
+
+Answers ``/json?passage=<book> <chapter>&version=cns`` for every chapter with
+generated verse text, in the JSONP shape bible_api.parse_passage reads, so
+benchmarks and load tests run without network access. Latency, a random
+error rate and outage windows can be configured to see how the app behaves
+when the real service is slow or down.
+
+Run on its own (e.g. for a gunicorn started by hand):
+    python benchmarks/fake_getbible.py --port 8089 --latency 0.2 --error-rate 0.05 --outage 60:120
+    GETBIBLE_URL=http://127.0.0.1:8089/json gunicorn 'web_app:create_app()'
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bible_data import BIBLE_BOOKS, get_verse_count
+
+
+def chapter_body(book, chapter):
+    """
+    Generated getbible.net response for one chapter.
+
+    Returns:
+        str: JSONP body, or None if the book or chapter does not exist
+    """
+    if book not in BIBLE_BOOKS or not 1 <= chapter <= BIBLE_BOOKS[book]:
+        return None
+    verses = {
+        str(verse): {
+            'verse_nr': verse,
+            'verse': f"{book}{chapter}章{verse}节：" + "神爱世人，" * (4 + (chapter + verse) % 5)
+        }
+        for verse in range(1, get_verse_count(book, chapter) + 1)
+    }
+    return '(' + json.dumps({'chapter': verses, 'book_name': book, 'chapter_nr': chapter},
+                            ensure_ascii=False) + ');'
+
+
+class FakeGetBible:
+    """getbible.net stand-in served from a background thread."""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, outages=(), seed=None):
+        """
+        Args:
+            host (str): Address to listen on
+            port (int): Port to listen on; 0 picks a free one
+            latency (float): Seconds added to every response
+            jitter (float): Up to this many extra random seconds per response
+            error_rate (float): Fraction of requests answered with HTTP 500
+            outages (list): (start, end) seconds after start() during which
+                every request gets HTTP 503
+            seed (int, optional): Random seed for reproducible runs
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.outages = list(outages)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._started = None
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def url(self):
+        """Base URL to use as GETBIBLE_URL."""
+        return f"http://{self.host}:{self.port}/json"
+
+    def reset_clock(self):
+        """Measure outage windows from now, e.g. from the start of a load test."""
+        self._started = time.monotonic()
+
+    def in_outage(self):
+        """Whether the server is inside one of its outage windows."""
+        elapsed = time.monotonic() - self._started
+        return any(start <= elapsed < end for start, end in self.outages)
+
+    def _respond(self, query):
+        """
+        Decide a response for one request.
+
+        Returns:
+            tuple: (status, body)
+        """
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+            failed = self.error_rate and self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if self.in_outage():
+            status, body = 503, 'Service Unavailable'
+        elif failed:
+            status, body = 500, 'Internal Server Error'
+        else:
+            book, _, chapter = parse_qs(query).get('passage', [''])[0].rpartition(' ')
+            body = chapter_body(book, int(chapter)) if chapter.isdigit() else None
+            # getbible.net answers unknown passages with NULL
+            status, body = (200, body) if body else (404, 'NULL')
+        if status >= 500:
+            with self._lock:
+                self.errors += 1
+        return status, body
+
+    def start(self):
+        """
+        Start serving in a daemon thread.
+
+        Returns:
+            str: The base URL
+        """
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are separate writes; with Nagle's algorithm on,
+            # kept-alive connections would wait ~40ms for the client's delayed ACK
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                status, body = fake._respond(urlsplit(self.path).query)
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/javascript; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._started = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name='fake-getbible', daemon=True
+        )
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        """Stop the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def stats(self):
+        """
+        Get request counters.
+
+        Returns:
+            dict: Requests served and 5xx answers given
+        """
+        with self._lock:
+            return {'requests': self.requests, 'errors': self.errors}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def parse_outage(text):
+    """Parse an outage window given as "start:end" seconds."""
+    start, _, end = text.partition(':')
+    return float(start), float(end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake getbible.net server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds per response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra random seconds per response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of HTTP 500 answers")
+    parser.add_argument('--outage', type=parse_outage, action='append', default=[],
+                        help="start:end seconds after startup to answer HTTP 503 (repeatable)")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    fake = FakeGetBible(args.host, args.port, args.latency, args.jitter,
+                        args.error_rate, args.outage, args.seed)
+    print(f"Serving fake getbible.net at {fake.start()}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+"""
+End-to-end load test for web_app.
+
+Starts the app (gunicorn, or the threaded werkzeug server where gunicorn is
+not installed) against a temporary data directory and a local fake
+getbible.net (see fake_getbible.py), seeds an admin session, a reader
+account and a study plan whose verses must come from upstream, then drives
+a weighted mix of requests from concurrent simulated users. Throughput and
+p50/p95/p99 latency are reported per route, and can be saved as JSON to
+compare the same scenario before and after a change.
+
+Usage:
+    python benchmarks/load_test.py --scenario mixed --users 20 --duration 60
+    python benchmarks/load_test.py --scenario browse --workers 4 --threads 16 --output before.json
+    python benchmarks/load_test.py --latency 0.3 --error-rate 0.1 --outage 20:40
+    python benchmarks/load_test.py --url http://127.0.0.1:5000   # an app that is already running
+"""
+
+import argparse
+import importlib.util
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+
+from bible_data import ALL_BOOKS, BIBLE_BOOKS
+from fake_getbible import FakeGetBible, parse_outage
+
+ADMIN = ('admin', 'admin')
+READER = ('reader', 'reader-password')
+
+# Verses nothing local answers, so the index page needs the upstream for them
+SEED_VERSES = [
+    ('创世记', 1, 1), ('出埃及记', 3, 14), ('约书亚记', 1, 9), ('撒母耳记上', 16, 7),
+    ('以弗所书', 2, 8), ('歌罗西书', 3, 23), ('提摩太后书', 3, 16),
+]
+
+# Weight of each operation per scenario
+SCENARIOS = {
+    'browse': {'index': 60, 'update_time': 25, 'chapters': 15},
+    'mixed': {'index': 45, 'update_time': 20, 'chapters': 15, 'login': 10, 'admin_write': 10},
+    'login': {'login': 80, 'index': 20},
+    'admin': {'admin_write': 70, 'index': 30},
+}
+
+
+def free_port():
+    """Pick an unused local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, port, env):
+    """
+    Start the app in a subprocess.
+
+    Returns:
+        subprocess.Popen: The server process
+    """
+    if args.server == 'gunicorn':
+        command = [
+            sys.executable, '-m', 'gunicorn',
+            '--workers', str(args.workers), '--worker-class', 'gthread', '--threads', str(args.threads),
+            '--bind', f'127.0.0.1:{port}', '--log-level', 'warning',
+            'web_app:create_app()'
+        ]
+    else:
+        command = [
+            sys.executable, '-c',
+            f"import web_app; web_app.create_app().run(host='127.0.0.1', port={port}, threaded=True)"
+        ]
+    return subprocess.Popen(
+        command, cwd=APP_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL
+    )
+
+
+def wait_ready(base_url, timeout=60):
+    """Wait until the app answers."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'{base_url}/update_time', timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"App at {base_url} did not start within {timeout} seconds")
+
+
+def login(session, base_url, username, password):
+    """Log a session in; returns the response."""
+    return session.post(
+        f'{base_url}/login', data={'username': username, 'password': password},
+        allow_redirects=False, timeout=30
+    )
+
+
+def seed(base_url):
+    """
+    Prepare accounts and the shared study plan.
+
+    Returns:
+        requests.Session: A logged-in admin session
+    """
+    admin = requests.Session()
+    if login(admin, base_url, *ADMIN).status_code != 302:
+        raise RuntimeError("Could not log in as the default admin")
+    admin.post(f'{base_url}/register', data={'username': READER[0], 'password': READER[1]}, timeout=30)
+    for book, chapter, verse in SEED_VERSES:
+        admin.post(f'{base_url}/api/add_memorization', data={
+            'book': book, 'chapter': chapter, 'verse_start': verse
+        }, timeout=30)
+    # Drop the default verse, which is answered locally
+    admin.post(f'{base_url}/api/remove_memorization/0', timeout=30)
+    return admin
+
+
+class LoadTest:
+    """Closed-loop simulated users issuing a weighted mix of requests."""
+
+    def __init__(self, base_url, mix, users, duration, warmup=0, think=0.0, seed=None):
+        """
+        Args:
+            base_url (str): App URL
+            mix (dict): Operation name to weight
+            users (int): Concurrent simulated users
+            duration (float): Seconds of measured load
+            warmup (float): Seconds of load before measuring
+            think (float): Mean seconds a user waits between requests
+            seed (int, optional): Random seed
+        """
+        self.base_url = base_url
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.users = users
+        self.duration = duration
+        self.warmup = warmup
+        self.think = think
+        self.seed = seed
+        self._lock = threading.Lock()
+        # route -> [(latency seconds, status or None for a connection error)]
+        self.samples = defaultdict(list)
+        self.measure_from = None
+
+    def _record(self, route, started, status):
+        latency = time.monotonic() - started
+        if started >= self.measure_from:
+            with self._lock:
+                self.samples[route].append((latency, status))
+
+    def _request(self, session, method, route, path, **kwargs):
+        started = time.monotonic()
+        try:
+            response = session.request(method, self.base_url + path, timeout=30,
+                                       allow_redirects=False, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            status = None
+        self._record(f'{method} {route}', started, status)
+
+    def _operation(self, name, rng, visitor, admin):
+        if name == 'index':
+            self._request(visitor, 'GET', '/', '/')
+        elif name == 'update_time':
+            self._request(visitor, 'GET', '/update_time', '/update_time')
+        elif name == 'chapters':
+            book = rng.choice(ALL_BOOKS)
+            self._request(visitor, 'GET', '/api/chapters/<book>', f'/api/chapters/{book}')
+        elif name == 'login':
+            # A fresh session each time, as for a new visitor
+            with requests.Session() as session:
+                self._request(session, 'POST', '/login', '/login',
+                              data={'username': READER[0], 'password': READER[1]})
+        elif name == 'admin_write':
+            write = rng.random()
+            if write < 0.4:
+                book = rng.choice(ALL_BOOKS)
+                self._request(admin, 'POST', '/api/add_reading', '/api/add_reading',
+                              data={'book': book, 'chapter': rng.randint(1, BIBLE_BOOKS[book])})
+            elif write < 0.7:
+                self._request(admin, 'POST', '/api/remove_reading/<index>', '/api/remove_reading/0')
+            else:
+                self._request(admin, 'POST', '/api/update_verse_text', '/api/update_verse_text',
+                              data={'index': 0, 'custom_text': f'负载测试 {rng.random():.6f}'})
+
+    def _user(self, number, deadline):
+        rng = random.Random(None if self.seed is None else self.seed + number)
+        with requests.Session() as visitor, requests.Session() as admin:
+            if 'admin_write' in self.operations:
+                login(admin, self.base_url, *ADMIN)
+            while time.monotonic() < deadline:
+                name = rng.choices(self.operations, self.weights)[0]
+                self._operation(name, rng, visitor, admin)
+                if self.think:
+                    time.sleep(rng.expovariate(1 / self.think))
+
+    def run(self):
+        """Run the load and return the report."""
+        started = time.monotonic()
+        self.measure_from = started + self.warmup
+        deadline = self.measure_from + self.duration
+        threads = [
+            threading.Thread(target=self._user, args=(number, deadline), daemon=True)
+            for number in range(self.users)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.report(time.monotonic() - self.measure_from)
+
+    def report(self, elapsed):
+        """
+        Summarize the samples.
+
+        Returns:
+            dict: Per-route and overall throughput, latency percentiles and status counts
+        """
+        routes = {route: summarize(samples, elapsed) for route, samples in sorted(self.samples.items())}
+        everything = [sample for samples in self.samples.values() for sample in samples]
+        return {'elapsed': round(elapsed, 2), 'routes': routes, 'total': summarize(everything, elapsed)}
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def summarize(samples, elapsed):
+    """Throughput, latency percentiles (ms) and status counts for one route."""
+    latencies = sorted(latency * 1000 for latency, _ in samples)
+    statuses = Counter('error' if status is None else str(status) for _, status in samples)
+    return {
+        'requests': len(samples),
+        'rps': round(len(samples) / elapsed, 2) if elapsed else 0,
+        'p50_ms': round(percentile(latencies, 50), 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 2) if latencies else None,
+        'max_ms': round(latencies[-1], 2) if latencies else None,
+        'errors': sum(1 for _, status in samples if status is None or status >= 500),
+        'statuses': dict(sorted(statuses.items())),
+    }
+
+
+def print_report(report):
+    columns = f"{'route':32} {'requests':>8} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}  statuses"
+    print(columns)
+    print('-' * len(columns))
+    for route, row in list(report['routes'].items()) + [('TOTAL', report['total'])]:
+        def ms(value):
+            return f"{value:8.1f}" if value is not None else f"{'-':>8}"
+        statuses = ' '.join(f'{status}:{count}' for status, count in row['statuses'].items())
+        print(f"{route:32} {row['requests']:8d} {row['rps']:8.1f} {ms(row['p50_ms'])} "
+              f"{ms(row['p95_ms'])} {ms(row['p99_ms'])} {row['errors']:6d}  {statuses}")
+
+
+def main():
+    default_server = 'gunicorn' if importlib.util.find_spec('gunicorn') else 'werkzeug'
+
+    parser = argparse.ArgumentParser(description="Load-test the Bible Study web app")
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='mixed')
+    parser.add_argument('--users', type=int, default=20, help="concurrent simulated users")
+    parser.add_argument('--duration', type=float, default=30, help="seconds of measured load")
+    parser.add_argument('--warmup', type=float, default=5, help="seconds of load before measuring")
+    parser.add_argument('--think', type=float, default=0.0, help="mean seconds between a user's requests")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--url', help="test an app that is already running instead of starting one")
+    parser.add_argument('--server', choices=['gunicorn', 'werkzeug'], default=default_server)
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn workers")
+    parser.add_argument('--threads', type=int, default=8, help="threads per gunicorn worker")
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--latency', type=float, default=0.05, help="fake upstream seconds per response")
+    parser.add_argument('--jitter', type=float, default=0.05, help="fake upstream extra random seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fake upstream fraction of HTTP 500")
+    parser.add_argument('--outage', type=parse_outage, action='append', default=[],
+                        help="start:end seconds after the load starts with the upstream down (repeatable)")
+    parser.add_argument('--login-limits', action='store_true',
+                        help="keep the production login throttling (all simulated users share one IP)")
+    parser.add_argument('--output', help="write the report to this JSON file")
+    parser.add_argument('--verbose', action='store_true', help="show the server's log")
+    args = parser.parse_args()
+
+    fake = None
+    server = None
+    data_dir = None
+    base_url = args.url.rstrip('/') if args.url else None
+    try:
+        if base_url is None:
+            fake = FakeGetBible(latency=args.latency, jitter=args.jitter,
+                                error_rate=args.error_rate, outages=args.outage, seed=args.seed)
+            data_dir = tempfile.mkdtemp(prefix='loadtest-')
+            env = dict(
+                os.environ,
+                BIBLE_STUDY_DATA_DIR=data_dir,
+                BIBLE_STUDY_STORAGE=args.storage,
+                GETBIBLE_URL=fake.start(),
+                SECRET_KEY='load-test',
+                # As a long-running deployment would
+                BACKGROUND_TASKS='1',
+            )
+            if not args.login_limits:
+                for name in ('LOGIN_RATE_PER_IP', 'LOGIN_BURST_PER_IP',
+                             'LOGIN_RATE_PER_USER', 'LOGIN_BURST_PER_USER'):
+                    env[name] = '1000000'
+            port = free_port()
+            base_url = f'http://127.0.0.1:{port}'
+            print(f"Starting {args.server} on {base_url} with data in {data_dir}")
+            server = start_server(args, port, env)
+            wait_ready(base_url)
+
+        seed(base_url).close()
+        if fake is not None:
+            fake.reset_clock()
+
+        mix = SCENARIOS[args.scenario]
+        print(f"Scenario {args.scenario}: {mix}, {args.users} users, "
+              f"{args.warmup:g}s warm-up + {args.duration:g}s measured")
+        report = LoadTest(base_url, mix, args.users, args.duration, args.warmup,
+                          args.think, args.seed).run()
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        if fake is not None:
+            fake.stop()
+        if data_dir is not None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    report['scenario'] = args.scenario
+    report['config'] = {
+        key: getattr(args, key) for key in (
+            'users', 'duration', 'warmup', 'think', 'server', 'workers', 'threads', 'storage',
+            'latency', 'jitter', 'error_rate', 'outage', 'url'
+        )
+    }
+    if fake is not None:
+        report['upstream'] = fake.stats()
+    print_report(report)
+    if fake is not None:
+        print(f"Fake upstream: {report['upstream']['requests']} requests, "
+              f"{report['upstream']['errors']} answered with 5xx")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
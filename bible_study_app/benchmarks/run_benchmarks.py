@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+"""
+Micro-benchmarks for the core library paths.
+
+Everything runs offline: before any app module is imported, the data
+directory is pointed at a temporary directory (BIBLE_STUDY_DATA_DIR) and
+getbible.net at a local fake server (GETBIBLE_URL, see fake_getbible.py).
+
+Results are written as JSON and compared with a stored baseline; any
+benchmark slower than the baseline by more than the tolerance is reported
+and the run exits with status 1. Baselines are machine-specific, so record
+one on the machine that runs the comparison; baseline.json is git-ignored
+and never committed.
+
+Usage:
+    python benchmarks/run_benchmarks.py --save-baseline     # record benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py                     # run and compare with it
+    python benchmarks/run_benchmarks.py --filter save_cache --output results.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+
+from fake_getbible import FakeGetBible
+
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+
+# (name, function) in run order; each function returns {benchmark name: timing}
+BENCHMARKS = []
+
+
+def benchmark(func):
+    """Register a benchmark group."""
+    BENCHMARKS.append((func.__name__, func))
+    return func
+
+
+def measure(func, number=1, repeat=7, setup=None):
+    """
+    Time a function.
+
+    Args:
+        func (callable): Operation to time, called without arguments
+        number (int): Calls per round
+        repeat (int): Rounds
+        setup (callable, optional): Run before each round, outside the timing
+
+    Returns:
+        dict: Microseconds per call (median and best round) and the round sizes
+    """
+    rounds = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - start) / number * 1e6)
+    return {
+        'median_us': round(statistics.median(rounds), 3),
+        'min_us': round(min(rounds), 3),
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+@benchmark
+def get_verse():
+    import bible_api
+    from bible_data import ALL_BOOKS, BIBLE_BOOKS
+
+    results = {}
+
+    # Chapters nothing local answers, so each lookup goes to the fake server
+    local_chapters = {tuple(key.split('_')[:2]) for key in bible_api.LOCAL_VERSES}
+    chapters = iter([
+        (book, chapter)
+        for book in ALL_BOOKS
+        for chapter in range(1, BIBLE_BOOKS[book] + 1)
+        if (book, str(chapter)) not in local_chapters
+    ])
+    results['get_verse.miss'] = measure(
+        lambda: bible_api.get_verse(*next(chapters), 1), number=40, repeat=5
+    )
+
+    # Fetched above, so now answered from the cache
+    bible_api.get_verse('创世记', 1, 1)
+    results['get_verse.cache_hit'] = measure(
+        lambda: bible_api.get_verse('创世记', 1, 1), number=5000
+    )
+    results['get_verse.cache_hit_range'] = measure(
+        lambda: bible_api.get_verse('创世记', 1, 1, 5), number=2000
+    )
+
+    results['get_verse.local_hit'] = measure(
+        lambda: bible_api.get_verse('约翰福音', 3, 16), number=5000
+    )
+    return results
+
+
+@benchmark
+def cold_import():
+    """Import bible_api in a fresh interpreter with an empty data directory."""
+    code = (
+        "import time; started = time.perf_counter(); import bible_api; "
+        "print((time.perf_counter() - started) * 1e6)"
+    )
+    rounds = []
+    for _ in range(5):
+        data_dir = tempfile.mkdtemp(prefix='bench-cold-')
+        env = dict(os.environ, BIBLE_STUDY_DATA_DIR=data_dir)
+        try:
+            output = subprocess.run(
+                [sys.executable, '-c', code], cwd=APP_DIR, env=env,
+                capture_output=True, text=True, check=True
+            ).stdout
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+        rounds.append(float(output.strip().splitlines()[-1]))
+    return {'get_verse.cold_import': {
+        'median_us': round(statistics.median(rounds), 3),
+        'min_us': round(min(rounds), 3),
+        'number': 1,
+        'repeat': len(rounds),
+    }}
+
+
+@benchmark
+def save_cache():
+    import bible_api
+    from cache_journal import JournalStore
+
+    results = {}
+    for size in (1000, 10000, 100000):
+        entries = [
+            (f"创世记_{i // 100 + 1}_{i % 100 + 1}", f"第 {i} 节经文。" * 4)
+            for i in range(size)
+        ]
+
+        def fill():
+            # Start each round from an empty table holding `size` unsaved entries
+            store = getattr(bible_api.cache_table, 'journal', None)
+            if isinstance(store, JournalStore):
+                for path in [store.snapshot_path, store.journal_path]:
+                    if os.path.exists(path):
+                        os.remove(path)
+            bible_api.cache_table.put_many(entries)
+
+        results[f'save_cache.{size}'] = measure(
+            bible_api.save_cache, repeat=3 if size >= 100000 else 5, setup=fill
+        )
+    return results
+
+
+@benchmark
+def study_plan():
+    from bible_data import ALL_BOOKS, BIBLE_BOOKS
+    from study_plan import StudyPlan
+
+    chapters = [
+        (book, chapter)
+        for book in ALL_BOOKS
+        for chapter in range(1, BIBLE_BOOKS[book] + 1)
+    ]
+    results = {}
+    for size in (10, 100, 1000):
+        number = 20
+        plan = StudyPlan(scope=f'bench{size}')
+        # Replace the default plan with `size` passages and verses in one save
+        with plan.transaction():
+            while plan.reading_passages:
+                plan.remove_reading_passage(len(plan.reading_passages) - 1)
+            while plan.memorization_verses:
+                plan.remove_memorization_verse(len(plan.memorization_verses) - 1)
+            for book, chapter in chapters[:size]:
+                plan.add_reading_passage(book, chapter)
+                plan.add_memorization_verse(book, chapter, 1)
+        spare = chapters[size:size + number]
+
+        def trim():
+            while len(plan.reading_passages) > size:
+                plan.remove_reading_passage(len(plan.reading_passages) - 1)
+
+        def top_up():
+            for book, chapter in spare:
+                plan.add_reading_passage(book, chapter)
+
+        def add_reading():
+            book, chapter = spare[len(plan.reading_passages) - size]
+            plan.add_reading_passage(book, chapter)
+
+        def trim_verses():
+            while len(plan.memorization_verses) > size:
+                plan.remove_memorization_verse(len(plan.memorization_verses) - 1)
+
+        def top_up_verses():
+            for book, chapter in spare:
+                plan.add_memorization_verse(book, chapter, 1)
+
+        results[f'study_plan.add_reading_passage.{size}'] = measure(
+            add_reading, number=number, setup=trim
+        )
+        results[f'study_plan.remove_reading_passage.{size}'] = measure(
+            lambda: plan.remove_reading_passage(len(plan.reading_passages) - 1),
+            number=number, setup=top_up
+        )
+        trim()
+        results[f'study_plan.add_memorization_verse.{size}'] = measure(
+            lambda: plan.add_memorization_verse('诗篇', 23, 1), number=number, setup=trim_verses
+        )
+        results[f'study_plan.remove_memorization_verse.{size}'] = measure(
+            lambda: plan.remove_memorization_verse(len(plan.memorization_verses) - 1),
+            number=number, setup=top_up_verses
+        )
+        trim_verses()
+        results[f'study_plan.update_verse_text.{size}'] = measure(
+            lambda: plan.update_verse_text(size // 2, "自定义经文"), number=number
+        )
+    return results
+
+
+@benchmark
+def bible_data_lookups():
+    import bible_data
+    from bible_reference import parse_reference
+
+    verse_id = bible_data.make_verse_id('约翰福音', 3, 16)
+    ordinal = bible_data.verse_ordinal('约翰福音', 3, 16)
+    number = 20000
+    return {
+        'bible_data.get_book_chapters': measure(
+            lambda: bible_data.get_book_chapters('约翰福音'), number=number
+        ),
+        'bible_data.get_verse_count': measure(
+            lambda: bible_data.get_verse_count('诗篇', 119), number=number
+        ),
+        'bible_data.format_reference': measure(
+            lambda: bible_data.format_reference('约翰福音', 3, 16, 18), number=number
+        ),
+        'bible_data.make_verse_id': measure(
+            lambda: bible_data.make_verse_id('约翰福音', 3, 16), number=number
+        ),
+        'bible_data.split_verse_id': measure(
+            lambda: bible_data.split_verse_id(verse_id), number=number
+        ),
+        'bible_data.verse_ordinal': measure(
+            lambda: bible_data.verse_ordinal('约翰福音', 3, 16), number=number
+        ),
+        'bible_data.verse_from_ordinal': measure(
+            lambda: bible_data.verse_from_ordinal(ordinal), number=number
+        ),
+        'bible_reference.parse_reference': measure(
+            lambda: parse_reference('约翰福音 3:16-18'), number=number
+        ),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results with a baseline.
+
+    The best round is compared, as it is the least affected by other load
+    on the machine.
+
+    Args:
+        results (dict): Benchmark name to timing
+        baseline (dict): Benchmark name to timing from an earlier run
+        tolerance (float): Allowed slowdown, e.g. 0.25 for 25%
+
+    Returns:
+        list: (name, baseline us, current us, ratio) for every regression
+    """
+    regressions = []
+    for name, timing in sorted(results.items()):
+        before = baseline.get(name)
+        if before is None:
+            print(f"  {name}: new benchmark, no baseline")
+            continue
+        ratio = timing['min_us'] / before['min_us'] if before['min_us'] else 1.0
+        flag = 'REGRESSION' if ratio > 1 + tolerance else ''
+        print(f"  {name}: {before['min_us']:.2f} -> {timing['min_us']:.2f} us ({ratio:.2f}x) {flag}")
+        if flag:
+            regressions.append((name, before['min_us'], timing['min_us'], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Bible Study App micro-benchmarks")
+    parser.add_argument('--filter', help="only run benchmark groups whose name matches this regex")
+    parser.add_argument('--output', help="write results to this JSON file")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="baseline JSON file")
+    parser.add_argument('--save-baseline', action='store_true', help="store the results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed slowdown before a benchmark counts as a regression")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='bench-data-')
+    fake = FakeGetBible()
+    os.environ['BIBLE_STUDY_DATA_DIR'] = data_dir
+    os.environ['GETBIBLE_URL'] = fake.start()
+    pattern = re.compile(args.filter) if args.filter else None
+
+    results = {}
+    try:
+        for group, func in BENCHMARKS:
+            if pattern is not None and not pattern.search(group):
+                continue
+            print(f"Running {group}...")
+            for name, timing in func().items():
+                results[name] = timing
+                print(f"  {name}: {timing['median_us']:.1f} us")
+    finally:
+        fake.stop()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    print(f"Comparing with {args.baseline} (tolerance {args.tolerance:.0%})")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed:")
+        for name, before, after, ratio in regressions:
+            print(f"  {name}: {before:.2f} -> {after:.2f} us ({ratio:.2f}x)")
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
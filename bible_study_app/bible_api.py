@@ -2,26 +2,159 @@
 Bible API module to fetch Bible verses from online sources.
 """
 
-import requests
 import json
 import os
+import threading
 import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
 from urllib.parse import quote
 
+from bible_data import (
+    advance_verse, format_reference, get_verse_count, make_verse_id, split_verse_id
+)
+from bible_reference import (
+    InvalidReference, format_verse_range, parse_cache_key, parse_reference
+)
+from cache_journal import TOMBSTONE
+from circuit_breaker import OPEN, CircuitBreaker
+from http_client import get_client
+from metrics import registry
+from passage_index import PassageIndex
+from search_index import SearchIndex
+from single_flight import SingleFlight
+from storage import open_table
+from ttl_cache import BoundedCache, NegativeEntry
+from verse_store import open_store
+
 # Set fallback data directory
-DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DATA_DIR = os.environ.get('BIBLE_STUDY_DATA_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
 os.makedirs(DATA_DIR, exist_ok=True)
+# Used by the json storage backend
 CACHE_FILE = os.path.join(DATA_DIR, 'verse_cache.json')
+STORE_FILE = os.path.join(DATA_DIR, 'verses.bin')
+
+# Packed offline corpus (see verse_store.py); None until one has been built
+verse_store = open_store(STORE_FILE)
+
+# getbible.net provider; point GETBIBLE_URL at a local stand-in server for testing
+GETBIBLE_URL = os.environ.get('GETBIBLE_URL', 'https://getbible.net/json')
+getbible_client = get_client(
+    'getbible',
+    GETBIBLE_URL,
+    pool_size=int(os.environ.get('GETBIBLE_POOL_SIZE', 10)),
+    connect_timeout=float(os.environ.get('GETBIBLE_CONNECT_TIMEOUT', 3.05)),
+    read_timeout=float(os.environ.get('GETBIBLE_READ_TIMEOUT', 5)),
+    max_attempts=int(os.environ.get('GETBIBLE_MAX_ATTEMPTS', 3)),
+    retry_budget=float(os.environ.get('GETBIBLE_RETRY_BUDGET', 6)),
+    max_in_flight=int(os.environ.get('GETBIBLE_MAX_IN_FLIGHT', 8))
+)
+
+# Trips after repeated failures or slow calls; lookups then go straight to local sources
+getbible_breaker = CircuitBreaker(
+    'getbible',
+    failure_threshold=int(os.environ.get('GETBIBLE_BREAKER_FAILURES', 5)),
+    window=float(os.environ.get('GETBIBLE_BREAKER_WINDOW', 60)),
+    cool_down=float(os.environ.get('GETBIBLE_BREAKER_COOL_DOWN', 30)),
+    slow_call_threshold=float(os.environ.get('GETBIBLE_SLOW_CALL', 4))
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised when getbible.net is skipped because its circuit breaker is open."""
+
+# Concurrent chapter fetches in one get_verses batch
+BATCH_WORKERS = int(os.environ.get('VERSE_BATCH_WORKERS', 8))
+
+# One entry of a get_verses batch result
+VerseResult = namedtuple('VerseResult', ['reference', 'text', 'status'])
+
+# Concurrent misses for the same chapter share one upstream fetch
+chapter_flights = SingleFlight()
+
+# Cache budget and expiry; a TTL of 0 means positive entries never expire
+CACHE_MAX_ENTRIES = int(os.environ.get('VERSE_CACHE_MAX_ENTRIES', 20000))
+CACHE_MAX_BYTES = int(os.environ.get('VERSE_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+CACHE_TTL = float(os.environ.get('VERSE_CACHE_TTL', 0))
+CACHE_NEGATIVE_TTL = float(os.environ.get('VERSE_CACHE_NEGATIVE_TTL', 300))
+
+# Initialize cache: persisted through the configured storage backend (see storage.py)
+cache_table = open_table('verse_cache')
+verse_cache = BoundedCache(
+    max_entries=CACHE_MAX_ENTRIES,
+    max_bytes=CACHE_MAX_BYTES,
+    ttl=CACHE_TTL,
+    negative_ttl=CACHE_NEGATIVE_TTL,
+    record_dropped=True
+)
+
+# Cache counters are read from verse_cache.stats() when scraped
+registry.counter(
+    'verse_cache_requests_total', 'Verse cache lookups by result', ('result',),
+    function=lambda: {
+        (result,): verse_cache.stats()[key]
+        for result, key in (('hit', 'hits'), ('negative_hit', 'negative_hits'), ('miss', 'misses'))
+    }
+)
+registry.counter('verse_cache_evictions_total', 'Verse cache entries evicted for space',
+                 function=lambda: verse_cache.stats()['evictions'])
+registry.gauge('verse_cache_entries', 'Entries in the verse cache',
+               function=lambda: verse_cache.stats()['entries'])
+registry.gauge('verse_cache_bytes', 'Approximate size of the verse cache',
+               function=lambda: verse_cache.stats()['bytes'])
+
+# getbible.net calls made by fetch_chapter
+getbible_seconds = registry.histogram(
+    'getbible_request_duration_seconds', 'getbible.net call latency, retries included', ('status',)
+)
+getbible_errors = registry.counter(
+    'getbible_errors_total', 'getbible.net lookups that returned no verses', ('reason',)
+)
+registry.gauge('getbible_circuit_open', '1 while the getbible.net circuit breaker is open',
+               function=lambda: int(getbible_breaker.state == OPEN))
+
+
+def is_fallback_text(text):
+    """Detect the placeholder get_verse returns (and older versions cached) when a verse is unavailable."""
+    return text.startswith("经文 ") and "暂时无法获取" in text
 
-# Initialize cache
-if os.path.exists(CACHE_FILE):
-    try:
-        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-            verse_cache = json.load(f)
-    except:
-        verse_cache = {}
-else:
-    verse_cache = {}
+
+def _stored_row(verse_text):
+    """Persisted form of a cache entry; carries a wall-clock expiry when a TTL is set."""
+    if not CACHE_TTL:
+        return verse_text
+    return {'text': verse_text, 'expires': time.time() + CACHE_TTL}
+
+
+def _read_row(row):
+    """Split a persisted entry (plain text from older versions, or a dict) into text and expiry."""
+    if isinstance(row, dict):
+        return row.get('text', ''), row.get('expires')
+    return row, None
+
+
+def load_cache():
+    """
+    Load persisted cache entries within the memory budget.
+    
+    Stored fallback messages, expired entries and anything the budget evicts
+    are tombstoned, so the next compaction shrinks the table to what is live.
+    """
+    now = time.time()
+    stale = []
+    for cache_key, row in cache_table.load().items():
+        verse_text, expires = _read_row(row)
+        if is_fallback_text(verse_text) or (expires is not None and expires <= now):
+            stale.append((cache_key, TOMBSTONE))
+        else:
+            verse_cache.put(cache_key, verse_text, ttl=expires - now if expires else None)
+    stale.extend((cache_key, TOMBSTONE) for cache_key in verse_cache.pop_dropped())
+    if stale:
+        cache_table.put_many(stale)
+
+
+load_cache()
 
 # 本地经文库 - 提供一些常用经文作为备选
 LOCAL_VERSES = {
@@ -87,15 +220,285 @@ LOCAL_VERSES = {
 }
 
 
+# Full-text index, built lazily by get_search_index()
+search_index = None
+_search_index_lock = threading.Lock()
+
+# Interval index over LOCAL_VERSES for "contains / overlaps this range" lookups
+local_index = PassageIndex()
+local_index.add_keys(LOCAL_VERSES)
+
+
+def add_local_verses(verses):
+    """
+    Add passages to the local verse library and its index.
+    
+    Args:
+        verses (dict): Keys like "诗篇_1_1_2" mapped to passage text
+    """
+    LOCAL_VERSES.update(verses)
+    local_index.add_keys(verses)
+    index_verses(verses.items())
+
+
+def find_local_passage(book, chapter, verse_start, verse_end=None):
+    """
+    Find the local passage that best covers a verse range.
+    
+    Returns:
+        str: Key of the tightest passage containing the range, else of the
+        passage overlapping it most, else None
+    """
+    for keys in (
+        local_index.containing(book, chapter, verse_start, verse_end),
+        local_index.overlapping(book, chapter, verse_start, verse_end)
+    ):
+        if keys:
+            return keys[0]
+    return None
+
+
 def save_cache():
-    """Save the verse cache to disk."""
+    """Compact the persisted verse cache (fold the journal or checkpoint the WAL)."""
+    try:
+        cache_table.compact()
+    except Exception as e:
+        print(f"Error saving cache: {str(e)}")
+
+
+def cache_verse(cache_key, verse_text):
+    """
+    Add a verse to the cache and persist it.
+    
+    Args:
+        cache_key (str): Cache key
+        verse_text (str): Verse text
+    """
+    verse_cache.put(cache_key, verse_text)
+    index_verses([(cache_key, verse_text)])
+    _persist({cache_key: verse_text})
+
+
+def cache_verses(entries):
+    """
+    Add several verses to the cache with a single storage write.
+    
+    Args:
+        entries (dict): Cache key to verse text
+    """
+    for cache_key, verse_text in entries.items():
+        verse_cache.put(cache_key, verse_text)
+    index_verses(entries.items())
+    _persist(entries)
+
+
+def _persist(entries):
+    """
+    Write new entries and tombstone the keys verse_cache has dropped since the last write.
+    
+    Args:
+        entries (dict): Cache key to verse text
+    """
+    dropped = {
+        cache_key for cache_key in verse_cache.pop_dropped() if cache_key not in verse_cache
+    }
+    rows = [
+        (cache_key, _stored_row(verse_text)) for cache_key, verse_text in entries.items()
+        if cache_key not in dropped
+    ]
+    rows.extend((cache_key, TOMBSTONE) for cache_key in dropped)
     try:
-        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(verse_cache, f, ensure_ascii=False, indent=2)
+        cache_table.put_many(rows)
     except Exception as e:
         print(f"Error saving cache: {str(e)}")
 
 
+def _add_to_index(index, entries):
+    for cache_key, verse_text in entries:
+        verse_range = parse_cache_key(cache_key)
+        if verse_range:
+            index.add(verse_range[0], verse_range[1], verse_text)
+
+
+def index_verses(entries):
+    """
+    Add verses to the search index if it has been built.
+    
+    Args:
+        entries (iterable): (cache_key, verse_text) pairs
+    """
+    if search_index is not None:
+        _add_to_index(search_index, entries)
+
+
+def get_search_index():
+    """
+    Get the full-text search index, building it on first use.
+    
+    The index covers the packed verse store, LOCAL_VERSES and the verse cache,
+    and is kept up to date as verses are cached afterwards.
+    
+    Returns:
+        SearchIndex: The shared index
+    """
+    global search_index
+    if search_index is None:
+        with _search_index_lock:
+            if search_index is None:
+                index = SearchIndex()
+                if verse_store is not None:
+                    for verse_id, verse_text in verse_store.items():
+                        index.add(verse_id, verse_id, verse_text)
+                _add_to_index(index, LOCAL_VERSES.items())
+                _add_to_index(index, verse_cache.items())
+                search_index = index
+    return search_index
+
+
+def warm_search_index():
+    """Build the search index on a background thread."""
+    threading.Thread(target=get_search_index, name='search-index', daemon=True).start()
+
+
+def _chapter_spans(start_id, end_id):
+    """Split a packed range into (start_id, end_id) pieces that each stay in one chapter."""
+    while True:
+        book, chapter, _ = split_verse_id(start_id)
+        last = make_verse_id(book, chapter, get_verse_count(book, chapter))
+        if last >= end_id:
+            yield start_id, end_id
+            return
+        yield start_id, last
+        start_id = advance_verse(last, 1)
+
+
+def _search_result(start_id, end_id, score):
+    book, chapter, verse_start = split_verse_id(start_id)
+    verse_end = split_verse_id(end_id)[2] if end_id != start_id else None
+    verse_text, _ = lookup_offline(book, chapter, verse_start, verse_end)
+    return {
+        'book': book,
+        'chapter': chapter,
+        'verse_start': verse_start,
+        'verse_end': verse_end,
+        'reference': format_verse_range(start_id, end_id),
+        'text': verse_text or "",
+        'score': score
+    }
+
+
+def search_verses(query, limit=20):
+    """
+    Find verses by a reference such as "约3:16-18", or by their words.
+    
+    A query that parses as a reference returns the referenced passages (one
+    result per chapter, score None); anything else goes to the search index.
+    Text comes from the offline sources only.
+    
+    Args:
+        query (str): Reference or search text
+        limit (int): Maximum number of results
+        
+    Returns:
+        list: Result dicts with book, chapter, verse_start, verse_end,
+        reference, text and score, best match first
+    """
+    try:
+        ranges = parse_reference(query)
+    except InvalidReference:
+        ranges = None
+    if ranges:
+        spans = (span for start_id, end_id in ranges for span in _chapter_spans(start_id, end_id))
+        return [_search_result(start_id, end_id, None) for start_id, end_id in islice(spans, limit)]
+    
+    return [
+        _search_result(start_id, end_id, score)
+        for start_id, end_id, score in get_search_index().search(query, limit)
+    ]
+
+
+def get_cache_stats():
+    """
+    Get verse cache counters for tuning.
+    
+    Returns:
+        dict: Hit, miss, eviction and expiry counters plus current size
+    """
+    return verse_cache.stats()
+
+
+def make_cache_key(book, chapter, verse_start, verse_end=None):
+    """Build the cache key for a verse or range."""
+    if verse_end:
+        return f"{book}_{chapter}_{verse_start}_{verse_end}"
+    return f"{book}_{chapter}_{verse_start}"
+
+
+def make_reference(book, chapter, verse_start, verse_end=None):
+    """Format a verse or range as display text."""
+    return format_reference(book, chapter, verse_start, verse_end or None)
+
+
+def lookup_offline(book, chapter, verse_start, verse_end=None):
+    """
+    Resolve a verse from local sources only, without touching the network.
+    
+    Args:
+        book (str): Bible book name
+        chapter (int): Chapter number
+        verse_start (int): Starting verse number
+        verse_end (int, optional): Ending verse number
+        
+    Returns:
+        tuple: (text, status). status is 'store', 'cache' or 'local' when text
+        was found, 'negative' if the API failed for this key recently, and
+        'miss' otherwise.
+    """
+    # Answer from the packed offline corpus when one is installed
+    if verse_store is not None:
+        verse_text = verse_store.get_passage(book, chapter, verse_start, verse_end)
+        if verse_text:
+            return verse_text, 'store'
+    
+    cache_key = make_cache_key(book, chapter, verse_start, verse_end)
+    
+    # Check cache first; a NegativeEntry means the API failed recently
+    cached = verse_cache.get(cache_key)
+    if cached is not None and not isinstance(cached, NegativeEntry):
+        return cached, 'cache'
+    
+    # A range may already be cached verse by verse from an earlier chapter fetch
+    if verse_end and cached is None:
+        verse_text = get_cached_range(book, chapter, verse_start, verse_end)
+        if verse_text:
+            return verse_text, 'cache'
+    
+    # Check local verse library (already in memory, so not cached)
+    if cache_key in LOCAL_VERSES:
+        return LOCAL_VERSES[cache_key], 'local'
+    
+    return None, 'negative' if cached is not None else 'miss'
+
+
+def get_fallback_text(book, chapter, verse_start, verse_end=None, error=None):
+    """
+    Get the text shown when a verse could not be fetched.
+    
+    Returns:
+        str: A similar local verse if one exists, otherwise an error message
+    """
+    # A local passage containing or overlapping the requested verses
+    similar_key = find_local_passage(book, chapter, verse_start, verse_end)
+    if similar_key:
+        return LOCAL_VERSES[similar_key]
+    
+    # If no similar verse found, provide a default response (never cached)
+    reference = make_reference(book, chapter, verse_start, verse_end)
+    if error is not None:
+        return f"经文 {reference} 暂时无法获取：{str(error)}"
+    return f"经文 {reference} 暂时无法获取，请稍后再试。"
+
+
 def get_verse(book, chapter, verse_start, verse_end=None):
     """
     Get Bible verse text from API or cache.
@@ -109,114 +512,296 @@ def get_verse(book, chapter, verse_start, verse_end=None):
     Returns:
         str: The verse text
     """
-    # Create a cache key
-    if verse_end:
-        cache_key = f"{book}_{chapter}_{verse_start}_{verse_end}"
-    else:
-        cache_key = f"{book}_{chapter}_{verse_start}"
-        
-    # Check cache first
-    if cache_key in verse_cache:
-        return verse_cache[cache_key]
-    
-    # Check local verse library
-    if cache_key in LOCAL_VERSES:
-        verse_text = LOCAL_VERSES[cache_key]
-        verse_cache[cache_key] = verse_text
-        save_cache()
+    verse_text, status = lookup_offline(book, chapter, verse_start, verse_end)
+    if verse_text is not None:
         return verse_text
-        
-    # Similar keys in local verse library
-    similar_key = None
-    for key in LOCAL_VERSES.keys():
-        if key.startswith(f"{book}_{chapter}_"):
-            similar_key = key
-            break
-    
-    # Format reference for API request
-    if verse_end:
-        reference = f"{book} {chapter}:{verse_start}-{verse_end}"
-    else:
-        reference = f"{book} {chapter}:{verse_start}"
     
-    # Try to get from API
-    try:
-        # Using API
-        verse_text = get_from_api(book, chapter, verse_start, verse_end, reference)
-        
-        if verse_text and not verse_text.startswith("Error"):
-            # Cache result
-            verse_cache[cache_key] = verse_text
-            save_cache()
-            return verse_text
+    # Try to get from API unless it failed for this key within the negative TTL
+    error = None
+    if status != 'negative':
+        cache_key = make_cache_key(book, chapter, verse_start, verse_end)
+        reference = make_reference(book, chapter, verse_start, verse_end)
+        try:
+            verse_text = get_from_api(book, chapter, verse_start, verse_end, reference)
             
-        # If API failed, use our backup approach
-        if similar_key:
-            return LOCAL_VERSES[similar_key]
+            if verse_text and not verse_text.startswith("Error"):
+                # The chapter's verses were cached individually by the fetch
+                return verse_text
             
-        # If no similar verse found, provide a default response
-        fallback_text = f"经文 {reference} 暂时无法获取，请稍后再试。"
-        verse_cache[cache_key] = fallback_text
-        save_cache()
-        return fallback_text
+            verse_cache.put_negative(cache_key, 'unavailable')
+        except CircuitOpenError:
+            # Nothing was learned about this key; ask again once calls are let through
+            pass
+        except Exception as e:
+            error = e
+            verse_cache.put_negative(cache_key, type(e).__name__)
     
-    except Exception as e:
-        # If API failed, use our backup approach
-        if similar_key:
-            return LOCAL_VERSES[similar_key]
-            
-        # If no similar verse found, provide a default response
-        fallback_text = f"经文 {reference} 暂时无法获取：{str(e)}"
-        return fallback_text
+    # If API failed, use our backup approach
+    return get_fallback_text(book, chapter, verse_start, verse_end, error)
+
+
+def _normalize_ref(ref):
+    """Turn a (book, chapter, start[, end]) tuple or verse dict into a tuple."""
+    if isinstance(ref, dict):
+        return (ref['book'], ref['chapter'], ref['verse_start'], ref.get('verse_end') or None)
+    book, chapter, verse_start = ref[:3]
+    verse_end = ref[3] if len(ref) > 3 else None
+    return (book, chapter, verse_start, verse_end or None)
+
+
+def get_verses(refs, max_workers=BATCH_WORKERS):
+    """
+    Resolve many references at once.
+    
+    Duplicate references are resolved once, local hits are answered without
+    the network, and the remaining misses are grouped by chapter so each
+    chapter is fetched once, with chapters fetched concurrently.
+    
+    Args:
+        refs (list): (book, chapter, verse_start[, verse_end]) tuples or
+            verse dicts as stored in the study plan
+        max_workers (int): Maximum concurrent chapter fetches
+        
+    Returns:
+        list: VerseResult(reference, text, status) in input order. status is
+        'store', 'cache', 'local', 'api' or 'unavailable'.
+    """
+    keys = [_normalize_ref(ref) for ref in refs]
+    resolved = {}
+    misses = {}
+    
+    for key in dict.fromkeys(keys):
+        verse_text, status = lookup_offline(*key)
+        if verse_text is not None:
+            resolved[key] = (verse_text, status)
+        elif status == 'negative':
+            resolved[key] = (get_fallback_text(*key), 'unavailable')
+        else:
+            misses.setdefault(key[:2], []).append(key)
+    
+    if misses:
+        workers = max(1, min(max_workers, len(misses)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(fetch_chapter_once, book, chapter): (book, chapter)
+                for book, chapter in misses
+            }
+            for future in as_completed(futures):
+                circuit_open = False
+                try:
+                    verses = future.result()
+                    error = None
+                except CircuitOpenError:
+                    verses = None
+                    error = None
+                    circuit_open = True
+                except Exception as e:
+                    verses = None
+                    error = e
+                
+                for key in misses[futures[future]]:
+                    verse_text = slice_verses(verses, key[2], key[3]) if verses else None
+                    if verse_text:
+                        resolved[key] = (verse_text, 'api')
+                    else:
+                        if not circuit_open:
+                            verse_cache.put_negative(make_cache_key(*key), 'unavailable')
+                        resolved[key] = (get_fallback_text(*key, error=error), 'unavailable')
+    
+    return [
+        VerseResult(make_reference(*key), *resolved[key])
+        for key in keys
+    ]
 
 
 def get_from_api(book, chapter, verse_start, verse_end, reference):
-    """Try to get verse from external API"""
-    try:
-        # Using the GetBible API
-        encoded_ref = quote(reference)
-        url = f"https://getbible.net/json?passage={encoded_ref}&version=cns"
+    """
+    Try to get a verse or range from the external API.
+    
+    The whole chapter is fetched once and its verses are cached individually,
+    so later lookups anywhere in the same chapter are sliced locally.
+    
+    Args:
+        book (str): Bible book name
+        chapter (int): Chapter number
+        verse_start (int): Starting verse number
+        verse_end (int, optional): Ending verse number
+        reference (str): Formatted reference, kept for callers and logging
         
-        response = requests.get(url, timeout=10)
+    Returns:
+        str: The verse text, or None if it could not be fetched
+    """
+    # Another thread may have fetched this chapter since the caller's cache lookup
+    verse_text = get_cached_range(book, chapter, verse_start, verse_end or verse_start)
+    if verse_text:
+        return verse_text
+    
+    verses = fetch_chapter_once(book, chapter)
+    if not verses:
+        return None
+    return slice_verses(verses, verse_start, verse_end)
+
+
+def fetch_chapter_once(book, chapter):
+    """
+    Fetch and cache a chapter, sharing the request with concurrent callers.
+    
+    Returns:
+        dict: Verse number to text, or None if the fetch failed
+    
+    Raises:
+        CircuitOpenError: If the circuit breaker refused the call
+    """
+    return chapter_flights.do((book, chapter), get_chapter_verses, book, chapter)
+
+
+def slice_verses(verses, verse_start, verse_end=None):
+    """
+    Join a verse range out of a chapter's verses.
+    
+    Args:
+        verses (dict): Verse number to text
+        verse_start (int): Starting verse number
+        verse_end (int, optional): Ending verse number
         
-        # Check if valid JSON response
-        if response.status_code == 200:
-            text = response.text
-            if not text:
-                return None
-                
-            # Handle JSONP format
-            if text.startswith('(') and text.endswith(')'):
-                text = text[1:-1]
-            
-            # Parse JSON
-            try:
-                data = json.loads(text)
-                
-                # Extract verse text
-                verse_text = ""
-                
-                if 'book' in data:
-                    book_data = data['book']
-                    chapter_data = book_data[0]['chapter']
-                    
-                    verses = []
-                    for verse_num, verse_info in chapter_data.items():
-                        if 'verse' in verse_info:
-                            verses.append(verse_info['verse'])
-                    
-                    verse_text = " ".join(verses)
-                    return verse_text
-                    
-                return None
-            except json.JSONDecodeError:
-                return None
-        else:
+    Returns:
+        str: The joined text, or None if any verse in the range is missing
+    """
+    texts = []
+    for verse_num in range(verse_start, (verse_end or verse_start) + 1):
+        text = verses.get(verse_num)
+        if text is None:
+            return None
+        texts.append(text)
+    return " ".join(texts)
+
+
+def get_cached_range(book, chapter, verse_start, verse_end):
+    """
+    Assemble a verse range from individually cached verses.
+    
+    Returns:
+        str: The joined text, or None unless every verse is cached
+    """
+    texts = []
+    for verse_num in range(verse_start, verse_end + 1):
+        text = verse_cache.get(f"{book}_{chapter}_{verse_num}")
+        if text is None or isinstance(text, NegativeEntry):
             return None
+        texts.append(text)
+    return " ".join(texts)
+
+
+def get_chapter_verses(book, chapter):
+    """
+    Fetch a chapter from the external API and cache each of its verses.
+    
+    Args:
+        book (str): Bible book name
+        chapter (int): Chapter number
+        
+    Returns:
+        dict: Verse number to text, or None if the fetch failed
+    """
+    verses = fetch_chapter(book, chapter)
+    if verses:
+        cache_verses({
+            f"{book}_{chapter}_{verse_num}": text
+            for verse_num, text in verses.items()
+        })
+    return verses
+
+
+def fetch_chapter(book, chapter):
+    """
+    Request one chapter from getbible.net and parse its verses.
+    
+    Returns:
+        dict: Verse number to text, or None if the fetch failed
     
+    Raises:
+        CircuitOpenError: If the circuit breaker refused the call
+    """
+    # Fail fast while the circuit is open
+    if not getbible_breaker.allow():
+        getbible_errors.labels('circuit_open').inc()
+        raise CircuitOpenError("getbible.net circuit breaker is open")
+    
+    started = time.monotonic()
+    try:
+        # Using the GetBible API through the shared connection pool
+        encoded_ref = quote(f"{book} {chapter}")
+        response = getbible_client.get(f"?passage={encoded_ref}&version=cns")
     except Exception:
         # API call failed
+        getbible_breaker.record_failure()
+        getbible_seconds.labels('error').observe(time.monotonic() - started)
+        getbible_errors.labels('connection').inc()
+        return None
+    
+    # Any HTTP answer means the upstream is reachable; retries already absorbed 5xx
+    elapsed = time.monotonic() - started
+    getbible_breaker.record_success(elapsed)
+    getbible_seconds.labels(str(response.status_code)).observe(elapsed)
+    
+    # Check if valid JSON response
+    if response.status_code != 200:
+        getbible_errors.labels('status').inc()
+        return None
+    verses = parse_passage(response.text)
+    if verses is None:
+        getbible_errors.labels('parse').inc()
+    return verses
+
+
+def get_upstream_status():
+    """
+    Get the getbible.net circuit breaker state.
+    
+    Returns:
+        dict: Breaker state and counters
+    """
+    return getbible_breaker.stats()
+
+
+def parse_passage(text):
+    """
+    Parse a getbible.net JSON(P) response into verses.
+    
+    Both the "chapter" shape ({"chapter": {...}}) and the "verse" shape
+    ({"book": [{"chapter": {...}}]}) are accepted.
+    
+    Args:
+        text (str): Response body
+        
+    Returns:
+        dict: Verse number to text, or None if nothing could be parsed
+    """
+    if not text:
         return None
+    
+    # Handle JSONP format
+    text = text.strip().rstrip(';')
+    if text.startswith('(') and text.endswith(')'):
+        text = text[1:-1]
+    
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    
+    if 'chapter' in data:
+        chapter_data = data['chapter']
+    elif 'book' in data and data['book']:
+        chapter_data = data['book'][0].get('chapter', {})
+    else:
+        return None
+    
+    verses = {}
+    for verse_num, verse_info in chapter_data.items():
+        if 'verse' in verse_info:
+            verses[int(verse_info.get('verse_nr', verse_num))] = verse_info['verse'].strip()
+    return verses or None
 
 
 def get_chapter(book, chapter):
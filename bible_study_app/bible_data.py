@@ -1,7 +1,11 @@
 """
-Bible data utility module that provides book names and chapter counts.
+Bible data utility module that provides book names, chapter and verse counts,
+and canonical coordinate tables.
 """
 
+from array import array
+from bisect import bisect_right
+
 # Bible books with their chapter counts
 BIBLE_BOOKS = {
     # Old Testament
@@ -98,6 +102,189 @@ NEW_TESTAMENT = [
 
 ALL_BOOKS = OLD_TESTAMENT + NEW_TESTAMENT
 
+# Standard Chinese (CUV) book abbreviations
+BOOK_ABBREVIATIONS = {
+    "创": "创世记", "出": "出埃及记", "利": "利未记", "民": "民数记", "申": "申命记",
+    "书": "约书亚记", "士": "士师记", "得": "路得记", "撒上": "撒母耳记上", "撒下": "撒母耳记下",
+    "王上": "列王纪上", "王下": "列王纪下", "代上": "历代志上", "代下": "历代志下", "拉": "以斯拉记",
+    "尼": "尼希米记", "斯": "以斯帖记", "伯": "约伯记", "诗": "诗篇", "箴": "箴言",
+    "传": "传道书", "歌": "雅歌", "赛": "以赛亚书", "耶": "耶利米书", "哀": "耶利米哀歌",
+    "结": "以西结书", "但": "但以理书", "何": "何西阿书", "珥": "约珥书", "摩": "阿摩司书",
+    "俄": "俄巴底亚书", "拿": "约拿书", "弥": "弥迦书", "鸿": "那鸿书", "哈": "哈巴谷书",
+    "番": "西番雅书", "该": "哈该书", "亚": "撒迦利亚书", "玛": "玛拉基书",
+    "太": "马太福音", "可": "马可福音", "路": "路加福音", "约": "约翰福音", "徒": "使徒行传",
+    "罗": "罗马书", "林前": "哥林多前书", "林后": "哥林多后书", "加": "加拉太书", "弗": "以弗所书",
+    "腓": "腓立比书", "西": "歌罗西书", "帖前": "帖撒罗尼迦前书", "帖后": "帖撒罗尼迦后书", "提前": "提摩太前书",
+    "提后": "提摩太后书", "多": "提多书", "门": "腓利门书", "来": "希伯来书", "雅": "雅各书",
+    "彼前": "彼得前书", "彼后": "彼得后书", "约一": "约翰一书", "约二": "约翰二书", "约三": "约翰三书",
+    "犹": "犹大书", "启": "启示录"
+}
+
+# Verses in each chapter, in canonical book order (KJV versification: 1189
+# chapters, 31102 verses)
+CHAPTER_VERSES = {
+    # Old Testament
+    "创世记": (
+        31, 25, 24, 26, 32, 22, 24, 22, 29, 32, 32, 20, 18, 24, 21, 16, 27, 33, 38, 18,
+        34, 24, 20, 67, 34, 35, 46, 22, 35, 43, 55, 32, 20, 31, 29, 43, 36, 30, 23, 23,
+        57, 38, 34, 34, 28, 34, 31, 22, 33, 26
+    ),
+    "出埃及记": (
+        22, 25, 22, 31, 23, 30, 25, 32, 35, 29, 10, 51, 22, 31, 27, 36, 16, 27, 25, 26,
+        36, 31, 33, 18, 40, 37, 21, 43, 46, 38, 18, 35, 23, 35, 35, 38, 29, 31, 43, 38
+    ),
+    "利未记": (
+        17, 16, 17, 35, 19, 30, 38, 36, 24, 20, 47, 8, 59, 57, 33, 34, 16, 30, 37, 27,
+        24, 33, 44, 23, 55, 46, 34
+    ),
+    "民数记": (
+        54, 34, 51, 49, 31, 27, 89, 26, 23, 36, 35, 16, 33, 45, 41, 50, 13, 32, 22, 29,
+        35, 41, 30, 25, 18, 65, 23, 31, 40, 16, 54, 42, 56, 29, 34, 13
+    ),
+    "申命记": (
+        46, 37, 29, 49, 33, 25, 26, 20, 29, 22, 32, 32, 18, 29, 23, 22, 20, 22, 21, 20,
+        23, 30, 25, 22, 19, 19, 26, 68, 29, 20, 30, 52, 29, 12
+    ),
+    "约书亚记": (
+        18, 24, 17, 24, 15, 27, 26, 35, 27, 43, 23, 24, 33, 15, 63, 10, 18, 28, 51, 9,
+        45, 34, 16, 33
+    ),
+    "士师记": (
+        36, 23, 31, 24, 31, 40, 25, 35, 57, 18, 40, 15, 25, 20, 20, 31, 13, 31, 30, 48,
+        25
+    ),
+    "路得记": (22, 23, 18, 22),
+    "撒母耳记上": (
+        28, 36, 21, 22, 12, 21, 17, 22, 27, 27, 15, 25, 23, 52, 35, 23, 58, 30, 24, 42,
+        15, 23, 29, 22, 44, 25, 12, 25, 11, 31, 13
+    ),
+    "撒母耳记下": (
+        27, 32, 39, 12, 25, 23, 29, 18, 13, 19, 27, 31, 39, 33, 37, 23, 29, 33, 43, 26,
+        22, 51, 39, 25
+    ),
+    "列王纪上": (
+        53, 46, 28, 34, 18, 38, 51, 66, 28, 29, 43, 33, 34, 31, 34, 34, 24, 46, 21, 43,
+        29, 53
+    ),
+    "列王纪下": (
+        18, 25, 27, 44, 27, 33, 20, 29, 37, 36, 21, 21, 25, 29, 38, 20, 41, 37, 37, 21,
+        26, 20, 37, 20, 30
+    ),
+    "历代志上": (
+        54, 55, 24, 43, 26, 81, 40, 40, 44, 14, 47, 40, 14, 17, 29, 43, 27, 17, 19, 8,
+        30, 19, 32, 31, 31, 32, 34, 21, 30
+    ),
+    "历代志下": (
+        17, 18, 17, 22, 14, 42, 22, 18, 31, 19, 23, 16, 22, 15, 19, 14, 19, 34, 11, 37,
+        20, 12, 21, 27, 28, 23, 9, 27, 36, 27, 21, 33, 25, 33, 27, 23
+    ),
+    "以斯拉记": (11, 70, 13, 24, 17, 22, 28, 36, 15, 44),
+    "尼希米记": (11, 20, 32, 23, 19, 19, 73, 18, 38, 39, 36, 47, 31),
+    "以斯帖记": (22, 23, 15, 17, 14, 14, 10, 17, 32, 3),
+    "约伯记": (
+        22, 13, 26, 21, 27, 30, 21, 22, 35, 22, 20, 25, 28, 22, 35, 22, 16, 21, 29, 29,
+        34, 30, 17, 25, 6, 14, 23, 28, 25, 31, 40, 22, 33, 37, 16, 33, 24, 41, 30, 24,
+        34, 17
+    ),
+    "诗篇": (
+        6, 12, 8, 8, 12, 10, 17, 9, 20, 18, 7, 8, 6, 7, 5, 11, 15, 50, 14, 9,
+        13, 31, 6, 10, 22, 12, 14, 9, 11, 12, 24, 11, 22, 22, 28, 12, 40, 22, 13, 17,
+        13, 11, 5, 26, 17, 11, 9, 14, 20, 23, 19, 9, 6, 7, 23, 13, 11, 11, 17, 12,
+        8, 12, 11, 10, 13, 20, 7, 35, 36, 5, 24, 20, 28, 23, 10, 12, 20, 72, 13, 19,
+        16, 8, 18, 12, 13, 17, 7, 18, 52, 17, 16, 15, 5, 23, 11, 13, 12, 9, 9, 5,
+        8, 28, 22, 35, 45, 48, 43, 13, 31, 7, 10, 10, 9, 8, 18, 19, 2, 29, 176, 7,
+        8, 9, 4, 8, 5, 6, 5, 6, 8, 8, 3, 18, 3, 3, 21, 26, 9, 8, 24, 13,
+        10, 7, 12, 15, 21, 10, 20, 14, 9, 6
+    ),
+    "箴言": (
+        33, 22, 35, 27, 23, 35, 27, 36, 18, 32, 31, 28, 25, 35, 33, 33, 28, 24, 29, 30,
+        31, 29, 35, 34, 28, 28, 27, 28, 27, 33, 31
+    ),
+    "传道书": (18, 26, 22, 16, 20, 12, 29, 17, 18, 20, 10, 14),
+    "雅歌": (17, 17, 11, 16, 16, 13, 13, 14),
+    "以赛亚书": (
+        31, 22, 26, 6, 30, 13, 25, 22, 21, 34, 16, 6, 22, 32, 9, 14, 14, 7, 25, 6,
+        17, 25, 18, 23, 12, 21, 13, 29, 24, 33, 9, 20, 24, 17, 10, 22, 38, 22, 8, 31,
+        29, 25, 28, 28, 25, 13, 15, 22, 26, 11, 23, 15, 12, 17, 13, 12, 21, 14, 21, 22,
+        11, 12, 19, 12, 25, 24
+    ),
+    "耶利米书": (
+        19, 37, 25, 31, 31, 30, 34, 22, 26, 25, 23, 17, 27, 22, 21, 21, 27, 23, 15, 18,
+        14, 30, 40, 10, 38, 24, 22, 17, 32, 24, 40, 44, 26, 22, 19, 32, 21, 28, 18, 16,
+        18, 22, 13, 30, 5, 28, 7, 47, 39, 46, 64, 34
+    ),
+    "耶利米哀歌": (22, 22, 66, 22, 22),
+    "以西结书": (
+        28, 10, 27, 17, 17, 14, 27, 18, 11, 22, 25, 28, 23, 23, 8, 63, 24, 32, 14, 49,
+        32, 31, 49, 27, 17, 21, 36, 26, 21, 26, 18, 32, 33, 31, 15, 38, 28, 23, 29, 49,
+        26, 20, 27, 31, 25, 24, 23, 35
+    ),
+    "但以理书": (21, 49, 30, 37, 31, 28, 28, 27, 27, 21, 45, 13),
+    "何西阿书": (11, 23, 5, 19, 15, 11, 16, 14, 17, 15, 12, 14, 16, 9),
+    "约珥书": (20, 32, 21),
+    "阿摩司书": (15, 16, 15, 13, 27, 14, 17, 14, 15),
+    "俄巴底亚书": (21,),
+    "约拿书": (17, 10, 10, 11),
+    "弥迦书": (16, 13, 12, 13, 15, 16, 20),
+    "那鸿书": (15, 13, 19),
+    "哈巴谷书": (17, 20, 19),
+    "西番雅书": (18, 15, 20),
+    "哈该书": (15, 23),
+    "撒迦利亚书": (21, 13, 10, 14, 11, 15, 14, 23, 17, 12, 17, 14, 9, 21),
+    "玛拉基书": (14, 17, 18, 6),
+
+    # New Testament
+    "马太福音": (
+        25, 23, 17, 25, 48, 34, 29, 34, 38, 42, 30, 50, 58, 36, 39, 28, 27, 35, 30, 34,
+        46, 46, 39, 51, 46, 75, 66, 20
+    ),
+    "马可福音": (45, 28, 35, 41, 43, 56, 37, 38, 50, 52, 33, 44, 37, 72, 47, 20),
+    "路加福音": (
+        80, 52, 38, 44, 39, 49, 50, 56, 62, 42, 54, 59, 35, 35, 32, 31, 37, 43, 48, 47,
+        38, 71, 56, 53
+    ),
+    "约翰福音": (
+        51, 25, 36, 54, 47, 71, 53, 59, 41, 42, 57, 50, 38, 31, 27, 33, 26, 40, 42, 31,
+        25
+    ),
+    "使徒行传": (
+        26, 47, 26, 37, 42, 15, 60, 40, 43, 48, 30, 25, 52, 28, 41, 40, 34, 28, 41, 38,
+        40, 30, 35, 27, 27, 32, 44, 31
+    ),
+    "罗马书": (32, 29, 31, 25, 21, 23, 25, 39, 33, 21, 36, 21, 14, 23, 33, 27),
+    "哥林多前书": (31, 16, 23, 21, 13, 20, 40, 13, 27, 33, 34, 31, 13, 40, 58, 24),
+    "哥林多后书": (24, 17, 18, 18, 21, 18, 16, 24, 15, 18, 33, 21, 14),
+    "加拉太书": (24, 21, 29, 31, 26, 18),
+    "以弗所书": (23, 22, 21, 32, 33, 24),
+    "腓立比书": (30, 30, 21, 23),
+    "歌罗西书": (29, 23, 25, 18),
+    "帖撒罗尼迦前书": (10, 20, 13, 18, 28),
+    "帖撒罗尼迦后书": (12, 17, 18),
+    "提摩太前书": (20, 15, 16, 16, 25, 21),
+    "提摩太后书": (18, 26, 17, 22),
+    "提多书": (16, 15, 15),
+    "腓利门书": (25,),
+    "希伯来书": (14, 18, 19, 16, 14, 20, 28, 13, 28, 39, 40, 29, 25),
+    "雅各书": (27, 26, 18, 17, 20),
+    "彼得前书": (25, 25, 22, 19, 14),
+    "彼得后书": (21, 22, 18),
+    "约翰一书": (10, 29, 24, 21, 21),
+    "约翰二书": (13,),
+    "约翰三书": (14,),
+    "犹大书": (25,),
+    "启示录": (
+        20, 29, 22, 11, 14, 17, 17, 13, 21, 11, 19, 17, 18, 20, 8, 21, 18, 24, 21, 15,
+        27, 21
+    )
+}
+
+# Canonical book numbers (1-66) used by packed verse IDs
+BOOK_NUMBERS = {book: number for number, book in enumerate(ALL_BOOKS, 1)}
+
+# Packed verse ID layout: book * 10^6 + chapter * 10^3 + verse
+BOOK_ID_FACTOR = 1000000
+CHAPTER_ID_FACTOR = 1000
+
 def get_book_chapters(book_name):
     """
     Get the number of chapters in a given book.
@@ -128,4 +315,221 @@ def format_reference(book, chapter, verse_start=None, verse_end=None):
     elif verse_end is None:
         return f"{book} {chapter}:{verse_start}"
     else:
-        return f"{book} {chapter}:{verse_start}-{verse_end}" 
\ No newline at end of file
+        return f"{book} {chapter}:{verse_start}-{verse_end}"
+
+def make_verse_id(book, chapter, verse):
+    """
+    Pack a verse coordinate into an integer verse ID.
+    
+    Args:
+        book (str): Book name
+        chapter (int): Chapter number
+        verse (int): Verse number
+        
+    Returns:
+        int: Packed verse ID, or None if the book, chapter or verse does not
+        exist (an out-of-range number would collide with another verse's ID)
+    """
+    book_number = BOOK_NUMBERS.get(book)
+    if book_number is None or not 1 <= verse <= get_verse_count(book, chapter):
+        return None
+    return book_number * BOOK_ID_FACTOR + chapter * CHAPTER_ID_FACTOR + verse
+
+def split_verse_id(verse_id):
+    """
+    Unpack an integer verse ID.
+    
+    Args:
+        verse_id (int): Packed verse ID
+        
+    Returns:
+        tuple: (book, chapter, verse), or None if the book number is out of range
+    """
+    book_number, rest = divmod(verse_id, BOOK_ID_FACTOR)
+    if not 1 <= book_number <= len(ALL_BOOKS):
+        return None
+    chapter, verse = divmod(rest, CHAPTER_ID_FACTOR)
+    return ALL_BOOKS[book_number - 1], chapter, verse
+
+# Array-backed coordinate tables built from CHAPTER_VERSES. Books, chapters
+# and verses all have 1-based global ordinals in canonical order:
+#   BOOK_CHAPTER_OFFSETS[b - 1]   chapters before book b (length 67)
+#   VERSE_COUNTS[c - 1]           verses in global chapter c (length 1189)
+#   CHAPTER_VERSE_OFFSETS[c - 1]  verses before global chapter c (prefix sums, length 1190)
+BOOK_CHAPTER_OFFSETS = array('H', [0])
+VERSE_COUNTS = array('H')
+CHAPTER_VERSE_OFFSETS = array('I', [0])
+for _book in ALL_BOOKS:
+    for _count in CHAPTER_VERSES[_book]:
+        VERSE_COUNTS.append(_count)
+        CHAPTER_VERSE_OFFSETS.append(CHAPTER_VERSE_OFFSETS[-1] + _count)
+    BOOK_CHAPTER_OFFSETS.append(len(VERSE_COUNTS))
+del _book, _count
+
+TOTAL_CHAPTERS = len(VERSE_COUNTS)
+TOTAL_VERSES = CHAPTER_VERSE_OFFSETS[-1]
+
+def chapter_ordinal(book, chapter):
+    """
+    Get the global ordinal (1-1189) of a chapter.
+    
+    Args:
+        book (str): Book name
+        chapter (int): Chapter number
+        
+    Returns:
+        int: Chapter ordinal, or None if the chapter does not exist
+    """
+    book_number = BOOK_NUMBERS.get(book)
+    if book_number is None or not 1 <= chapter <= BIBLE_BOOKS[book]:
+        return None
+    return BOOK_CHAPTER_OFFSETS[book_number - 1] + chapter
+
+def chapter_from_ordinal(ordinal):
+    """
+    Get the book and chapter for a global chapter ordinal.
+    
+    Args:
+        ordinal (int): Chapter ordinal (1-1189)
+        
+    Returns:
+        tuple: (book, chapter)
+    """
+    book_index = bisect_right(BOOK_CHAPTER_OFFSETS, ordinal - 1) - 1
+    return ALL_BOOKS[book_index], ordinal - BOOK_CHAPTER_OFFSETS[book_index]
+
+def get_verse_count(book, chapter):
+    """
+    Get the number of verses in a chapter.
+    
+    Args:
+        book (str): Book name
+        chapter (int): Chapter number
+        
+    Returns:
+        int: Number of verses, or 0 if the chapter does not exist
+    """
+    ordinal = chapter_ordinal(book, chapter)
+    if ordinal is None:
+        return 0
+    return VERSE_COUNTS[ordinal - 1]
+
+def is_valid_verse(book, chapter, verse):
+    """
+    Check that a verse exists.
+    
+    Args:
+        book (str): Book name
+        chapter (int): Chapter number
+        verse (int): Verse number
+        
+    Returns:
+        bool: True if the verse exists
+    """
+    return 1 <= verse <= get_verse_count(book, chapter)
+
+def verse_ordinal(book, chapter, verse):
+    """
+    Get the global ordinal (1-31102) of a verse.
+    
+    Args:
+        book (str): Book name
+        chapter (int): Chapter number
+        verse (int): Verse number
+        
+    Returns:
+        int: Verse ordinal, or None if the verse does not exist
+    """
+    ordinal = chapter_ordinal(book, chapter)
+    if ordinal is None or not 1 <= verse <= VERSE_COUNTS[ordinal - 1]:
+        return None
+    return CHAPTER_VERSE_OFFSETS[ordinal - 1] + verse
+
+def verse_from_ordinal(ordinal):
+    """
+    Get the coordinates of a global verse ordinal.
+    
+    Args:
+        ordinal (int): Verse ordinal (1-31102)
+        
+    Returns:
+        tuple: (book, chapter, verse)
+    """
+    chapter_index = bisect_right(CHAPTER_VERSE_OFFSETS, ordinal - 1) - 1
+    book, chapter = chapter_from_ordinal(chapter_index + 1)
+    return book, chapter, ordinal - CHAPTER_VERSE_OFFSETS[chapter_index]
+
+def verse_id_to_ordinal(verse_id):
+    """Convert a packed verse ID to its global verse ordinal (None if invalid)."""
+    coordinate = split_verse_id(verse_id)
+    if coordinate is None:
+        return None
+    return verse_ordinal(*coordinate)
+
+def ordinal_to_verse_id(ordinal):
+    """Convert a global verse ordinal to a packed verse ID."""
+    return make_verse_id(*verse_from_ordinal(ordinal))
+
+def verse_distance(start_id, end_id):
+    """
+    Count the verses from one packed verse ID to another.
+    
+    Args:
+        start_id (int): First packed verse ID
+        end_id (int): Second packed verse ID
+        
+    Returns:
+        int: Number of verses from start to end (negative if end comes first),
+        or None if either ID is not a verse
+    """
+    start, end = verse_id_to_ordinal(start_id), verse_id_to_ordinal(end_id)
+    if start is None or end is None:
+        return None
+    return end - start
+
+def advance_verse(verse_id, count):
+    """
+    Move a packed verse ID forward (or back) by a number of verses.
+    
+    Args:
+        verse_id (int): Packed verse ID
+        count (int): Verses to move
+        
+    Returns:
+        int: The resulting packed verse ID, clamped to the canon, or None if
+        verse_id is not a verse
+    """
+    ordinal = verse_id_to_ordinal(verse_id)
+    if ordinal is None:
+        return None
+    return ordinal_to_verse_id(min(max(ordinal + count, 1), TOTAL_VERSES))
+
+def expand_range(start_id, end_id):
+    """
+    List every verse in a packed range, across chapter and book boundaries.
+    
+    Args:
+        start_id (int): First packed verse ID
+        end_id (int): Last packed verse ID (inclusive)
+        
+    Returns:
+        list: Packed verse IDs in canonical order; empty if either ID is not a verse
+    """
+    start, end = verse_id_to_ordinal(start_id), verse_id_to_ordinal(end_id)
+    if start is None or end is None:
+        return []
+    return [ordinal_to_verse_id(ordinal) for ordinal in range(start, end + 1)]
+
+def canonical_sort_key(book, chapter, verse=1):
+    """
+    Sort key placing references in canonical Bible order.
+    
+    Args:
+        book (str): Book name
+        chapter (int): Chapter number
+        verse (int, optional): Verse number
+        
+    Returns:
+        tuple: (book number, chapter, verse); unknown books sort last
+    """
+    return (BOOK_NUMBERS.get(book, len(ALL_BOOKS) + 1), chapter, verse or 1)
@@ -0,0 +1,194 @@
+"""
+Bible reference parser producing packed integer verse IDs.
+
+Parses inputs such as "约翰福音 3:16-18", "约3:16", "诗 23", "创 1:1-2:3"
+and lists like "约3:16,18; 4:1" into (start_id, end_id) ranges of packed
+verse IDs (book * 10^6 + chapter * 10^3 + verse, see bible_data), and formats
+such ranges back to text.
+"""
+
+import re
+from functools import lru_cache
+
+from bible_data import (
+    ALL_BOOKS, BIBLE_BOOKS, BOOK_ABBREVIATIONS, get_verse_count, make_verse_id, split_verse_id
+)
+
+
+class InvalidReference(ValueError):
+    """Raised when a reference cannot be parsed or names a nonexistent chapter."""
+
+
+_BOOK_NAMES = dict(BOOK_ABBREVIATIONS)
+_BOOK_NAMES.update({book: book for book in ALL_BOOKS})
+
+# Longest names first so "约翰一书" wins over "约"
+_BOOK_PATTERN = '|'.join(
+    re.escape(name) for name in sorted(_BOOK_NAMES, key=len, reverse=True)
+)
+_SEGMENT_RE = re.compile(
+    r'\s*(?P<book>' + _BOOK_PATTERN + r')?\s*'
+    r'(?P<n1>\d+)(?:\s*[:：.]\s*(?P<n2>\d+))?'
+    r'(?:\s*[-–—~～]\s*(?P<n3>\d+)(?:\s*[:：.]\s*(?P<n4>\d+))?)?\s*$'
+)
+_SEPARATOR_RE = re.compile(r'([;；,，、])')
+
+
+def _verse_id(book, chapter, verse=None):
+    """Packed ID of a verse; verse None means the last verse of the chapter."""
+    if not 1 <= chapter <= BIBLE_BOOKS[book]:
+        raise InvalidReference(f"{book} 没有第 {chapter} 章")
+    verse_count = get_verse_count(book, chapter)
+    if verse is None:
+        verse = verse_count
+    elif not 1 <= verse <= verse_count:
+        raise InvalidReference(f"{book} {chapter} 章没有第 {verse} 节")
+    return make_verse_id(book, chapter, verse)
+
+
+@lru_cache(maxsize=4096)
+def parse_reference(text):
+    """
+    Parse a reference or list of references.
+
+    After ";" a bare "章:节" keeps the previous book; after "," a bare number
+    is another verse in the previous chapter (or another chapter if the
+    previous item was a whole chapter).
+
+    Args:
+        text (str): Reference text
+
+    Returns:
+        tuple: (start_id, end_id) pairs of packed verse IDs, inclusive.
+        Whole chapters run from verse 1 to the chapter's last verse.
+
+    Raises:
+        InvalidReference: If any part of the text cannot be parsed
+    """
+    ranges = []
+    book = None
+    chapter = None
+    verse_level = False
+    separator = ';'
+
+    for part in _SEPARATOR_RE.split(text):
+        if _SEPARATOR_RE.fullmatch(part):
+            separator = ';' if part in ';；' else ','
+            continue
+        if not part.strip():
+            continue
+
+        match = _SEGMENT_RE.match(part)
+        if match is None:
+            raise InvalidReference(f"无法解析经文引用：{part.strip()}")
+
+        n1, n2, n3, n4 = (
+            int(match.group(name)) if match.group(name) else None
+            for name in ('n1', 'n2', 'n3', 'n4')
+        )
+        if match.group('book'):
+            book = _BOOK_NAMES[match.group('book')]
+        elif book is None:
+            raise InvalidReference(f"缺少书卷名：{part.strip()}")
+        elif separator == ',' and n2 is None and (verse_level or BIBLE_BOOKS[book] == 1):
+            # "约3:16,18" or "约3:16,18-20": more verses in the same chapter
+            n1, n2 = chapter, n1
+
+        # Single-chapter books are usually cited by verse alone ("犹 3")
+        if n2 is None and BIBLE_BOOKS[book] == 1 and match.group('book') and n1 != 1:
+            n1, n2 = 1, n1
+
+        if n2 is None:
+            # Whole chapter or chapter range: "诗 23", "诗 23-24", "诗 23-24:3"
+            start = _verse_id(book, n1, 1)
+            last_chapter = n3 if n3 is not None else n1
+            end = _verse_id(book, last_chapter, n4)
+            chapter = last_chapter
+            verse_level = n4 is not None
+        else:
+            start = _verse_id(book, n1, n2)
+            if n3 is None:
+                end = start
+                chapter = n1
+            elif n4 is None:
+                # "3:16-18": verse range in one chapter
+                end = _verse_id(book, n1, n3)
+                chapter = n1
+            else:
+                # "1:1-2:3": range across chapters
+                end = _verse_id(book, n3, n4)
+                chapter = n3
+            verse_level = True
+
+        if end < start:
+            raise InvalidReference(f"经文范围的结尾早于开头：{part.strip()}")
+        ranges.append((start, end))
+        separator = ';'
+
+    if not ranges:
+        raise InvalidReference("经文引用为空")
+    return tuple(ranges)
+
+
+def format_verse_range(start_id, end_id=None):
+    """
+    Format a packed verse range as reference text.
+
+    Args:
+        start_id (int): First packed verse ID
+        end_id (int, optional): Last packed verse ID (inclusive)
+
+    Returns:
+        str: e.g. "约翰福音 3:16-18", "诗篇 23" or "创世记 1:1-2:3"
+    """
+    book, chapter, verse = split_verse_id(start_id)
+    if end_id is None or end_id == start_id:
+        return f"{book} {chapter}:{verse}"
+
+    end_book, end_chapter, end_verse = split_verse_id(end_id)
+    if end_book != book:
+        return f"{book} {chapter}:{verse}-{end_book} {end_chapter}:{end_verse}"
+    if verse == 1 and end_verse == get_verse_count(end_book, end_chapter):
+        if end_chapter == chapter:
+            return f"{book} {chapter}"
+        return f"{book} {chapter}-{end_chapter}"
+    if end_chapter != chapter:
+        return f"{book} {chapter}:{verse}-{end_chapter}:{end_verse}"
+    return f"{book} {chapter}:{verse}-{end_verse}"
+
+
+def format_references(ranges):
+    """
+    Format several packed ranges as one "; "-separated string.
+
+    Args:
+        ranges (iterable): (start_id, end_id) pairs
+
+    Returns:
+        str: The formatted list
+    """
+    return "; ".join(format_verse_range(start, end) for start, end in ranges)
+
+
+def parse_cache_key(key):
+    """
+    Parse a cache key such as "约翰福音_3_16" or "诗篇_1_1_2".
+
+    Args:
+        key (str): Cache key built as book_chapter_start[_end]
+
+    Returns:
+        tuple: (start_id, end_id), or None if the key is not a verse key
+    """
+    parts = key.split('_')
+    if len(parts) not in (3, 4) or parts[0] not in BIBLE_BOOKS:
+        return None
+    try:
+        numbers = [int(part) for part in parts[1:]]
+    except ValueError:
+        return None
+    start = make_verse_id(parts[0], numbers[0], numbers[1])
+    if start is None:
+        return None
+    end = start + numbers[2] - numbers[1] if len(numbers) > 2 else start
+    return start, end
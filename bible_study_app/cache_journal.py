@@ -0,0 +1,343 @@
+"""
+Append-only journal with background compaction for JSON key/value files.
+
+Each change is one JSON line appended to ``<snapshot>.journal``. A background
+thread periodically folds the journal into the snapshot file, and loading
+replays the snapshot followed by the journal.
+
+Several processes may share one journal: appends take a shared lock and the
+compactor takes an exclusive lock only long enough to rotate the journal
+aside, so folding never blocks writers. File locks are used where fcntl is
+available; elsewhere (the Windows desktop app) only threads are serialized.
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Value recorded in the journal when a key is deleted
+TOMBSTONE = None
+
+
+class JournalStore:
+    """Snapshot file plus append-only journal for a dict of JSON values."""
+
+    def __init__(self, snapshot_path, compact_bytes=256 * 1024, compact_interval=30):
+        """
+        Args:
+            snapshot_path (str): Path to the JSON snapshot file
+            compact_bytes (int): Journal size that triggers a compaction
+            compact_interval (int): Seconds between background size checks
+        """
+        self.snapshot_path = snapshot_path
+        self.journal_path = f"{snapshot_path}.journal"
+        self.lock_path = f"{snapshot_path}.lock"
+        self.compact_lock_path = f"{snapshot_path}.compact.lock"
+        self.compact_bytes = compact_bytes
+        self.compact_interval = compact_interval
+
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._lock_fds = {}
+        self._lock_pid = None
+        self._wake = threading.Event()
+        self._compactor = None
+        self._compactor_pid = None
+
+    @contextmanager
+    def _file_lock(self, path=None, exclusive=False, blocking=True):
+        """Hold a cross-process lock file; yields False if not acquired."""
+        if fcntl is None:
+            yield True
+            return
+
+        # flock locks belong to the open file, so each forked worker needs its own
+        if self._lock_pid != os.getpid():
+            self._lock_fds = {}
+            self._lock_pid = os.getpid()
+        path = path or self.lock_path
+        fd = self._lock_fds.get(path)
+        if fd is None:
+            fd = self._lock_fds[path] = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        if not blocking:
+            mode |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(fd, mode)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _rotated_journals(self):
+        """Journals rotated aside by a compaction that has not finished."""
+        return sorted(glob.glob(f"{self.journal_path}.*.rot"))
+
+    @staticmethod
+    def _entries(lines):
+        """Parse journal lines into (key, value) pairs."""
+        for line in lines:
+            try:
+                key, value = json.loads(line)
+            except ValueError:
+                # A torn final line from a crash mid-append
+                continue
+            yield key, value
+
+    @classmethod
+    def _replay(cls, path, data):
+        """Apply the entries of one journal file to data."""
+        with open(path, 'r', encoding='utf-8') as f:
+            cls._apply(cls._entries(f), data)
+
+    @staticmethod
+    def _apply(entries, data):
+        for key, value in entries:
+            if value is TOMBSTONE:
+                data.pop(key, None)
+            else:
+                data[key] = value
+
+    def _read_live(self, offset=0):
+        """
+        Read the complete lines appended to the live journal from an offset.
+
+        A line still being written by another process is left for the next
+        read. The caller holds the shared lock, so the journal is not rotated
+        meanwhile.
+
+        Returns:
+            tuple: (inode, bytes), or (None, b'') if there is no live journal
+        """
+        try:
+            with open(self.journal_path, 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                f.seek(offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return None, b''
+        return inode, chunk[:chunk.rfind(b'\n') + 1]
+
+    def _snapshot_state(self):
+        """(mtime_ns, size, inode) of the snapshot, or None if it does not exist."""
+        try:
+            st = os.stat(self.snapshot_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return {}
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self):
+        """
+        Load the snapshot and replay any journals on top of it.
+
+        Returns:
+            dict: The current contents
+        """
+        return self.load_with_position()[0]
+
+    def load_with_position(self):
+        """
+        Load the contents along with how far the live journal was read.
+
+        The snapshot is read without a lock, so a compaction in another
+        process can replace it and delete the journals it folded in between.
+        That shows up as a changed snapshot once the journals are replayed,
+        and the load is retried.
+
+        Returns:
+            tuple: (contents, position for read_new)
+        """
+        while True:
+            state = self._snapshot_state()
+            data = self._read_snapshot()
+
+            with self._lock, self._file_lock():
+                for path in self._rotated_journals():
+                    try:
+                        self._replay(path, data)
+                    except FileNotFoundError:
+                        pass
+                inode, chunk = self._read_live()
+                self._apply(self._entries(chunk.decode('utf-8').splitlines()), data)
+                # No rotation can happen while the shared lock is held, and a
+                # compaction deletes its journals only after writing the snapshot
+                if self._snapshot_state() == state:
+                    return data, (state, inode, len(chunk))
+
+    def read_new(self, position):
+        """
+        Read the changes appended since a load, without replaying the rest.
+
+        Args:
+            position (tuple): From load_with_position() or an earlier read_new()
+
+        Returns:
+            tuple: (list of (key, value) changes, new position), or None if
+            the journal was rotated or the snapshot replaced since then, in
+            which case the contents have to be loaded again
+        """
+        state, inode, offset = position
+        # Usually nothing changed, which two stats can tell
+        try:
+            journal = os.stat(self.journal_path)
+            current = (journal.st_ino, journal.st_size)
+        except FileNotFoundError:
+            current = (None, 0)
+        if self._snapshot_state() != state:
+            return None
+        if current == (inode, offset):
+            return [], position
+
+        with self._lock, self._file_lock():
+            if self._snapshot_state() != state:
+                return None
+            new_inode, chunk = self._read_live(offset)
+            # A journal started since the load holds only new appends, unless a
+            # compaction has rotated entries aside and not yet written its snapshot
+            if inode is None and new_inode is not None and not self._rotated_journals():
+                inode = new_inode
+        if new_inode != inode:
+            return None
+        changes = list(self._entries(chunk.decode('utf-8').splitlines()))
+        return changes, (state, inode, offset + len(chunk))
+
+    def append(self, key, value):
+        """
+        Record one change as a single appended line.
+
+        Args:
+            key (str): Entry key
+            value: JSON-serializable value, or TOMBSTONE to delete the key
+
+        Returns:
+            int: Bytes appended
+        """
+        line = (json.dumps([key, value], ensure_ascii=False) + '\n').encode('utf-8')
+        with self._lock, self._file_lock():
+            with open(self.journal_path, 'ab') as f:
+                f.write(line)
+        self._ensure_compactor()
+        return len(line)
+
+    def append_many(self, items):
+        """
+        Record several changes with one write.
+
+        Args:
+            items (iterable): (key, value) pairs
+
+        Returns:
+            int: Bytes appended
+        """
+        lines = ''.join(
+            json.dumps([key, value], ensure_ascii=False) + '\n' for key, value in items
+        ).encode('utf-8')
+        if not lines:
+            return 0
+        with self._lock, self._file_lock():
+            with open(self.journal_path, 'ab') as f:
+                f.write(lines)
+        self._ensure_compactor()
+        return len(lines)
+
+    def compact(self):
+        """
+        Fold the journal into the snapshot.
+
+        Returns:
+            bool: True if a compaction ran, False if another one was in progress
+        """
+        if not self._compact_lock.acquire(blocking=False):
+            return False
+        try:
+            with self._file_lock(self.compact_lock_path, exclusive=True, blocking=False) as locked:
+                if not locked:
+                    return False
+                self._fold()
+                return True
+        finally:
+            self._compact_lock.release()
+
+    def _fold(self):
+        # The thread lock is needed too: flock does not exclude threads sharing a file
+        with self._lock, self._file_lock(exclusive=True):
+            # Rotate the live journal aside so writers can keep appending
+            if os.path.exists(self.journal_path):
+                rotated = f"{self.journal_path}.{time.time_ns()}.{os.getpid()}.rot"
+                os.replace(self.journal_path, rotated)
+            rotated_paths = self._rotated_journals()
+
+        if not rotated_paths:
+            return
+
+        data = self._read_snapshot()
+        for path in rotated_paths:
+            self._replay(path, data)
+
+        self.write_snapshot(data)
+        for path in rotated_paths:
+            os.remove(path)
+
+    def write_snapshot(self, data):
+        """
+        Atomically replace the snapshot file.
+
+        Args:
+            data (dict): Full contents to write
+        """
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def request_compaction(self):
+        """Wake the background compactor without waiting for it."""
+        self._ensure_compactor()
+        self._wake.set()
+
+    def _ensure_compactor(self):
+        if self._compactor_pid == os.getpid():
+            return
+        with self._lock:
+            if self._compactor_pid == os.getpid():
+                return
+            self._compactor = threading.Thread(
+                target=self._compact_loop, name='journal-compactor', daemon=True
+            )
+            self._compactor_pid = os.getpid()
+            self._compactor.start()
+
+    def _compact_loop(self):
+        while True:
+            forced = self._wake.wait(self.compact_interval)
+            self._wake.clear()
+            try:
+                size = os.path.getsize(self.journal_path)
+            except OSError:
+                size = 0
+            if forced or size >= self.compact_bytes:
+                try:
+                    self.compact()
+                except Exception as e:
+                    print(f"Error compacting journal: {str(e)}")
@@ -0,0 +1,167 @@
+"""
+Circuit breaker for calls to an unreliable upstream service.
+
+The breaker counts failures (including calls slower than a threshold) in a
+sliding time window. When the count reaches the threshold it opens and
+callers fail fast for a cool-down period. After that a limited number of
+half-open probe calls decide whether it closes again or re-opens.
+"""
+
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Sliding-window circuit breaker with half-open probing."""
+
+    def __init__(self, name, failure_threshold=5, window=60, cool_down=30,
+                 slow_call_threshold=None, half_open_max_calls=1, clock=time.monotonic):
+        """
+        Args:
+            name (str): Name used in logs and listener callbacks
+            failure_threshold (int): Failures within the window that open the circuit
+            window (float): Sliding window length in seconds
+            cool_down (float): Seconds to stay open before probing
+            slow_call_threshold (float, optional): Successful calls slower than
+                this many seconds count as failures
+            half_open_max_calls (int): Concurrent probe calls while half-open
+            clock (callable): Monotonic time source
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.cool_down = cool_down
+        self.slow_call_threshold = slow_call_threshold
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = deque()
+        self._opened_at = None
+        self._probes = 0
+        self._listeners = []
+        self.transitions = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            change = self._maybe_half_open()
+            state = self._state
+        self._notify(change)
+        return state
+
+    def add_listener(self, callback):
+        """
+        Register a callback for state changes.
+
+        Args:
+            callback (callable): Called as callback(name, old_state, new_state)
+        """
+        self._listeners.append(callback)
+
+    def _set_state(self, new_state):
+        # Called with the lock held; listeners run after it is released
+        old_state = self._state
+        if old_state == new_state:
+            return None
+        self._state = new_state
+        self.transitions += 1
+        if new_state == OPEN:
+            self._opened_at = self._clock()
+        elif new_state == CLOSED:
+            self._failures.clear()
+            self._opened_at = None
+        self._probes = 0
+        return old_state, new_state
+
+    def _notify(self, change):
+        if change is None:
+            return
+        old_state, new_state = change
+        print(f"Circuit {self.name}: {old_state} -> {new_state}")
+        for callback in self._listeners:
+            try:
+                callback(self.name, old_state, new_state)
+            except Exception as e:
+                print(f"Error in circuit listener: {str(e)}")
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and self._clock() - self._opened_at >= self.cool_down:
+            return self._set_state(HALF_OPEN)
+        return None
+
+    def allow(self):
+        """
+        Check whether a call may go ahead; reserves a probe slot when half-open.
+
+        Returns:
+            bool: True if the call should be attempted
+        """
+        with self._lock:
+            change = self._maybe_half_open()
+            if self._state == CLOSED:
+                allowed = True
+            elif self._state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                allowed = True
+            else:
+                self.rejected += 1
+                allowed = False
+        self._notify(change)
+        return allowed
+
+    def record_success(self, latency=None):
+        """
+        Report a completed call.
+
+        Args:
+            latency (float, optional): Call duration in seconds
+        """
+        if (self.slow_call_threshold is not None and latency is not None
+                and latency > self.slow_call_threshold):
+            self.record_failure()
+            return
+        with self._lock:
+            change = self._set_state(CLOSED) if self._state == HALF_OPEN else None
+        self._notify(change)
+
+    def record_failure(self):
+        """Report a failed or too-slow call."""
+        with self._lock:
+            now = self._clock()
+            change = None
+            if self._state == HALF_OPEN:
+                change = self._set_state(OPEN)
+            elif self._state == CLOSED:
+                self._failures.append(now)
+                while self._failures and self._failures[0] <= now - self.window:
+                    self._failures.popleft()
+                if len(self._failures) >= self.failure_threshold:
+                    change = self._set_state(OPEN)
+        self._notify(change)
+
+    def stats(self):
+        """
+        Get the breaker's current state and counters.
+
+        Returns:
+            dict: State, recent failures, rejected calls and transitions
+        """
+        with self._lock:
+            change = self._maybe_half_open()
+            stats = {
+                'name': self.name,
+                'state': self._state,
+                'recent_failures': len(self._failures),
+                'rejected': self.rejected,
+                'transitions': self.transitions,
+            }
+        self._notify(change)
+        return stats
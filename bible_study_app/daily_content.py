@@ -0,0 +1,163 @@
+"""
+Daily content shared by the web app and the desktop app.
+
+Builds the day's view model (reading passages, memorization reference and
+text, and the verse's index in the plan) once per (plan, plan revision,
+date) and memoizes it, so page renders and GUI refreshes only read a
+finished, immutable object.
+"""
+
+import datetime
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+from bible_api import get_verse, is_fallback_text
+from bible_data import format_reference
+from ttl_cache import BoundedCache
+
+# Everything either front end shows for one day. verse is a read-only copy of
+# the memorization entry (None if the plan has none) and verse_index its
+# position in the plan, or -1. complete is False when mem_text is an error
+# message standing in for verse text that could not be loaded.
+DailyView = namedtuple('DailyView', [
+    'date', 'day_of_year', 'date_str', 'reading_passages',
+    'verse', 'verse_index', 'mem_ref', 'mem_text', 'has_custom_text', 'complete'
+])
+
+
+class DailyContent:
+    """Memoized daily view models keyed by plan scope, plan revision and date."""
+
+    def __init__(self, max_entries=256, ttl=600):
+        """
+        Args:
+            max_entries (int): Views kept in memory
+            ttl (float): Seconds before a view is rebuilt anyway, so verse
+                text that could not be fetched earlier gets another try
+        """
+        self._views = BoundedCache(max_entries=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self._building = {}
+
+    def get(self, plan, date=None):
+        """
+        Get the view model for a plan and day, building it on first use.
+
+        Args:
+            plan (StudyPlan): The plan to show
+            date (datetime.date, optional): Defaults to today
+
+        Returns:
+            DailyView: The day's content
+        """
+        date = date or datetime.date.today()
+        key = (plan.scope, plan.revision, date)
+        view = self._views.get(key)
+        if view is not None:
+            return view
+
+        # Concurrent requests for the same day wait for one build
+        with self._lock:
+            event = self._building.get(key)
+            leader = event is None
+            if leader:
+                event = self._building[key] = threading.Event()
+        if not leader:
+            event.wait()
+            view = self._views.get(key)
+            if view is not None:
+                return view
+
+        try:
+            view = self.build(plan, date)
+            self._views.put(key, view, size=0)
+            return view
+        finally:
+            if leader:
+                with self._lock:
+                    del self._building[key]
+                event.set()
+
+    @staticmethod
+    def build(plan, date):
+        """
+        Compute the view model without the memo.
+
+        Args:
+            plan (StudyPlan): The plan to show
+            date (datetime.date): The day
+
+        Returns:
+            DailyView: The day's content
+        """
+        reading_passages = tuple(plan.get_daily_reading_passages(date))
+        verses = plan.get_all_memorization_verses()
+        verse_index = plan.get_daily_memorization_index(date)
+        if verse_index is not None and verse_index >= len(verses):
+            # The plan was reloaded in between; take the new list's verse
+            verses = plan.get_all_memorization_verses()
+        verse = None
+        mem_ref = "未设置背诵经文"
+        mem_text = None
+        has_custom_text = False
+        complete = True
+
+        if verse_index is not None:
+            verse = MappingProxyType(dict(verses[verse_index]))
+            try:
+                book = verse['book']
+                chapter = verse['chapter']
+                verse_start = verse['verse_start']
+                verse_end = verse['verse_end']
+
+                mem_ref = format_reference(book, chapter, verse_start, verse_end or None)
+
+                # Check if we have custom text first
+                custom_text = verse.get('custom_text', '')
+                if custom_text:
+                    mem_text = custom_text
+                    has_custom_text = True
+                else:
+                    # Try to get verse text from API or cache
+                    mem_text = get_verse(book, chapter, verse_start, verse_end)
+
+                # Ensure we have text content
+                if not mem_text:
+                    mem_text = f"获取 {mem_ref} 内容时出现问题，请稍后再试。"
+                    complete = False
+                elif not has_custom_text and is_fallback_text(mem_text):
+                    complete = False
+            except Exception as e:
+                mem_ref = "读取经文时出现错误"
+                mem_text = f"应用程序出现问题：{str(e)}"
+                complete = False
+
+        return DailyView(
+            date=date,
+            day_of_year=date.timetuple().tm_yday,
+            date_str=date.strftime("%Y年%m月%d日"),
+            reading_passages=reading_passages,
+            verse=verse,
+            verse_index=-1 if verse_index is None else verse_index,
+            mem_ref=mem_ref,
+            mem_text=mem_text,
+            has_custom_text=has_custom_text,
+            complete=complete
+        )
+
+    def warm(self, plan, date=None):
+        """
+        Build a day's view on a background thread.
+
+        Args:
+            plan (StudyPlan): The plan to show
+            date (datetime.date, optional): Defaults to today
+        """
+        def run():
+            try:
+                self.get(plan, date)
+            except Exception as e:
+                print(f"Error preparing daily content: {str(e)}")
+
+        threading.Thread(target=run, name='daily-content', daemon=True).start()
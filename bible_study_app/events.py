@@ -0,0 +1,64 @@
+"""
+Helpers for the server-sent events channel (/events in web_app).
+
+Browsers keep one idle connection open and the server only writes when
+something meaningful happens: the day rolls over, the study plan changes,
+or today's memorization verse changes. Heartbeat comments keep proxies from
+closing the connection.
+"""
+
+import json
+import threading
+
+
+class ChangeSignal:
+    """Wake every waiting stream when something in this process changed."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._seq = 0
+
+    @property
+    def seq(self):
+        """Number of notifications so far."""
+        return self._seq
+
+    def notify(self):
+        """Wake all waiters."""
+        with self._cond:
+            self._seq += 1
+            self._cond.notify_all()
+
+    def wait(self, seq, timeout):
+        """
+        Wait until a notification newer than seq, or the timeout.
+
+        Args:
+            seq (int): Last sequence number the caller has seen
+            timeout (float): Seconds to wait at most
+
+        Returns:
+            int: The current sequence number
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != seq, timeout)
+            return self._seq
+
+
+def format_event(event, data):
+    """
+    Format one server-sent event.
+
+    Args:
+        event (str): Event name
+        data: JSON-serializable payload
+
+    Returns:
+        str: The event in text/event-stream format
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def format_comment(text=''):
+    """Format a comment line, used as a heartbeat."""
+    return f": {text}\n\n"
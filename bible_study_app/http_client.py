@@ -0,0 +1,149 @@
+"""
+Pooled HTTP client for upstream verse providers.
+
+Each provider gets one keep-alive connection pool, separate connect and read
+timeouts, jittered retries bounded by a per-request time budget, and a cap
+on concurrent upstream calls so a slow provider cannot tie up every worker
+thread.
+"""
+
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class UpstreamError(Exception):
+    """Raised when an upstream request fails after all retries."""
+
+
+class UpstreamBusy(UpstreamError):
+    """Raised when no in-flight slot frees up within the retry budget."""
+
+
+class UpstreamClient:
+    """Keep-alive HTTP client for one upstream provider."""
+
+    def __init__(self, base_url, pool_size=10, connect_timeout=3.05, read_timeout=5,
+                 max_attempts=3, retry_budget=8.0, backoff=0.25, max_in_flight=8):
+        """
+        Args:
+            base_url (str): Provider base URL; request paths are appended to it
+            pool_size (int): Keep-alive connections kept per host
+            connect_timeout (float): Seconds to wait for a connection
+            read_timeout (float): Seconds to wait between bytes of the response
+            max_attempts (int): Attempts per request, including the first
+            retry_budget (float): Total seconds one request may spend, retries included
+            backoff (float): Base delay for exponential backoff with full jitter
+            max_in_flight (int): Concurrent upstream calls allowed per process
+        """
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_attempts = max_attempts
+        self.retry_budget = retry_budget
+        self.backoff = backoff
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        # Pooled sockets must not be shared with forked workers
+        if self._session_pid != os.getpid():
+            with self._lock:
+                if self._session_pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+                    self._session_pid = os.getpid()
+        return self._session
+
+    @staticmethod
+    def _retryable(response):
+        return response.status_code == 429 or response.status_code >= 500
+
+    def get(self, path=''):
+        """
+        GET a path relative to the base URL.
+
+        Args:
+            path (str): Path and query string to append to the base URL
+
+        Returns:
+            requests.Response: The first non-retryable response
+
+        Raises:
+            UpstreamError: If every attempt failed or the budget ran out
+        """
+        url = self.base_url + path
+        deadline = time.monotonic() + self.retry_budget
+        error = None
+
+        for attempt in range(self.max_attempts):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not self._slots.acquire(timeout=remaining):
+                raise UpstreamBusy(f"Too many upstream requests in flight for {self.base_url}")
+            try:
+                # Waiting for a slot spends budget too
+                remaining = max(deadline - time.monotonic(), 0.001)
+                response = self._get_session().get(
+                    url,
+                    timeout=(min(self.connect_timeout, remaining), min(self.read_timeout, remaining))
+                )
+                if not self._retryable(response):
+                    return response
+                error = UpstreamError(f"HTTP {response.status_code}")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            finally:
+                self._slots.release()
+
+            if attempt == self.max_attempts - 1:
+                break
+            # Full jitter: sleep a random slice of the exponential backoff
+            delay = random.uniform(0, self.backoff * (2 ** attempt))
+            if time.monotonic() + delay >= deadline:
+                break
+            time.sleep(delay)
+
+        raise UpstreamError(str(error) if error else "Retry budget exhausted")
+
+    def close(self):
+        """Close pooled connections."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+            self._session_pid = None
+
+
+# One client (and connection pool) per provider name
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name, base_url, **options):
+    """
+    Get the shared client for a provider, creating it on first use.
+
+    Args:
+        name (str): Provider name
+        base_url (str): Provider base URL
+        **options: UpstreamClient options used when the client is created
+
+    Returns:
+        UpstreamClient: The shared client
+    """
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = _clients[name] = UpstreamClient(base_url, **options)
+        return client
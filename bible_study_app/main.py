@@ -12,8 +12,8 @@ import datetime
 from dateutil.relativedelta import relativedelta
 
 import bible_data
-from bible_api import get_verse
-from study_plan import StudyPlan
+from daily_content import DailyContent
+from study_plan import StalePlanError, StudyPlan
 
 class BibleStudyApp:
     def __init__(self, root):
@@ -24,6 +24,7 @@ class BibleStudyApp:
         
         # Load study plan
         self.study_plan = StudyPlan()
+        self.daily_content = DailyContent()
         
         # Get current time and day of year
         self.current_time = datetime.datetime.now()
@@ -252,40 +253,21 @@ class BibleStudyApp:
         # Clear current content
         self.reading_list.delete(0, tk.END)
         
+        view = self.daily_content.get(self.study_plan)
+        
         # Add reading passages
-        for passage in self.study_plan.get_daily_reading_passages():
+        for passage in view.reading_passages:
             self.reading_list.insert(tk.END, passage)
         
-        # Get memorization verse for today
-        verse = self.study_plan.get_daily_memorization_verses()
-        if verse:
-            # Format reference
-            book = verse['book']
-            chapter = verse['chapter']
-            verse_start = verse['verse_start']
-            verse_end = verse['verse_end']
-            
-            if verse_end:
-                ref = f"{book} {chapter}:{verse_start}-{verse_end}"
-            else:
-                ref = f"{book} {chapter}:{verse_start}"
-            
-            self.mem_ref_label.config(text=ref)
-            
-            # Get verse text
-            verse_text = get_verse(book, chapter, verse_start, verse_end)
-            
-            # Display verse text
-            self.mem_text.config(state=tk.NORMAL)
-            self.mem_text.delete(1.0, tk.END)
-            self.mem_text.insert(tk.END, verse_text)
-            self.mem_text.config(state=tk.DISABLED)
+        # Show memorization verse for today
+        self.mem_ref_label.config(text=view.mem_ref)
+        self.mem_text.config(state=tk.NORMAL)
+        self.mem_text.delete(1.0, tk.END)
+        if view.verse is not None:
+            self.mem_text.insert(tk.END, view.mem_text)
         else:
-            self.mem_ref_label.config(text="未设置背诵经文")
-            self.mem_text.config(state=tk.NORMAL)
-            self.mem_text.delete(1.0, tk.END)
             self.mem_text.insert(tk.END, "请在设置选项卡添加经文进行背诵。")
-            self.mem_text.config(state=tk.DISABLED)
+        self.mem_text.config(state=tk.DISABLED)
     
     def load_settings(self):
         """Load current settings into the UI."""
@@ -306,10 +288,16 @@ class BibleStudyApp:
             verse_start = verse['verse_start']
             verse_end = verse['verse_end']
             
-            if verse_end:
-                self.setup_mem_list.insert(tk.END, f"{book} {chapter}:{verse_start}-{verse_end}")
-            else:
-                self.setup_mem_list.insert(tk.END, f"{book} {chapter}:{verse_start}")
+            self.setup_mem_list.insert(
+                tk.END, bible_data.format_reference(book, chapter, verse_start, verse_end or None)
+            )
+    
+    def reload_stale_plan(self, error):
+        """Show another process's newer plan after a change was rejected."""
+        self.study_plan.refresh(force=True)
+        self.load_settings()
+        self.update_daily_content()
+        messagebox.showerror("错误", str(error))
     
     def update_chapter_values(self, event=None):
         """Update chapter values based on selected book."""
@@ -341,7 +329,11 @@ class BibleStudyApp:
             return
         
         # Add to plan
-        success = self.study_plan.add_reading_passage(book, chapter)
+        try:
+            success = self.study_plan.add_reading_passage(book, chapter)
+        except StalePlanError as e:
+            self.reload_stale_plan(e)
+            return
         
         if success:
             messagebox.showinfo("成功", f"已添加 {book} {chapter} 到阅读计划")
@@ -360,7 +352,11 @@ class BibleStudyApp:
         
         # Remove from plan
         index = selected[0]
-        success = self.study_plan.remove_reading_passage(index)
+        try:
+            success = self.study_plan.remove_reading_passage(index)
+        except StalePlanError as e:
+            self.reload_stale_plan(e)
+            return
         
         if success:
             messagebox.showinfo("成功", "已从阅读计划中删除所选章节")
@@ -393,13 +389,15 @@ class BibleStudyApp:
             verse_end = None
         
         # Add to plan
-        success = self.study_plan.add_memorization_verse(book, chapter, verse_start, verse_end)
+        try:
+            success = self.study_plan.add_memorization_verse(book, chapter, verse_start, verse_end)
+        except StalePlanError as e:
+            self.reload_stale_plan(e)
+            return
         
         if success:
-            if verse_end:
-                messagebox.showinfo("成功", f"已添加 {book} {chapter}:{verse_start}-{verse_end} 到背诵计划")
-            else:
-                messagebox.showinfo("成功", f"已添加 {book} {chapter}:{verse_start} 到背诵计划")
+            ref = bible_data.format_reference(book, chapter, verse_start, verse_end)
+            messagebox.showinfo("成功", f"已添加 {ref} 到背诵计划")
             
             self.load_settings()
             self.update_daily_content()
@@ -416,7 +414,11 @@ class BibleStudyApp:
         
         # Remove from plan
         index = selected[0]
-        success = self.study_plan.remove_memorization_verse(index)
+        try:
+            success = self.study_plan.remove_memorization_verse(index)
+        except StalePlanError as e:
+            self.reload_stale_plan(e)
+            return
         
         if success:
             messagebox.showinfo("成功", "已从背诵计划中删除所选经文")
@@ -0,0 +1,281 @@
+"""
+In-process metrics rendered in the Prometheus text format.
+
+Counters, gauges and histograms are created through a Registry and exposed
+by web_app's /metrics route. Updating a metric is a dict lookup and one
+small lock, so instrumentation can stay on in production. Values another
+object already counts (cache statistics, thread counts) are read through a
+function when scraped instead of being mirrored on every call.
+
+Each process keeps its own registry; behind gunicorn a scrape sees the
+worker that answered it, identified by the pid label of process_info.
+"""
+
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Content type of the rendered text
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_value(value):
+    value = float(value)
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if math.isnan(value):
+        return 'NaN'
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class _Value:
+    """Value of one counter or gauge label combination."""
+
+    def __init__(self, lock):
+        self._lock = lock
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+
+class _HistogramValue:
+    """Buckets, sum and count of one histogram label combination."""
+
+    def __init__(self, lock, bounds):
+        self._lock = lock
+        self._bounds = bounds
+        # One count per bucket plus +Inf, not cumulative
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        """Observe the duration of a with block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help, labelnames=(), function=None):
+        """
+        Args:
+            name (str): Metric name
+            help (str): One-line description
+            labelnames (tuple): Label names, in the order labels() takes values
+            function (callable, optional): Read the value when scraped instead;
+                returns a number, or for labelled metrics a dict of label
+                value tuples to numbers
+        """
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def _new_child(self):
+        return _Value(self._lock)
+
+    def labels(self, *values):
+        """Get the value for one label combination, creating it on first use."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _items(self):
+        if self.function is None:
+            with self._lock:
+                return [(values, child.value) for values, child in self._children.items()]
+        value = self.function()
+        return list(value.items()) if isinstance(value, dict) else [((), value)]
+
+    def render(self):
+        """
+        Render the metric.
+
+        Returns:
+            list: Lines in the Prometheus text format
+        """
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        for values, value in self._items():
+            lines.append(f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    type = 'counter'
+
+    def inc(self, amount=1):
+        """Increase the unlabelled counter."""
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    type = 'gauge'
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in fixed buckets."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self._lock, self.buckets)
+
+    def observe(self, value):
+        """Observe a value for the unlabelled histogram."""
+        self.labels().observe(value)
+
+    def time(self):
+        """Observe the duration of a with block for the unlabelled histogram."""
+        return self.labels().time()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        names = self.labelnames + ('le',)
+        with self._lock:
+            children = [
+                (values, list(child.counts), child.sum) for values, child in self._children.items()
+            ]
+        for values, counts, total in children:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(names, values + (_format_value(bound),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    """Named metrics of one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.type}")
+            return metric
+
+    def counter(self, name, help, labelnames=(), function=None):
+        """Get or create a counter."""
+        return self._get_or_create(Counter, name, help, labelnames, function)
+
+    def gauge(self, name, help, labelnames=(), function=None):
+        """Get or create a gauge."""
+        return self._get_or_create(Gauge, name, help, labelnames, function)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Get or create a histogram."""
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def render(self):
+        """
+        Render every metric.
+
+        Returns:
+            str: The Prometheus text exposition
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                print(f"Error collecting metric {metric.name}: {str(e)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _resident_memory():
+    """Resident set size in bytes, or 0 where it cannot be read."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def register_process_metrics(registry):
+    """Add CPU, memory, thread and start-time gauges for this process."""
+    started = time.time()
+    registry.gauge('process_start_time_seconds', 'Start time of the process since the epoch',
+                   function=lambda: started)
+    registry.counter('process_cpu_seconds_total', 'User and system CPU time of the process',
+                     function=lambda: sum(os.times()[:2]))
+    registry.gauge('process_resident_memory_bytes', 'Resident memory of the process',
+                   function=_resident_memory)
+    registry.gauge('process_threads', 'Live Python threads in the process',
+                   function=threading.active_count)
+    registry.gauge('process_info', 'Always 1; labels identify the worker process', ('pid',),
+                   function=lambda: {(str(os.getpid()),): 1})
+
+
+# Shared registry of this process
+registry = Registry()
@@ -0,0 +1,91 @@
+"""
+Cache of rendered pages with strong ETags for conditional requests.
+
+A page is rendered once per key (for the index page: date, plan version,
+role and user) and served from memory until the key changes. Each entry
+carries a strong ETag and the time it was rendered, so repeat visits can be
+answered with 304 Not Modified. The ETag is a hash of the key, so workers
+that cache the same page independently agree on it; the key must therefore
+cover everything the body depends on.
+"""
+
+import datetime
+import hashlib
+from collections import namedtuple
+
+from ttl_cache import BoundedCache
+
+# One rendered page
+CachedPage = namedtuple('CachedPage', ['body', 'etag', 'last_modified'])
+
+
+class PageCache:
+    """Bounded LRU of rendered pages keyed by whatever the page depends on."""
+
+    def __init__(self, max_entries=1000, max_bytes=32 * 1024 * 1024, ttl=None):
+        """
+        Args:
+            max_entries (int): Maximum number of cached pages
+            max_bytes (int): Maximum total size of cached pages
+            ttl (float, optional): Seconds a page stays valid even if its key
+                does not change (e.g. to pick up verse text fetched later)
+        """
+        self._cache = BoundedCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def get(self, key):
+        """
+        Get a cached page.
+
+        Returns:
+            CachedPage: The page, or None if it is not cached
+        """
+        return self._cache.get(key)
+
+    def put(self, key, body):
+        """
+        Cache a rendered page.
+
+        Args:
+            key (tuple): Everything the page content depends on
+            body (str): Rendered HTML
+
+        Returns:
+            CachedPage: The stored page
+        """
+        data = body.encode('utf-8')
+        page = CachedPage(
+            body=data,
+            etag=hashlib.sha256(repr(key).encode('utf-8')).hexdigest()[:32],
+            # HTTP dates have one-second resolution
+            last_modified=datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        )
+        self._cache.put(key, page, size=len(data))
+        return page
+
+    def get_or_render(self, key, render):
+        """
+        Get a cached page, rendering and caching it on a miss.
+
+        Args:
+            key (tuple): Everything the page content depends on
+            render (callable): Returns the page HTML
+
+        Returns:
+            CachedPage: The page
+        """
+        page = self._cache.get(key)
+        if page is None:
+            page = self.put(key, render())
+        return page
+
+    def stats(self):
+        """
+        Get cache counters.
+
+        Returns:
+            dict: Hit, miss and eviction counters plus current size
+        """
+        return self._cache.stats()
@@ -0,0 +1,178 @@
+"""
+Interval index over stored passages, keyed by (book, chapter).
+
+Answers which stored passages contain, overlap, or are closest to a verse
+range. Intervals in a chapter are kept sorted by start verse together with a
+running maximum of end verses, so each query is a binary search plus a walk
+over the matching intervals only.
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+
+
+class _ChapterIntervals:
+    """Sorted verse intervals for one chapter."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._pending = []
+        self.starts = []
+        self.ends = []
+        self.values = []
+        self.max_end = []
+        self.max_end_at = []
+
+    def add(self, verse_start, verse_end, value):
+        self._pending.append((verse_start, verse_end, value))
+
+    def build(self):
+        """Merge pending intervals; call with the lock held."""
+        if not self._pending:
+            return
+        entries = sorted(
+            list(zip(self.starts, self.ends, self.values)) + self._pending,
+            key=lambda entry: (entry[0], entry[1])
+        )
+        self._pending = []
+        self.starts = [entry[0] for entry in entries]
+        self.ends = [entry[1] for entry in entries]
+        self.values = [entry[2] for entry in entries]
+
+        # Running maximum of end verses, and where that maximum came from
+        self.max_end = []
+        self.max_end_at = []
+        best, best_at = 0, -1
+        for i, end in enumerate(self.ends):
+            if end > best:
+                best, best_at = end, i
+            self.max_end.append(best)
+            self.max_end_at.append(best_at)
+
+    def containing(self, verse_start, verse_end):
+        found = []
+        i = bisect_right(self.starts, verse_start) - 1
+        # Stop once no interval starting at or before i reaches verse_end
+        while i >= 0 and self.max_end[i] >= verse_end:
+            if self.ends[i] >= verse_end:
+                found.append(i)
+            i -= 1
+        return sorted(found, key=lambda j: self.ends[j] - self.starts[j])
+
+    def overlapping(self, verse_start, verse_end):
+        found = []
+        i = bisect_right(self.starts, verse_end) - 1
+        while i >= 0 and self.max_end[i] >= verse_start:
+            if self.ends[i] >= verse_start:
+                found.append(i)
+            i -= 1
+
+        def overlap(j):
+            return min(self.ends[j], verse_end) - max(self.starts[j], verse_start)
+        return sorted(found, key=overlap, reverse=True)
+
+    def closest(self, verse_start, verse_end):
+        overlapping = self.overlapping(verse_start, verse_end)
+        if overlapping:
+            return overlapping[0]
+
+        best, best_distance = None, None
+        after = bisect_left(self.starts, verse_start)
+        if after < len(self.starts):
+            best, best_distance = after, self.starts[after] - verse_end
+        if after > 0:
+            before = self.max_end_at[after - 1]
+            distance = verse_start - self.ends[before]
+            if best_distance is None or distance <= best_distance:
+                best = before
+        return best
+
+
+class PassageIndex:
+    """Interval index of passages grouped by (book, chapter)."""
+
+    def __init__(self):
+        self._chapters = {}
+
+    def __len__(self):
+        return sum(
+            len(intervals.starts) + len(intervals._pending)
+            for intervals in self._chapters.values()
+        )
+
+    def add(self, book, chapter, verse_start, verse_end, value):
+        """
+        Index a passage.
+
+        Args:
+            book (str): Bible book name
+            chapter (int): Chapter number
+            verse_start (int): First verse of the passage
+            verse_end (int): Last verse of the passage (inclusive)
+            value: Value returned by queries, e.g. a storage key
+        """
+        intervals = self._chapters.get((book, chapter))
+        if intervals is None:
+            intervals = self._chapters.setdefault((book, chapter), _ChapterIntervals())
+        with intervals.lock:
+            intervals.add(verse_start, verse_end or verse_start, value)
+
+    def add_keys(self, keys):
+        """
+        Index passages named by cache-style keys ("书卷_章_起[_止]").
+
+        Args:
+            keys (iterable): Keys such as "诗篇_23_1" or "诗篇_1_1_2"
+        """
+        for key in keys:
+            parts = key.split('_')
+            if len(parts) not in (3, 4):
+                continue
+            try:
+                numbers = [int(part) for part in parts[1:]]
+            except ValueError:
+                continue
+            verse_end = numbers[2] if len(numbers) > 2 else numbers[1]
+            self.add(parts[0], numbers[0], numbers[1], verse_end, key)
+
+    def _query(self, method, book, chapter, verse_start, verse_end):
+        intervals = self._chapters.get((book, chapter))
+        if intervals is None:
+            return []
+        with intervals.lock:
+            intervals.build()
+            found = getattr(intervals, method)(verse_start, verse_end or verse_start)
+            return [intervals.values[i] for i in found]
+
+    def containing(self, book, chapter, verse_start, verse_end=None):
+        """
+        Passages that fully contain the range, tightest first.
+
+        Returns:
+            list: Values of the matching passages
+        """
+        return self._query('containing', book, chapter, verse_start, verse_end)
+
+    def overlapping(self, book, chapter, verse_start, verse_end=None):
+        """
+        Passages that share at least one verse with the range, largest overlap first.
+
+        Returns:
+            list: Values of the matching passages
+        """
+        return self._query('overlapping', book, chapter, verse_start, verse_end)
+
+    def closest(self, book, chapter, verse_start, verse_end=None):
+        """
+        The passage in the same chapter nearest to the range.
+
+        Returns:
+            The value of the nearest passage, or None if the chapter has none
+        """
+        intervals = self._chapters.get((book, chapter))
+        if intervals is None:
+            return None
+        with intervals.lock:
+            intervals.build()
+            found = intervals.closest(verse_start, verse_end or verse_start)
+            return None if found is None else intervals.values[found]
@@ -0,0 +1,156 @@
+"""
+Password hashing off the request thread.
+
+Hashing and checking passwords is deliberately slow, so it runs in a small
+process pool instead of blocking the worker's request threads. The number of
+hashes waiting or running is bounded: past that, callers get HasherBusyError
+straight away rather than queueing behind a flood of login attempts.
+
+Stored hashes record their method (e.g. "pbkdf2:sha256:260000"), so hashes
+made with older parameters can be upgraded when the user next logs in.
+"""
+
+import os
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Hash method for new hashes, as accepted by werkzeug's generate_password_hash
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+# Hashing processes per worker; 0 hashes on the calling thread
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(2, os.cpu_count() or 1)))
+# Hashes allowed to wait for a free process
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 8))
+# Seconds to wait for one hash
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+
+class HasherBusyError(Exception):
+    """Raised when too many hashes are already queued or one took too long."""
+
+
+def _method_of(pwhash):
+    """The method part of a werkzeug hash string."""
+    return pwhash.split('$', 1)[0] if pwhash and '$' in pwhash else None
+
+
+class PasswordHasher:
+    """Bounded process pool for generate_password_hash / check_password_hash."""
+
+    def __init__(self, method=PASSWORD_HASH_METHOD, workers=PASSWORD_HASH_WORKERS,
+                 max_queue=PASSWORD_HASH_QUEUE, timeout=PASSWORD_HASH_TIMEOUT):
+        """
+        Args:
+            method (str): Hash method for new hashes
+            workers (int): Hashing processes; 0 hashes on the calling thread
+            max_queue (int): Hashes allowed to wait beyond the running ones
+            timeout (float): Seconds to wait for one hash
+        """
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, workers) + max_queue)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+        self._method_id = None
+        self._dummy_hash = None
+        self.rejected = 0
+
+    def _get_pool(self):
+        # A pool is not usable across fork, so each gunicorn worker starts its own
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def start(self):
+        """
+        Start the hashing processes now rather than at the first login.
+
+        Where processes are forked, call this before starting other threads:
+        with the fork start method the pool forks all of its processes on
+        the first submit.
+        """
+        if self.workers:
+            self._run(len, '')
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HasherBusyError("too many password hashes queued")
+        try:
+            future = self._get_pool().submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the hash finishes, even if we stop waiting
+        future.add_done_callback(lambda f: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            raise HasherBusyError("password hash timed out")
+        except BrokenProcessPool:
+            with self._lock:
+                self._pool = None
+            raise
+
+    def hash(self, password):
+        """
+        Hash a password with the configured method.
+
+        Raises:
+            HasherBusyError: If the pool is saturated
+        """
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """
+        Check a password against a stored hash.
+
+        Raises:
+            HasherBusyError: If the pool is saturated
+        """
+        return self._run(check_password_hash, pwhash, password)
+
+    def verify_unknown(self, password):
+        """
+        Check a password for a username that does not exist.
+
+        Costs as much as verify() against a real hash, so response times do
+        not reveal which accounts exist.
+
+        Returns:
+            bool: Always False
+
+        Raises:
+            HasherBusyError: If the pool is saturated
+        """
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash(secrets.token_hex(16))
+        self.verify(self._dummy_hash, password)
+        return False
+
+    def needs_rehash(self, pwhash):
+        """
+        Whether a stored hash was made with other parameters than the current method.
+
+        werkzeug fills in defaults (e.g. the iteration count), so the full
+        method string is taken from one hash made with the current method.
+        """
+        if self._method_id is None:
+            self._method_id = _method_of(self.hash(''))
+        return _method_of(pwhash) != self._method_id
+
+    def shutdown(self):
+        """Stop the hashing processes."""
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
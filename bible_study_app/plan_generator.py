@@ -0,0 +1,261 @@
+"""
+"Bible in a year" reading plan generator.
+
+Splits a selection of books into a fixed number of days, balancing each
+day's load by verse count (or by character count when the offline verse
+store is available) rather than by number of chapters. Days start and end
+on chapter boundaries when there are at least as many chapters as days;
+otherwise (e.g. the New Testament's 260 chapters over 365 days) they are cut
+between verses. The cut points are found by binary search on the running
+total of chapter or verse weights.
+"""
+
+import datetime
+from bisect import bisect_left
+from itertools import accumulate
+
+from bible_data import (
+    ALL_BOOKS, BIBLE_BOOKS, BOOK_ABBREVIATIONS, CHAPTER_VERSE_OFFSETS, NEW_TESTAMENT,
+    OLD_TESTAMENT, chapter_ordinal, get_verse_count, make_verse_id, verse_from_ordinal
+)
+from verse_store import open_store
+
+# Named selections accepted by select_books
+BOOK_SELECTIONS = {
+    'all': ALL_BOOKS,
+    'ot': OLD_TESTAMENT,
+    'nt': NEW_TESTAMENT,
+}
+
+WEIGHTS = ('verses', 'characters', 'chapters')
+
+
+def select_books(selection='all'):
+    """
+    Resolve a book selection to book names in canonical order.
+
+    Args:
+        selection (str or list): "all", "ot", "nt", or book names /
+            abbreviations (a list, or a string separated by commas)
+
+    Returns:
+        list: Book names in canonical order
+
+    Raises:
+        ValueError: If a book name is not recognised
+    """
+    if isinstance(selection, str):
+        named = BOOK_SELECTIONS.get(selection.strip().lower())
+        if named is not None:
+            return list(named)
+        selection = [part for part in selection.replace('，', ',').split(',') if part.strip()]
+
+    chosen = set()
+    for name in selection:
+        name = name.strip()
+        book = BOOK_ABBREVIATIONS.get(name, name)
+        if book not in BIBLE_BOOKS:
+            raise ValueError(f"未知书卷：{name}")
+        chosen.add(book)
+    return [book for book in ALL_BOOKS if book in chosen]
+
+
+def chapter_weights(chapters, weight='verses', store=None):
+    """
+    Reading load of each chapter.
+
+    Args:
+        chapters (list): (book, chapter) pairs
+        weight (str): "verses", "characters" or "chapters"
+        store (VerseStore, optional): Verse text for character counts;
+            the default offline store is opened if not given
+
+    Returns:
+        list: One number per chapter
+
+    Raises:
+        ValueError: If the weight is unknown, or characters are requested
+            without a complete offline verse store
+    """
+    if weight == 'verses':
+        return [get_verse_count(book, chapter) for book, chapter in chapters]
+    if weight == 'chapters':
+        return [1] * len(chapters)
+    if weight != 'characters':
+        raise ValueError(f"未知的分配方式：{weight}")
+
+    return [sum(map(len, texts)) for texts in _chapter_texts(chapters, store)]
+
+
+def verse_weights(chapters, weight='verses', store=None):
+    """
+    Reading load of each verse of the given chapters, in order.
+
+    With "chapters" every chapter weighs 1 in total, spread over its verses.
+
+    Args:
+        chapters (list): (book, chapter) pairs
+        weight (str): "verses", "characters" or "chapters"
+        store (VerseStore, optional): Verse text for character counts
+
+    Returns:
+        list: One number per verse
+
+    Raises:
+        ValueError: As for chapter_weights
+    """
+    if weight == 'characters':
+        return [len(text) for texts in _chapter_texts(chapters, store) for text in texts]
+    if weight not in WEIGHTS:
+        raise ValueError(f"未知的分配方式：{weight}")
+    weights = []
+    for book, chapter in chapters:
+        count = get_verse_count(book, chapter)
+        weights.extend([1 if weight == 'verses' else 1 / count] * count)
+    return weights
+
+
+def _chapter_texts(chapters, store=None):
+    """Yield the verse texts of each chapter from the offline verse store."""
+    store = store or open_store()
+    if store is None:
+        raise ValueError("按字数分配需要离线经文库（见 verse_store.py）")
+    for book, chapter in chapters:
+        texts = store.get_range(
+            make_verse_id(book, chapter, 1),
+            make_verse_id(book, chapter, get_verse_count(book, chapter))
+        )
+        if texts is None:
+            raise ValueError(f"离线经文库缺少 {book} {chapter}")
+        yield texts
+
+
+def split_balanced(weights, days):
+    """
+    Cut a sequence of weights into contiguous groups of near-equal total.
+
+    Each cut is placed at the item boundary (chapter or verse) whose running
+    total is closest to the ideal share, found with bisect on the prefix sums.
+
+    Args:
+        weights (list): Positive weight per item
+        days (int): Number of groups
+
+    Returns:
+        list: (start, end) index pairs, end exclusive, one per day
+
+    Raises:
+        ValueError: If there are fewer items than days
+    """
+    count = len(weights)
+    if days < 1:
+        raise ValueError("天数必须大于 0")
+    if count < days:
+        raise ValueError(f"只有 {count} 段，无法分配到 {days} 天")
+
+    prefix = list(accumulate(weights))
+    total = prefix[-1]
+    bounds = []
+    start = 0
+    for day in range(1, days):
+        target = total * day / days
+        i = bisect_left(prefix, target)
+        # End the day after item i or before it, whichever total is closer
+        before = prefix[i - 1] if i > 0 else 0
+        end = i + 1 if prefix[i] - target <= target - before else i
+        # Every day, including the ones still to come, gets at least one item
+        end = min(max(end, start + 1), count - (days - day))
+        bounds.append((start, end))
+        start = end
+    bounds.append((start, count))
+    return bounds
+
+
+def generate_schedule(days=365, books='all', weight='verses', store=None):
+    """
+    Build a day-by-day reading schedule.
+
+    Args:
+        days (int): Length of the plan in days
+        books (str or list): Book selection, see select_books
+        weight (str): Balance by "verses", "characters" or "chapters"
+        store (VerseStore, optional): Verse text for character weights
+
+    Returns:
+        list: One list of passages per day; a passage is {"book", "chapter"}
+        for a whole chapter, plus "verse_start" and "verse_end" for part of one
+    """
+    chapters = [
+        (book, chapter)
+        for book in select_books(books)
+        for chapter in range(1, BIBLE_BOOKS[book] + 1)
+    ]
+    if not chapters:
+        raise ValueError("没有选择任何书卷")
+    if len(chapters) >= days:
+        weights = chapter_weights(chapters, weight, store)
+        return [
+            [{'book': book, 'chapter': chapter} for book, chapter in chapters[start:end]]
+            for start, end in split_balanced(weights, days)
+        ]
+
+    # Fewer chapters than days: cut between verses, using global verse ordinals
+    ordinals = []
+    for book, chapter in chapters:
+        index = chapter_ordinal(book, chapter) - 1
+        ordinals.extend(range(CHAPTER_VERSE_OFFSETS[index] + 1, CHAPTER_VERSE_OFFSETS[index + 1] + 1))
+    if len(ordinals) < days:
+        raise ValueError(f"只有 {len(ordinals)} 节，无法分配到 {days} 天")
+    weights = verse_weights(chapters, weight, store)
+    return [
+        verse_passages(ordinals[start:end])
+        for start, end in split_balanced(weights, days)
+    ]
+
+
+def verse_passages(ordinals):
+    """
+    Group consecutive verse ordinals into one passage per chapter.
+
+    Args:
+        ordinals (list): Global verse ordinals in canonical order
+
+    Returns:
+        list: {"book", "chapter"} for whole chapters, with "verse_start" and
+        "verse_end" (None for a single verse) added for partial ones
+    """
+    passages = []
+    for ordinal in ordinals:
+        book, chapter, verse = verse_from_ordinal(ordinal)
+        last = passages[-1] if passages else None
+        if last is not None and (last['book'], last['chapter']) == (book, chapter):
+            last['verse_end'] = verse
+        else:
+            passages.append({'book': book, 'chapter': chapter, 'verse_start': verse, 'verse_end': verse})
+    for passage in passages:
+        whole = get_verse_count(passage['book'], passage['chapter'])
+        if passage['verse_start'] == 1 and passage['verse_end'] == whole:
+            del passage['verse_start'], passage['verse_end']
+        elif passage['verse_start'] == passage['verse_end']:
+            passage['verse_end'] = None
+    return passages
+
+
+def apply_schedule(plan, days=365, books='all', weight='verses', start_date=None, store=None):
+    """
+    Generate a schedule and store it in a study plan.
+
+    Args:
+        plan (StudyPlan): Plan to update
+        days (int): Length of the plan in days
+        books (str or list): Book selection, see select_books
+        weight (str): Balance by "verses", "characters" or "chapters"
+        start_date (datetime.date, optional): Day one of the plan; defaults to today
+        store (VerseStore, optional): Verse text for character weights
+
+    Returns:
+        list: The generated schedule
+    """
+    schedule = generate_schedule(days, books, weight, store)
+    plan.set_daily_schedule(schedule, start_date or datetime.date.today())
+    return schedule
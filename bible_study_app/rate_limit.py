@@ -0,0 +1,77 @@
+"""
+Keyed token-bucket rate limiting (e.g. login attempts per IP and per user).
+
+Each key has a bucket holding up to burst tokens that refills at rate tokens
+per second; a call is allowed if it can take one token. Buckets are kept in
+a bounded LRU so a flood of distinct keys cannot grow memory without limit.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class RateLimiter:
+    """Token bucket per key."""
+
+    def __init__(self, rate, burst, max_keys=100000, clock=time.monotonic):
+        """
+        Args:
+            rate (float): Tokens added per second
+            burst (int): Bucket capacity, i.e. calls allowed at once
+            max_keys (int): Buckets kept; the least recently used are dropped
+            clock (callable): Monotonic time source
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (tokens, time of last update)
+        self._buckets = OrderedDict()
+        self.rejected = 0
+
+    def _tokens(self, key, now):
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def allow(self, key, cost=1):
+        """
+        Take tokens from a key's bucket if it has enough.
+
+        Args:
+            key: Bucket key, e.g. a client IP or username
+            cost (float): Tokens this call needs
+
+        Returns:
+            bool: True if the call is allowed
+        """
+        with self._lock:
+            now = self._clock()
+            tokens = self._tokens(key, now)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            else:
+                self.rejected += 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed
+
+    def retry_after(self, key, cost=1):
+        """
+        Seconds until a key's bucket will have enough tokens.
+
+        Returns:
+            float: 0 if a call would be allowed now
+        """
+        with self._lock:
+            missing = cost - self._tokens(key, self._clock())
+        return max(0.0, missing / self.rate) if self.rate else float('inf')
+
+    def reset(self, key):
+        """Refill a key's bucket, e.g. after a successful login."""
+        with self._lock:
+            self._buckets.pop(key, None)
@@ -0,0 +1,181 @@
+"""
+Full-text verse search with a character n-gram inverted index.
+
+Chinese text is indexed by overlapping character bigrams (plus single
+characters for one-character queries), so no word segmenter is needed.
+Each posting list is a bytearray of varint-encoded doc ID gaps. Documents
+only ever get increasing IDs, so new verses are appended to the lists as
+they arrive.
+"""
+
+import heapq
+import math
+import re
+import threading
+from array import array
+
+# Characters worth indexing: CJK ideographs, letters and digits
+_TOKEN_CHARS = re.compile(r'[㐀-鿿豈-﫿A-Za-z0-9]+')
+
+
+def _encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_postings(data):
+    """Yield the doc IDs stored as varint gaps in data."""
+    doc_id = 0
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        doc_id += value
+        yield doc_id
+        value = 0
+        shift = 0
+
+
+def ngrams(text):
+    """
+    Split text into the set of unigrams and bigrams that get indexed.
+
+    Args:
+        text (str): Verse or query text
+
+    Returns:
+        set: Character n-grams; bigrams never span punctuation or spaces
+    """
+    grams = set()
+    for run in _TOKEN_CHARS.findall(text.lower()):
+        grams.update(run)
+        grams.update(run[i:i + 2] for i in range(len(run) - 1))
+    return grams
+
+
+class SearchIndex:
+    """Incrementally updated inverted index over verse texts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs = {}
+        self._doc_starts = array('I')
+        self._doc_ends = array('I')
+        self._doc_lengths = array('H')
+        self._postings = {}
+        self._last_doc = {}
+        self._counts = {}
+
+    def __len__(self):
+        return len(self._doc_starts)
+
+    def __contains__(self, verse_range):
+        return verse_range in self._docs
+
+    def add(self, start_id, end_id, text):
+        """
+        Index a verse or passage; already indexed ranges are skipped.
+
+        Args:
+            start_id (int): First packed verse ID
+            end_id (int): Last packed verse ID (inclusive)
+            text (str): Passage text
+
+        Returns:
+            bool: True if the passage was added
+        """
+        grams = ngrams(text)
+        with self._lock:
+            if (start_id, end_id) in self._docs:
+                return False
+            # Doc IDs start at 1 so the first gap is never zero
+            doc_id = len(self._doc_starts) + 1
+            self._docs[(start_id, end_id)] = doc_id
+            self._doc_starts.append(start_id)
+            self._doc_ends.append(end_id)
+            self._doc_lengths.append(min(len(text), 0xFFFF))
+
+            for gram in grams:
+                postings = self._postings.get(gram)
+                if postings is None:
+                    postings = self._postings[gram] = bytearray()
+                _encode_varint(doc_id - self._last_doc.get(gram, 0), postings)
+                self._last_doc[gram] = doc_id
+                self._counts[gram] = self._counts.get(gram, 0) + 1
+        return True
+
+    def search(self, query, limit=20):
+        """
+        Rank indexed passages against a query.
+
+        Bigrams are weighted by inverse document frequency; single-character
+        queries fall back to unigrams. Passages must match at least half the
+        query's weight, and shorter passages rank higher on ties.
+
+        Args:
+            query (str): Search text
+            limit (int): Maximum number of results
+
+        Returns:
+            list: (start_id, end_id, score) tuples, best first
+        """
+        grams = ngrams(query)
+        bigrams = {gram for gram in grams if len(gram) == 2}
+        terms = bigrams or grams
+        if not terms:
+            return []
+
+        with self._lock:
+            total = len(self._doc_starts)
+            postings = [
+                (bytes(self._postings[gram]), self._counts[gram])
+                for gram in terms if gram in self._postings
+            ]
+            doc_starts = self._doc_starts
+            doc_ends = self._doc_ends
+            doc_lengths = self._doc_lengths
+
+        if not postings:
+            return []
+
+        scores = {}
+        max_score = 0.0
+        for data, count in postings:
+            weight = math.log(1 + total / count)
+            max_score += weight
+            for doc_id in _decode_postings(data):
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight
+        # Terms missing from the index count against the query too
+        max_score += math.log(1 + total) * (len(terms) - len(postings))
+
+        threshold = max_score / 2
+        ranked = heapq.nlargest(
+            limit,
+            (
+                (score / max_score, -doc_lengths[doc_id - 1], doc_id)
+                for doc_id, score in scores.items() if score >= threshold
+            )
+        )
+        return [
+            (doc_starts[doc_id - 1], doc_ends[doc_id - 1], round(score, 4))
+            for score, _, doc_id in ranked
+        ]
+
+    def stats(self):
+        """
+        Get index size figures.
+
+        Returns:
+            dict: Document, term and posting-byte counts
+        """
+        with self._lock:
+            return {
+                'documents': len(self._doc_starts),
+                'terms': len(self._postings),
+                'posting_bytes': sum(len(data) for data in self._postings.values()),
+            }
@@ -0,0 +1,738 @@
+"""
+Pluggable storage for plans, users and the verse cache.
+
+Each store is a table of JSON values keyed by string. Two backends provide
+the same table interface:
+
+- json (default, used by the desktop app): one JSON file per table, as
+  before. The verse cache and users tables append changes to a journal
+  (see cache_journal.py) instead of rewriting the file.
+- sqlite: one database in WAL mode shared by every table, with row-level
+  upserts and indexed lookups, safe for concurrent gunicorn workers.
+
+Tables can be split into scopes (one study plan per user or group): a JSON
+scope is its own file under DATA_DIR/<table>/, a SQLite scope is the rows
+whose keys start with "<scope>/".
+
+Select the backend with the BIBLE_STUDY_STORAGE environment variable
+("json" or "sqlite"). Existing JSON files can be copied into the database
+with ``python storage.py migrate``.
+
+Every table reports a generation token that changes whenever any process
+writes it, so in-memory copies can detect that they are stale, and
+compare_and_put() refuses to overwrite a newer version.
+"""
+
+import abc
+import glob
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from cache_journal import JournalStore, TOMBSTONE
+from metrics import registry
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Data directory
+DATA_DIR = os.environ.get('BIBLE_STUDY_DATA_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+os.makedirs(DATA_DIR, exist_ok=True)
+
+STORAGE_BACKEND = os.environ.get('BIBLE_STUDY_STORAGE', 'json').lower()
+SQLITE_FILE = os.environ.get('BIBLE_STUDY_DB', os.path.join(DATA_DIR, 'bible_study.db'))
+
+# Tables and the fields they are looked up by
+TABLES = {
+    'study_plan': (),
+    'plans': (),
+    'users': ('username',),
+    'verse_cache': (),
+    'counters': (),
+}
+
+# JSON tables written through a journal rather than rewritten on each change
+JOURNALED_TABLES = ('verse_cache', 'users')
+
+# Changed keys a journaled table remembers for changes()
+JOURNAL_CHANGE_HISTORY = 1024
+
+# Writes per table, labelled with the table name (save_plan, save_users and
+# save_cache all end up here)
+_write_seconds = registry.histogram(
+    'storage_write_duration_seconds', 'Time to write rows to a table', ('table',)
+)
+_write_bytes = registry.counter(
+    'storage_write_bytes_total', 'Bytes written to a table', ('table',)
+)
+_compact_seconds = registry.histogram(
+    'storage_compact_duration_seconds', 'Time to compact a table', ('table',)
+)
+
+
+def _record_write(table, started, size):
+    """Record one write that began at perf_counter() time `started`."""
+    _write_seconds.labels(table).observe(time.perf_counter() - started)
+    if size:
+        _write_bytes.labels(table).inc(size)
+
+
+# Scope names double as file names
+_SCOPE_RE = re.compile(r'^[\w-]{1,64}$')
+
+
+class ConflictError(Exception):
+    """Raised by compare_and_put when the table changed since the expected generation."""
+
+
+@contextmanager
+def _exclusive_lock(path):
+    """Hold an exclusive lock file across processes (threads only where fcntl is missing)."""
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _stat(path):
+    """(mtime_ns, size, inode) of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _reindex(indexes, key, old, new):
+    """Update the built field indexes for one row changing from old to new."""
+    for field, index in indexes.items():
+        if isinstance(old, dict) and index.get(old.get(field)) == key:
+            del index[old[field]]
+        if isinstance(new, dict) and new.get(field) is not None:
+            index.setdefault(new[field], key)
+
+
+class _MemoryTable(abc.ABC):
+    """
+    Lookups for tables held in memory as a dict.
+
+    Fields listed in indexes are looked up through a value -> key map built
+    on first use and dropped whenever the rows are reloaded. Indexed fields
+    are expected to be unique.
+    """
+
+    @abc.abstractmethod
+    def _rows(self):
+        """Current rows as a key -> value dict, loaded if needed; called under _lock."""
+
+    def find(self, field, value):
+        """
+        Find the first row whose value has value[field] == value.
+
+        Returns:
+            tuple: (key, value), or None if no row matches
+        """
+        with self._lock:
+            rows = self._rows()
+            if field in self.indexes:
+                index = self._indexes.get(field)
+                if index is None:
+                    index = self._indexes[field] = {}
+                    for key, row in rows.items():
+                        _reindex({field: index}, key, None, row)
+                key = index.get(value)
+                return (key, rows[key]) if key is not None else None
+            for key, row in rows.items():
+                if isinstance(row, dict) and row.get(field) == value:
+                    return key, row
+        return None
+
+
+class JsonTable(_MemoryTable):
+    """
+    Table kept in one JSON file that is rewritten atomically on every change.
+
+    The file's (mtime, size, inode) is its generation; the in-memory copy is
+    re-read whenever that changes, which costs one stat per access.
+    """
+
+    def __init__(self, path, indexes=(), indent=2, lock_path=None, name=None):
+        """
+        Args:
+            path (str): Path to the JSON file
+            indexes (tuple): Fields find() looks up by
+            indent (int): Indentation of the written file
+            lock_path (str, optional): Lock file serializing writers; defaults to <path>.lock
+            name (str, optional): Table name for metrics; defaults to the file name
+        """
+        self.path = path
+        self.name = name or os.path.splitext(os.path.basename(path))[0]
+        self.indexes = indexes
+        self.indent = indent
+        self.lock_path = lock_path or f"{path}.lock"
+        self._lock = threading.RLock()
+        self._data = None
+        self._generation = None
+        self._indexes = {}
+
+    def generation(self):
+        """
+        Get a token that changes whenever the file is rewritten.
+
+        Returns:
+            tuple: (mtime_ns, size, inode), or None if the file does not exist
+        """
+        return _stat(self.path)
+
+    def _rows(self):
+        generation = self.generation()
+        if self._data is None or generation != self._generation:
+            self._data = {}
+            self._generation = generation
+            self._indexes = {}
+            if generation is not None:
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._data = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"Error loading {self.path}: {str(e)}")
+        return self._data
+
+    def _write(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=self.indent)
+        os.replace(tmp_path, self.path)
+        self._generation = self.generation()
+        return self._generation
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rows())
+
+    def load(self):
+        """
+        Read the whole table.
+
+        Returns:
+            dict: Key to value
+        """
+        with self._lock:
+            return dict(self._rows())
+
+    def get(self, key):
+        """Get one value, or None if the key is missing."""
+        with self._lock:
+            return self._rows().get(key)
+
+    def put(self, key, value):
+        """Insert or replace one row."""
+        self.put_many([(key, value)])
+
+    def put_many(self, items):
+        """
+        Insert or replace several rows in one write.
+
+        Args:
+            items (iterable): (key, value) pairs; a value of TOMBSTONE deletes the key
+
+        Returns:
+            The table's new generation
+        """
+        return self.compare_and_put(items, None, check=False)
+
+    def compare_and_put(self, items, generation, check=True):
+        """
+        Write several rows only if the table is still at the given generation.
+
+        Args:
+            items (iterable): (key, value) pairs as for put_many
+            generation: Generation the caller's copy was read at
+
+        Returns:
+            The table's new generation
+
+        Raises:
+            ConflictError: If another writer changed the table since then
+        """
+        started = time.perf_counter()
+        with self._lock, _exclusive_lock(self.lock_path):
+            rows = self._rows()
+            if check and self._generation != generation:
+                raise ConflictError(f"{self.path} was changed by another writer")
+            for key, value in items:
+                _reindex(self._indexes, key, rows.get(key), value)
+                if value is TOMBSTONE:
+                    rows.pop(key, None)
+                else:
+                    rows[key] = value
+            new_generation = self._write()
+        # The whole file is rewritten, so its size is what was written
+        _record_write(self.name, started, new_generation[1] if new_generation else 0)
+        return new_generation
+
+    def delete(self, key):
+        """Delete one row if it exists."""
+        self.put_many([(key, TOMBSTONE)])
+
+    def compact(self):
+        """Nothing to do; every change is already in the file."""
+
+    def close(self):
+        """Nothing to release for a JSON file."""
+
+
+class JournalTable(_MemoryTable):
+    """
+    JSON table whose changes are appended to a journal (see JournalStore).
+
+    get() and find() keep the replayed rows in memory. Later appends, by
+    this process or others, are read from where the last read stopped and
+    applied to the rows and indexes in place; only a compaction or a
+    replaced snapshot makes the whole table load again. load() alone does
+    not keep a copy.
+    """
+
+    def __init__(self, path, indexes=(), name=None):
+        self.name = name or os.path.splitext(os.path.basename(path))[0]
+        self.indexes = indexes
+        self.journal = JournalStore(path)
+        self.write_lock_path = f"{path}.write.lock"
+        self._lock = threading.RLock()
+        self._data = None
+        self._position = None
+        self._indexes = {}
+        # Change counter, the count at the last full load, and (count, key) of recent changes
+        self._seq = 0
+        self._loaded_seq = 0
+        self._recent = deque(maxlen=JOURNAL_CHANGE_HISTORY)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rows())
+
+    def generation(self):
+        """
+        Get a token that changes whenever any process writes the table.
+
+        Compaction changes it too, without changing the contents.
+
+        Returns:
+            tuple: Snapshot and journal file states, or None if neither exists
+        """
+        generation = (_stat(self.journal.snapshot_path), _stat(self.journal.journal_path))
+        return None if generation == (None, None) else generation
+
+    def _rows(self):
+        if self._data is not None:
+            changes = self.journal.read_new(self._position)
+            if changes is not None:
+                entries, self._position = changes
+                for key, value in entries:
+                    _reindex(self._indexes, key, self._data.get(key), value)
+                    if value is TOMBSTONE:
+                        self._data.pop(key, None)
+                    else:
+                        self._data[key] = value
+                    self._seq += 1
+                    self._recent.append((self._seq, key))
+                return self._data
+        self._data, self._position = self.journal.load_with_position()
+        self._indexes = {}
+        self._seq += 1
+        self._loaded_seq = self._seq
+        self._recent.clear()
+        return self._data
+
+    def changes(self, since):
+        """
+        Keys changed since an earlier call, for callers caching derived objects.
+
+        Args:
+            since (int): Counter returned by the previous call, or None
+
+        Returns:
+            tuple: (counter, keys); keys is a set, or None if the table was
+            reloaded or too many keys changed and everything may differ
+        """
+        with self._lock:
+            self._rows()
+            if since is None or since < self._loaded_seq or (
+                    self._recent and self._recent[0][0] > since + 1):
+                return self._seq, None
+            return self._seq, {key for seq, key in self._recent if seq > since}
+
+    def load(self):
+        with self._lock:
+            if self._data is not None:
+                return dict(self._rows())
+        return self.journal.load()
+
+    def get(self, key):
+        with self._lock:
+            return self._rows().get(key)
+
+    def compare_and_put(self, items, generation, check=True):
+        """
+        Append changes unless the table changed since the given generation.
+
+        Writers using compare_and_put exclude each other; put() and delete()
+        do not wait for them, but any append still changes the generation.
+
+        Returns:
+            The table's new generation
+
+        Raises:
+            ConflictError: If the table was written since then
+        """
+        with self._lock, _exclusive_lock(self.write_lock_path):
+            if check and self.generation() != generation:
+                raise ConflictError(f"{self.journal.snapshot_path} was changed by another writer")
+            self.put_many(items)
+            return self.generation()
+
+    def put(self, key, value):
+        started = time.perf_counter()
+        _record_write(self.name, started, self.journal.append(key, value))
+
+    def put_many(self, items):
+        started = time.perf_counter()
+        _record_write(self.name, started, self.journal.append_many(items))
+
+    def delete(self, key):
+        started = time.perf_counter()
+        _record_write(self.name, started, self.journal.append(key, TOMBSTONE))
+
+    def compact(self):
+        """Fold the journal into the snapshot file."""
+        with _compact_seconds.labels(self.name).time():
+            self.journal.compact()
+
+    def close(self):
+        """Nothing to release; the journal files are opened per write."""
+
+
+class SqliteDatabase:
+    """SQLite database in WAL mode with one connection per thread."""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Database file path
+        """
+        self.path = path
+        self._local = threading.local()
+        self._created = set()
+        self._created_lock = threading.Lock()
+
+    def connect(self):
+        """
+        Get this thread's connection, opening it on first use.
+
+        Connections are not shared across forks: a gunicorn worker opens
+        its own after the fork.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """Close this thread's connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def create_table(self, name, indexes):
+        """Create a table and its indexes once per database object."""
+        with self._created_lock:
+            if name in self._created:
+                return
+            columns = ''.join(f', "{field}" TEXT' for field in indexes)
+            conn = self.connect()
+            # One counter per table (or scope), bumped in the same transaction as each write
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS _versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)'
+            )
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" (key TEXT PRIMARY KEY, value TEXT NOT NULL{columns})'
+            )
+            for field in indexes:
+                conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS "{name}_{field}" ON "{name}" ("{field}")'
+                )
+            self._created.add(name)
+
+
+class SqliteTable:
+    """Table of JSON values stored as rows, with indexed lookup columns."""
+
+    def __init__(self, database, name, indexes=(), scope=None):
+        """
+        Args:
+            database (SqliteDatabase): Database holding the table
+            name (str): Table name
+            indexes (tuple): Fields of each value copied into indexed columns
+            scope (str, optional): Only see rows of this scope
+        """
+        self.database = database
+        self.name = name
+        self.indexes = indexes
+        self.scope = scope
+        # Scoped keys are "<scope>/<key>"; "0" sorts right after "/"
+        self._prefix = f"{scope}/" if scope else ""
+        self._version_name = f"{name}/{scope}" if scope else name
+        database.create_table(name, indexes)
+
+        placeholders = ', ?' * len(indexes)
+        column_names = ''.join(f', "{field}"' for field in indexes)
+        self._upsert = (
+            f'INSERT OR REPLACE INTO "{name}" (key, value{column_names}) '
+            f'VALUES (?, ?{placeholders})'
+        )
+
+    def _row(self, key, value):
+        fields = tuple(
+            value.get(field) if isinstance(value, dict) else None for field in self.indexes
+        )
+        return (self._prefix + key, json.dumps(value, ensure_ascii=False)) + fields
+
+    def _where_scope(self):
+        """SQL condition and parameters selecting this table's scope."""
+        if not self.scope:
+            return '1', ()
+        return 'key >= ? AND key < ?', (self._prefix, f"{self.scope}0")
+
+    def __len__(self):
+        conn = self.database.connect()
+        where, params = self._where_scope()
+        return conn.execute(
+            f'SELECT COUNT(*) FROM "{self.name}" WHERE {where}', params
+        ).fetchone()[0]
+
+    def generation(self, conn=None):
+        """
+        Get the table's write counter.
+
+        Returns:
+            int: Number of committed writes, or None if never written
+        """
+        conn = conn or self.database.connect()
+        row = conn.execute(
+            'SELECT version FROM _versions WHERE name = ?', (self._version_name,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def load(self):
+        conn = self.database.connect()
+        where, params = self._where_scope()
+        skip = len(self._prefix)
+        return {
+            key[skip:]: json.loads(value)
+            for key, value in conn.execute(
+                f'SELECT key, value FROM "{self.name}" WHERE {where}', params
+            )
+        }
+
+    def get(self, key):
+        conn = self.database.connect()
+        row = conn.execute(
+            f'SELECT value FROM "{self.name}" WHERE key = ?', (self._prefix + key,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find(self, field, value):
+        if field not in self.indexes:
+            raise ValueError(f"{self.name} has no index on {field}")
+        conn = self.database.connect()
+        where, params = self._where_scope()
+        row = conn.execute(
+            f'SELECT key, value FROM "{self.name}" WHERE "{field}" = ? AND {where} LIMIT 1',
+            (value,) + params
+        ).fetchone()
+        return (row[0][len(self._prefix):], json.loads(row[1])) if row else None
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def put_many(self, items):
+        return self.compare_and_put(items, None, check=False)
+
+    def compare_and_put(self, items, generation, check=True):
+        started = time.perf_counter()
+        size = 0
+        conn = self.database.connect()
+        # BEGIN IMMEDIATE takes the write lock, so the check and the write are atomic
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if check and self.generation(conn) != generation:
+                raise ConflictError(f"{self.name} was changed by another writer")
+            for key, value in items:
+                if value is TOMBSTONE:
+                    conn.execute(
+                        f'DELETE FROM "{self.name}" WHERE key = ?', (self._prefix + key,)
+                    )
+                else:
+                    row = self._row(key, value)
+                    size += len(row[1].encode('utf-8'))
+                    conn.execute(self._upsert, row)
+            conn.execute(
+                'INSERT INTO _versions (name, version) VALUES (?, 1) '
+                'ON CONFLICT(name) DO UPDATE SET version = version + 1',
+                (self._version_name,)
+            )
+            new_generation = self.generation(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        _record_write(self.name, started, size)
+        return new_generation
+
+    def delete(self, key):
+        self.put_many([(key, TOMBSTONE)])
+
+    def compact(self):
+        """Checkpoint the WAL back into the database file."""
+        with _compact_seconds.labels(self.name).time():
+            self.database.connect().execute('PRAGMA wal_checkpoint(PASSIVE)')
+
+    def close(self):
+        self.database.close()
+
+
+_database = None
+_database_lock = threading.Lock()
+
+
+def get_database():
+    """Get the shared SQLite database, creating it on first use."""
+    global _database
+    with _database_lock:
+        if _database is None:
+            _database = SqliteDatabase(SQLITE_FILE)
+        return _database
+
+
+def check_scope(scope):
+    """
+    Validate a scope name.
+
+    Raises:
+        ValueError: If the name is empty, too long or not a safe file name
+    """
+    if not isinstance(scope, str) or not _SCOPE_RE.match(scope):
+        raise ValueError(f"Invalid scope: {scope!r}")
+    return scope
+
+
+def json_table(name, scope=None):
+    """
+    Open a table from its JSON file in DATA_DIR, whatever the backend.
+
+    Args:
+        name (str): Table name, one of TABLES
+        scope (str, optional): Open DATA_DIR/<name>/<scope>.json instead
+
+    Returns:
+        JsonTable or JournalTable: The table
+    """
+    if scope:
+        directory = os.path.join(DATA_DIR, name)
+        os.makedirs(directory, exist_ok=True)
+        # One lock file per directory rather than one per scope
+        return JsonTable(
+            os.path.join(directory, f'{check_scope(scope)}.json'),
+            TABLES[name],
+            lock_path=os.path.join(directory, '.lock'),
+            name=name
+        )
+    path = os.path.join(DATA_DIR, f'{name}.json')
+    if name in JOURNALED_TABLES:
+        return JournalTable(path, TABLES[name], name)
+    return JsonTable(path, TABLES[name], name=name)
+
+
+def open_table(name, scope=None, backend=None):
+    """
+    Open a table with the configured backend.
+
+    Args:
+        name (str): Table name, one of TABLES
+        scope (str, optional): Only see this scope's rows, e.g. one user's plan
+        backend (str, optional): "json" or "sqlite"; defaults to STORAGE_BACKEND
+
+    Returns:
+        A table with load, get, find, put, put_many, compare_and_put,
+        delete, generation and compact
+    """
+    backend = backend or STORAGE_BACKEND
+    if backend == 'sqlite':
+        scope = check_scope(scope) if scope else None
+        return SqliteTable(get_database(), name, TABLES[name], scope)
+    if backend == 'json':
+        return json_table(name, scope)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def json_scopes(name):
+    """List the scopes that have a JSON file under DATA_DIR/<name>/."""
+    return sorted(
+        os.path.splitext(os.path.basename(path))[0]
+        for path in glob.glob(os.path.join(DATA_DIR, name, '*.json'))
+    )
+
+
+def migrate(database_path=None):
+    """
+    Copy the JSON files in DATA_DIR into a SQLite database.
+
+    Rows already in the database are replaced by the JSON values.
+
+    Args:
+        database_path (str, optional): Target database; defaults to SQLITE_FILE
+
+    Returns:
+        dict: Number of rows copied per table
+    """
+    database = SqliteDatabase(database_path or SQLITE_FILE)
+    counts = {}
+    for name, indexes in TABLES.items():
+        counts[name] = 0
+        # Unscoped rows from DATA_DIR/<name>.json, then each DATA_DIR/<name>/<scope>.json
+        for scope in [None] + json_scopes(name):
+            rows = json_table(name, scope).load()
+            if rows:
+                SqliteTable(database, name, indexes, scope).put_many(rows.items())
+            counts[name] += len(rows)
+    database.close()
+    return counts
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'migrate':
+        print("Usage: python storage.py migrate [database]")
+        sys.exit(1)
+    target = sys.argv[2] if len(sys.argv) > 2 else SQLITE_FILE
+    for table, count in migrate(target).items():
+        print(f"{table}: {count} rows")
+    print(f"Migrated to {target}")
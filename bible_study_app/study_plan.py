@@ -2,16 +2,30 @@
 Study plan module to manage Bible reading and memorization plans.
 """
 
-import json
+import atexit
+import copy
+import itertools
 import os
 import datetime
-from bible_data import format_reference, ALL_BOOKS, get_book_chapters
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from bible_data import format_reference, ALL_BOOKS, get_book_chapters, get_verse_count
+from storage import ConflictError, open_table
 
 # Data directory
-DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DATA_DIR = os.environ.get('BIBLE_STUDY_DATA_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
 os.makedirs(DATA_DIR, exist_ok=True)
+# Used by the json storage backend
 PLAN_FILE = os.path.join(DATA_DIR, 'study_plan.json')
 
+# Readers check storage for changes by other processes at most this often (seconds)
+PLAN_CHECK_INTERVAL = float(os.environ.get('PLAN_CHECK_INTERVAL', 1))
+
+# Live per-user/group plans kept in memory by PlanRegistry
+PLAN_CACHE_SIZE = int(os.environ.get('PLAN_CACHE_SIZE', 1000))
+
 # Default study plan
 DEFAULT_PLAN = {
     "reading_passages": [
@@ -23,42 +37,309 @@ DEFAULT_PLAN = {
 }
 
 
+# Plan revisions come from one counter per process, so a plan that is evicted
+# and loaded again never repeats a revision an earlier instance used
+_revisions = itertools.count(1)
+
+
+class StalePlanError(Exception):
+    """Raised when a change is rejected because another process saved the plan first."""
+
+
+def _passage_key(passage):
+    return (passage.get('book'), passage.get('chapter'))
+
+
+def _verse_key(verse):
+    return (verse.get('book'), verse.get('chapter'), verse.get('verse_start'), verse.get('verse_end'))
+
+
+def _merge_entries(base, ours, theirs, key):
+    """
+    Three-way merge of plan entries identified by key.
+    
+    Args:
+        base (list): Entries both sides started from
+        ours (list): Entries after our changes
+        theirs (list): Entries after the other side's changes
+        key (callable): Identity of an entry
+        
+    Returns:
+        list: theirs without the entries we removed, with the entries we
+        changed replaced and the ones we added appended
+    """
+    base_entries = {key(entry): entry for entry in base}
+    our_entries = {key(entry): entry for entry in ours}
+    removed = base_entries.keys() - our_entries.keys()
+    changed = {k: entry for k, entry in our_entries.items() if base_entries.get(k) != entry}
+    merged = [changed.pop(key(entry), entry) for entry in theirs if key(entry) not in removed]
+    merged.extend(changed.values())
+    return merged
+
+
 class StudyPlan:
-    def __init__(self):
+    def __init__(self, scope=None, autosave=True):
+        """
+        Args:
+            scope (str, optional): User or group the plan belongs to; None is
+                the shared plan
+            autosave (bool): Save after every transaction; if False changes
+                stay in memory until flush()
+        """
+        self.scope = scope
+        self.autosave = autosave
         self.reading_passages = []
         self.memorization_verses = []
+        # Generated plan: one list of passages per day, starting on schedule_start
+        self.daily_schedule = []
+        self.schedule_start = None
+        # (book, chapter) -> number of reading passages with that key
+        self._passage_keys = Counter()
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._dirty = False
+        # Plan as last loaded or saved, kept while there are unsaved changes (see flush)
+        self._base = None
+        self.store = open_table('plans', scope) if scope else open_table('study_plan')
+        # Storage generation the in-memory plan was loaded or saved at
+        self.generation = None
+        # Changes on every load and every committed change, saved or not;
+        # unique across all plans in the process (see _revisions)
+        self.revision = 0
+        self._checked_at = 0
         self.load_plan()
     
     def load_plan(self):
-        """Load study plan from file or create a default one if it doesn't exist."""
-        if os.path.exists(PLAN_FILE):
-            try:
-                with open(PLAN_FILE, 'r', encoding='utf-8') as f:
-                    plan_data = json.load(f)
-                    self.reading_passages = plan_data.get('reading_passages', [])
-                    self.memorization_verses = plan_data.get('memorization_verses', [])
-            except:
-                # If there's an error loading, use defaults
-                self.set_default_plan()
+        """Load study plan from storage or create a default one if it doesn't exist."""
+        # Read the generation first: a write in between only makes us reload again later
+        self.generation = self.store.generation()
+        self.revision = next(_revisions)
+        self._checked_at = time.monotonic()
+        self._base = None
+        try:
+            plan_data = self.store.load()
+        except Exception as e:
+            print(f"Error loading study plan: {str(e)}")
+            plan_data = {}
+        
+        if plan_data:
+            self.reading_passages = plan_data.get('reading_passages', [])
+            self.memorization_verses = plan_data.get('memorization_verses', [])
+            self.daily_schedule = plan_data.get('daily_schedule', [])
+            self.schedule_start = plan_data.get('schedule_start')
+            self._index_passages()
         else:
-            # If no file exists, use defaults
-            self.set_default_plan()
+            # If nothing is stored yet, show the defaults; they are written with the
+            # first change, so merely reading a plan never creates one
+            self._use_defaults()
+    
+    def _use_defaults(self):
+        self.reading_passages = copy.deepcopy(DEFAULT_PLAN['reading_passages'])
+        self.memorization_verses = copy.deepcopy(DEFAULT_PLAN['memorization_verses'])
+        self.daily_schedule = []
+        self.schedule_start = None
+        self._index_passages()
     
     def set_default_plan(self):
-        """Set the default study plan."""
-        self.reading_passages = DEFAULT_PLAN['reading_passages']
-        self.memorization_verses = DEFAULT_PLAN['memorization_verses']
-        self.save_plan()
+        """Reset the study plan to the defaults and save it."""
+        self._use_defaults()
+        try:
+            self.save_plan()
+        except StalePlanError:
+            # Another process created the plan first; use theirs
+            self.load_plan()
+    
+    def refresh(self, force=False):
+        """
+        Reload the plan if another process has saved a newer version.
+        
+        Costs at most one stat (or one indexed query) per PLAN_CHECK_INTERVAL.
+        
+        Args:
+            force (bool): Check storage now instead of waiting for the interval
+            
+        Returns:
+            bool: True if the plan was reloaded
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < PLAN_CHECK_INTERVAL:
+            return False
+        with self._lock:
+            # Never swap the plan out from under an open transaction or unsaved changes
+            if self._depth or self._dirty:
+                return False
+            self._checked_at = now
+            if self.store.generation() == self.generation:
+                return False
+            self.load_plan()
+            return True
+    
+    def _index_passages(self):
+        """Rebuild the duplicate-detection index of reading passages."""
+        self._passage_keys = Counter(
+            (passage['book'], passage['chapter']) for passage in self.reading_passages
+        )
+    
+    def validate_plan(self, baseline=None):
+        """
+        Check that every passage and verse in the plan refers to a real chapter and verse.
+        
+        Args:
+            baseline (tuple, optional): (reading passages, memorization verses,
+                daily schedule) from before a change; entries already there are
+                not checked again, so an old stored entry that fails the check
+                does not block unrelated changes
+        
+        Raises:
+            ValueError: Describing the first invalid entry
+        """
+        old_passages, old_verses, old_schedule = baseline or ((), (), None)
+        known = {_passage_key(passage) for passage in old_passages}
+        passages = [
+            passage for passage in self.reading_passages if _passage_key(passage) not in known
+        ]
+        if self.daily_schedule is not old_schedule:
+            passages += [passage for day in self.daily_schedule for passage in day]
+        for passage in passages:
+            book, chapter = passage.get('book'), passage.get('chapter')
+            if book not in ALL_BOOKS or not 1 <= chapter <= get_book_chapters(book):
+                raise ValueError(f"Invalid reading passage: {book} {chapter}")
+            # Generated schedules may cut a chapter between verses
+            verse_start, verse_end = passage.get('verse_start'), passage.get('verse_end')
+            if verse_start is not None and not (
+                    1 <= verse_start <= (verse_end or verse_start) <= get_verse_count(book, chapter)):
+                raise ValueError(f"Invalid reading passage: {book} {chapter}:{verse_start}")
+        
+        known = {_verse_key(verse) for verse in old_verses}
+        for verse in self.memorization_verses:
+            if _verse_key(verse) in known:
+                continue
+            book, chapter = verse.get('book'), verse.get('chapter')
+            if book not in ALL_BOOKS or not 1 <= chapter <= get_book_chapters(book):
+                raise ValueError(f"Invalid memorization verse: {book} {chapter}")
+            verse_count = get_verse_count(book, chapter)
+            verse_start, verse_end = verse.get('verse_start'), verse.get('verse_end')
+            if not 1 <= verse_start <= verse_count or (
+                    verse_end is not None and not verse_start <= verse_end <= verse_count):
+                raise ValueError(f"Invalid memorization verse: {book} {chapter}:{verse_start}")
     
     def save_plan(self):
-        """Save the current study plan to file."""
-        plan_data = {
-            'reading_passages': self.reading_passages,
-            'memorization_verses': self.memorization_verses
-        }
+        """
+        Save the current study plan; both sections are written in one atomic update.
+        
+        Raises:
+            StalePlanError: If another process saved the plan since it was loaded
+        """
+        try:
+            self.generation = self.store.compare_and_put([
+                ('reading_passages', self.reading_passages),
+                ('memorization_verses', self.memorization_verses),
+                ('daily_schedule', self.daily_schedule),
+                ('schedule_start', self.schedule_start)
+            ], self.generation)
+        except ConflictError:
+            raise StalePlanError("学习计划已被其他人修改，请刷新页面后重试") from None
+        self._dirty = False
+        self._base = None
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Group several changes into one validated write.
+        
+        Mutators called inside the block only change memory; the plan is
+        validated and saved once when the outermost block exits; only entries
+        the block added or changed are validated. If the block raises, or
+        validation fails, every change made in it is rolled back.
         
-        with open(PLAN_FILE, 'w', encoding='utf-8') as f:
-            json.dump(plan_data, f, ensure_ascii=False, indent=2)
+        The plan is refreshed from storage when the block starts; if another
+        process saves in the meantime, the write raises StalePlanError and the
+        plan is reloaded instead of overwriting the newer version.
+        
+        Example:
+            with plan.transaction():
+                for book, chapter in chapters:
+                    plan.add_reading_passage(book, chapter)
+        """
+        with self._lock:
+            outermost = self._depth == 0
+            if outermost:
+                self.refresh(force=True)
+                snapshot = (
+                    copy.deepcopy(self.reading_passages),
+                    copy.deepcopy(self.memorization_verses),
+                    # The schedule is only ever replaced as a whole, never edited in place
+                    self.daily_schedule,
+                    self.schedule_start,
+                    self._dirty
+                )
+                if not self._dirty:
+                    self._base = snapshot[:4]
+            self._depth += 1
+            try:
+                yield self
+                if outermost and self._dirty:
+                    self.validate_plan(snapshot[:3])
+                    if self.autosave:
+                        self.save_plan()
+                    self.revision = next(_revisions)
+            except StalePlanError:
+                if outermost:
+                    self.load_plan()
+                raise
+            except BaseException:
+                if outermost:
+                    (self.reading_passages, self.memorization_verses, self.daily_schedule,
+                     self.schedule_start, self._dirty) = snapshot
+                    self._index_passages()
+                raise
+            finally:
+                self._depth -= 1
+    
+    @property
+    def dirty(self):
+        """True if there are changes that have not been saved."""
+        return self._dirty
+    
+    def flush(self):
+        """
+        Save unsaved changes; only needed for plans opened with autosave=False.
+        
+        If another process saved the plan in the meantime, its version is
+        loaded and the unsaved changes are merged into it before saving again.
+        
+        Raises:
+            StalePlanError: If the merged plan could not be saved either
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            # Each change was validated when its transaction committed
+            try:
+                self.save_plan()
+            except StalePlanError:
+                if self._base is None:
+                    raise
+                self._rebase()
+                self.save_plan()
+    
+    def _rebase(self):
+        """Reload the stored plan and reapply the changes made since self._base."""
+        base_passages, base_verses, base_schedule, base_start = self._base
+        passages, verses = self.reading_passages, self.memorization_verses
+        schedule, schedule_start = self.daily_schedule, self.schedule_start
+        
+        self.load_plan()
+        self.reading_passages = _merge_entries(
+            base_passages, passages, self.reading_passages, _passage_key
+        )
+        self.memorization_verses = _merge_entries(
+            base_verses, verses, self.memorization_verses, _verse_key
+        )
+        if (schedule, schedule_start) != (base_schedule, base_start):
+            self.daily_schedule, self.schedule_start = schedule, schedule_start
+        self._index_passages()
+        self._dirty = True
     
     def add_reading_passage(self, book, chapter):
         """
@@ -73,18 +354,18 @@ class StudyPlan:
         if chapter < 1 or chapter > max_chapters:
             return False
         
-        # Check if it already exists
-        for passage in self.reading_passages:
-            if passage['book'] == book and passage['chapter'] == chapter:
+        with self.transaction():
+            # Check if it already exists
+            if self._passage_keys[(book, chapter)]:
                 return False
-        
-        # Add to plan
-        self.reading_passages.append({
-            'book': book,
-            'chapter': chapter
-        })
-        
-        self.save_plan()
+            
+            # Add to plan
+            self.reading_passages.append({
+                'book': book,
+                'chapter': chapter
+            })
+            self._passage_keys[(book, chapter)] += 1
+            self._dirty = True
         return True
     
     def remove_reading_passage(self, index):
@@ -94,11 +375,13 @@ class StudyPlan:
         Args:
             index (int): Index of the passage to remove
         """
-        if 0 <= index < len(self.reading_passages):
-            self.reading_passages.pop(index)
-            self.save_plan()
-            return True
-        return False
+        with self.transaction():
+            if not 0 <= index < len(self.reading_passages):
+                return False
+            passage = self.reading_passages.pop(index)
+            self._passage_keys[(passage['book'], passage['chapter'])] -= 1
+            self._dirty = True
+        return True
     
     def add_memorization_verse(self, book, chapter, verse_start, verse_end=None, custom_text=""):
         """
@@ -116,20 +399,23 @@ class StudyPlan:
         if chapter < 1 or chapter > max_chapters:
             return False
         
-        # Simple validation for verses
-        if verse_start < 1 or (verse_end is not None and verse_end < verse_start):
+        # Validate verses against the chapter's verse count
+        verse_count = get_verse_count(book, chapter)
+        if not 1 <= verse_start <= verse_count:
+            return False
+        if verse_end is not None and not verse_start <= verse_end <= verse_count:
             return False
             
         # Add to plan
-        self.memorization_verses.append({
-            'book': book,
-            'chapter': chapter,
-            'verse_start': verse_start,
-            'verse_end': verse_end,
-            'custom_text': custom_text
-        })
-        
-        self.save_plan()
+        with self.transaction():
+            self.memorization_verses.append({
+                'book': book,
+                'chapter': chapter,
+                'verse_start': verse_start,
+                'verse_end': verse_end,
+                'custom_text': custom_text
+            })
+            self._dirty = True
         return True
     
     def remove_memorization_verse(self, index):
@@ -139,11 +425,12 @@ class StudyPlan:
         Args:
             index (int): Index of the verse to remove
         """
-        if 0 <= index < len(self.memorization_verses):
+        with self.transaction():
+            if not 0 <= index < len(self.memorization_verses):
+                return False
             self.memorization_verses.pop(index)
-            self.save_plan()
-            return True
-        return False
+            self._dirty = True
+        return True
     
     def update_verse_text(self, index, custom_text):
         """
@@ -156,40 +443,117 @@ class StudyPlan:
         Returns:
             bool: True if successful, False otherwise
         """
-        if 0 <= index < len(self.memorization_verses):
+        with self.transaction():
+            if not 0 <= index < len(self.memorization_verses):
+                return False
             self.memorization_verses[index]['custom_text'] = custom_text
-            self.save_plan()
-            return True
-        return False
+            self._dirty = True
+        return True
+    
+    def set_daily_schedule(self, schedule, start_date):
+        """
+        Replace the generated day-by-day reading schedule (see plan_generator.py).
+        
+        Args:
+            schedule (list): One list of {"book", "chapter"} passages per day
+            start_date (datetime.date): Day one of the schedule
+        """
+        with self.transaction():
+            self.daily_schedule = schedule
+            self.schedule_start = start_date.isoformat()
+            self._dirty = True
+        return True
     
-    def get_daily_reading_passages(self):
+    def clear_daily_schedule(self):
+        """Remove the generated schedule so the reading list is used again."""
+        with self.transaction():
+            if not self.daily_schedule:
+                return False
+            self.daily_schedule = []
+            self.schedule_start = None
+            self._dirty = True
+        return True
+    
+    def get_schedule_day(self, date=None):
+        """
+        Get the schedule day index for a date.
+        
+        The schedule repeats once it runs out, and dates before its start
+        count back from its end.
+        
+        Args:
+            date (datetime.date, optional): Defaults to today
+            
+        Returns:
+            int: Zero-based day index, or None if there is no schedule
+        """
+        if not self.daily_schedule:
+            return None
+        date = date or datetime.date.today()
+        start = datetime.date.fromisoformat(self.schedule_start)
+        return (date - start).days % len(self.daily_schedule)
+    
+    def get_daily_reading_passages(self, date=None):
         """
         Get the list of reading passages for today.
         
+        With a generated schedule this is that day's slice; otherwise every
+        passage in the reading list.
+        
+        Args:
+            date (datetime.date, optional): Defaults to today
+            
         Returns:
             list: List of reading passage references
         """
+        self.refresh()
+        day = self.get_schedule_day(date)
+        if day is not None:
+            return [
+                format_reference(
+                    passage['book'], passage['chapter'],
+                    passage.get('verse_start'), passage.get('verse_end')
+                )
+                for passage in self.daily_schedule[day]
+            ]
         return [
             format_reference(passage['book'], passage['chapter'])
             for passage in self.reading_passages
         ]
     
-    def get_daily_memorization_verses(self):
+    def get_daily_memorization_index(self, date=None):
         """
-        Get the memorization verse for today based on current date.
+        Get the position of today's memorization verse in the plan.
         
+        Args:
+            date (datetime.date, optional): Defaults to today
+            
         Returns:
-            dict: A verse reference dictionary
+            int: Index into the memorization verses, or None if there are none
         """
-        # If no verses are set, return None
+        self.refresh()
         if not self.memorization_verses:
             return None
-            
+        
         # Select verse based on day of year
-        today = datetime.datetime.now()
+        today = date or datetime.date.today()
         day_of_year = today.timetuple().tm_yday
-        verse_index = (day_of_year - 1) % len(self.memorization_verses)
+        return (day_of_year - 1) % len(self.memorization_verses)
+    
+    def get_daily_memorization_verses(self, date=None):
+        """
+        Get the memorization verse for today based on current date.
         
+        Args:
+            date (datetime.date, optional): Defaults to today
+            
+        Returns:
+            dict: A verse reference dictionary
+        """
+        verse_index = self.get_daily_memorization_index(date)
+        # If no verses are set, return None
+        if verse_index is None:
+            return None
         return self.memorization_verses[verse_index]
         
     def get_all_reading_passages(self):
@@ -199,6 +563,7 @@ class StudyPlan:
         Returns:
             list: List of all reading passages
         """
+        self.refresh()
         return self.reading_passages
         
     def get_all_memorization_verses(self):
@@ -208,4 +573,109 @@ class StudyPlan:
         Returns:
             list: List of all memorization verses
         """
-        return self.memorization_verses 
\ No newline at end of file
+        self.refresh()
+        return self.memorization_verses 
+
+
+class PlanRegistry:
+    """
+    Memory-bounded LRU of live StudyPlan objects keyed by scope.
+    
+    Plans are loaded on first access and the least recently used one is
+    dropped once more than max_plans are live; unsaved changes are written
+    back before a plan is dropped, and again at interpreter exit. A plan
+    whose changes cannot be written back stays in memory and is tried again
+    the next time a plan is evicted.
+    """
+    
+    def __init__(self, max_plans=PLAN_CACHE_SIZE, autosave=True):
+        """
+        Args:
+            max_plans (int): Plans kept in memory
+            autosave (bool): Passed to each StudyPlan
+        """
+        self.max_plans = max_plans
+        self.autosave = autosave
+        self._plans = OrderedDict()
+        # scope -> lock held while that scope's plan is being loaded
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+        self.write_back_failures = 0
+        atexit.register(self.flush_all)
+    
+    def __len__(self):
+        return len(self._plans)
+    
+    def get(self, scope=None):
+        """
+        Get the plan for a scope, loading it if it is not in memory.
+        
+        Plans are loaded and written back outside the registry lock; requests
+        for a scope that is being loaded wait for that one load.
+        
+        Args:
+            scope (str, optional): User or group name; None is the shared plan
+            
+        Returns:
+            StudyPlan: The live plan
+        """
+        with self._lock:
+            plan = self._lookup(scope)
+            if plan is not None:
+                return plan
+            loading = self._loading.setdefault(scope, threading.Lock())
+        
+        with loading:
+            with self._lock:
+                plan = self._lookup(scope)
+            if plan is not None:
+                return plan
+            
+            plan = StudyPlan(scope, autosave=self.autosave)
+            evicted = []
+            with self._lock:
+                self._plans[scope] = plan
+                self._loading.pop(scope, None)
+                self.loads += 1
+                while len(self._plans) > self.max_plans:
+                    evicted.append(self._plans.popitem(last=False)[1])
+                    self.evictions += 1
+        
+        for old_plan in evicted:
+            if not self._write_back(old_plan):
+                self._keep(old_plan)
+        return plan
+    
+    def _lookup(self, scope):
+        plan = self._plans.get(scope)
+        if plan is not None:
+            self._plans.move_to_end(scope)
+        return plan
+    
+    def _write_back(self, plan):
+        try:
+            plan.flush()
+            return True
+        except Exception as e:
+            self.write_back_failures += 1
+            print(f"Error saving study plan {plan.scope or 'default'}: {str(e)}")
+            return False
+    
+    def _keep(self, plan):
+        """Put back an evicted plan whose changes could not be saved; it is retried first next time."""
+        with self._lock:
+            if plan.scope in self._plans:
+                # The scope was loaded again meanwhile; that copy is what requests now see
+                print(f"Unsaved changes to study plan {plan.scope or 'default'} were lost")
+                return
+            self._plans[plan.scope] = plan
+            self._plans.move_to_end(plan.scope, last=False)
+    
+    def flush_all(self):
+        """Save every live plan that has unsaved changes."""
+        with self._lock:
+            plans = list(self._plans.values())
+        for plan in plans:
+            self._write_back(plan)
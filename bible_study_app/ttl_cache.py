@@ -0,0 +1,209 @@
+"""
+Bounded LRU cache with per-entry expiry and typed negative entries.
+"""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# A remembered failure; stored instead of user-facing error text
+NegativeEntry = namedtuple('NegativeEntry', ['reason'])
+
+
+class BoundedCache:
+    """
+    Thread-safe LRU cache bounded by entry count and approximate byte size.
+
+    Positive and negative entries have separate TTLs. Expired entries are
+    dropped lazily when they are read, and the least recently used entries
+    are evicted whenever a budget is exceeded.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, ttl=None, negative_ttl=300,
+                 clock=time.monotonic, record_dropped=False):
+        """
+        Args:
+            max_entries (int, optional): Maximum number of entries
+            max_bytes (int, optional): Maximum total size of stored text in bytes
+            ttl (float, optional): Seconds a positive entry stays valid
+            negative_ttl (float, optional): Seconds a negative entry stays valid
+            clock (callable): Monotonic time source
+            record_dropped (bool): Remember evicted and expired keys until
+                pop_dropped() is called, so a persistent copy can follow
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._dropped = [] if record_dropped else None
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _sizeof(value):
+        if isinstance(value, str):
+            return len(value.encode('utf-8'))
+        if isinstance(value, NegativeEntry):
+            return len(value.reason)
+        return 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self._lookup(key, count=False) is not None
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def _lookup(self, key, count=True):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return None
+
+            value, expires_at, size = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._data[key]
+                self._bytes -= size
+                self.expirations += 1
+                self._record_drop(key, value)
+                if count:
+                    self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            if count:
+                if isinstance(value, NegativeEntry):
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+            return value
+
+    def get(self, key, default=None):
+        """
+        Look up a key, refreshing its recency.
+
+        Args:
+            key (str): Cache key
+            default: Value returned on a miss
+
+        Returns:
+            The stored value (possibly a NegativeEntry), or default
+        """
+        value = self._lookup(key)
+        return default if value is None else value
+
+    def put(self, key, value, ttl=None, size=None):
+        """
+        Store a value, evicting least recently used entries if needed.
+
+        Args:
+            key (str): Cache key
+            value: Value to store
+            ttl (float, optional): Override the default TTL for this entry
+            size (int, optional): Size in bytes for values other than text
+        """
+        if ttl is None:
+            ttl = self.negative_ttl if isinstance(value, NegativeEntry) else self.ttl
+        expires_at = self._clock() + ttl if ttl else None
+        if size is None:
+            size = self._sizeof(value)
+
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            self._evict()
+
+    def put_negative(self, key, reason):
+        """
+        Remember that a lookup failed.
+
+        Args:
+            key (str): Cache key
+            reason (str): Short machine-readable failure reason
+        """
+        self.put(key, NegativeEntry(reason))
+
+    def pop(self, key, default=None):
+        """Remove a key and return its value."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            self._bytes -= entry[2]
+            return entry[0]
+
+    def _evict(self):
+        while self._data and (
+            (self.max_entries and len(self._data) > self.max_entries) or
+            (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            key, (value, _, size) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            self._record_drop(key, value)
+
+    def _record_drop(self, key, value):
+        if self._dropped is not None and not isinstance(value, NegativeEntry):
+            self._dropped.append(key)
+
+    def pop_dropped(self):
+        """
+        Take the positive keys evicted or expired since the last call.
+
+        Returns:
+            list: Dropped keys, oldest first; empty unless record_dropped was set
+        """
+        with self._lock:
+            if not self._dropped:
+                return []
+            dropped, self._dropped = self._dropped, []
+            return dropped
+
+    def items(self):
+        """Snapshot of (key, value) pairs for positive, unexpired entries."""
+        now = self._clock()
+        with self._lock:
+            return [
+                (key, value) for key, (value, expires_at, _) in self._data.items()
+                if not isinstance(value, NegativeEntry)
+                and (expires_at is None or expires_at > now)
+            ]
+
+    def stats(self):
+        """
+        Get cache counters.
+
+        Returns:
+            dict: Hit, miss, eviction and expiry counters plus current size
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(self._data),
+                'bytes': self._bytes,
+            }
@@ -0,0 +1,208 @@
+"""
+User accounts for the web app.
+
+Lookups by username go through the users table's index (an in-memory map
+for the JSON backend, an indexed column for SQLite), and recently used User
+objects are kept in a small per-process LRU so restoring a session does not
+rebuild one on every request. When the table can tell which rows changed
+(the JSON backend's journal), only those users are dropped from the LRU;
+otherwise it is dropped whenever the table changes, including writes by
+other workers.
+
+Usernames are kept unique across workers by creating users with
+compare_and_put, which fails if another worker wrote the table between the
+username check and the write.
+
+User ids come from a counter in the counters table, so an id is never
+handed out twice, even after the newest account has been deleted.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from flask_login import UserMixin
+
+from storage import ConflictError, open_table
+
+# User objects kept in memory per process
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+
+
+class User(UserMixin):
+    def __init__(self, id, username, password_hash, is_admin=False, plan=None):
+        self.id = id
+        self.username = username
+        self.password_hash = password_hash
+        self.is_admin = is_admin
+        # 学习计划分组，None 表示公共计划
+        self.plan = plan
+
+    @classmethod
+    def from_row(cls, user_id, row):
+        """Build a User from its stored row."""
+        return cls(
+            id=user_id,
+            username=row['username'],
+            password_hash=row['password_hash'],
+            is_admin=row.get('is_admin', False),
+            plan=row.get('plan')
+        )
+
+
+class UserStore:
+    """Users table with username lookup, cached User objects and id allocation."""
+
+    def __init__(self, table=None, counters=None, cache_size=USER_CACHE_SIZE):
+        """
+        Args:
+            table: Users table; defaults to open_table('users')
+            counters: Table holding the id counter; defaults to open_table('counters')
+            cache_size (int): Maximum number of cached User objects
+        """
+        self.table = table if table is not None else open_table('users')
+        self.counters = counters if counters is not None else open_table('counters')
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._users = OrderedDict()
+        self._generation = None
+        self._changes_seen = None
+
+    def __len__(self):
+        return len(self.table)
+
+    def _check_generation(self):
+        """Drop cached users whose rows were written since they were read."""
+        if hasattr(self.table, 'changes'):
+            self._changes_seen, changed = self.table.changes(self._changes_seen)
+            if changed is None:
+                self._users.clear()
+            else:
+                for user_id in changed:
+                    self._users.pop(user_id, None)
+            return
+        generation = self.table.generation()
+        if generation != self._generation:
+            self._users.clear()
+            self._generation = generation
+
+    def _remember(self, user):
+        self._users[user.id] = user
+        self._users.move_to_end(user.id)
+        while len(self._users) > self.cache_size:
+            self._users.popitem(last=False)
+        return user
+
+    def get(self, user_id):
+        """
+        Get a user by id.
+
+        Returns:
+            User: The user, or None if there is no such user
+        """
+        with self._lock:
+            self._check_generation()
+            user = self._users.get(user_id)
+            if user is not None:
+                self._users.move_to_end(user_id)
+                return user
+            row = self.table.get(user_id)
+            return self._remember(User.from_row(user_id, row)) if row else None
+
+    def find_by_username(self, username):
+        """
+        Get a user by username.
+
+        Returns:
+            User: The user, or None if there is no such user
+        """
+        found = self.table.find('username', username)
+        return self.get(found[0]) if found else None
+
+    def _next_id(self):
+        """
+        Allocate a new user id.
+
+        The counter starts above the highest existing id the first time, and
+        compare-and-put keeps two workers from taking the same id.
+        """
+        while True:
+            generation = self.counters.generation()
+            last = self.counters.get('users')
+            if last is None:
+                last = max((int(key) for key in self.table.load() if key.isdigit()), default=0)
+            try:
+                self.counters.compare_and_put([('users', last + 1)], generation)
+                return str(last + 1)
+            except ConflictError:
+                continue
+
+    def create(self, username, password_hash, is_admin=False, plan=None):
+        """
+        Add a user.
+
+        Args:
+            username (str): Unique username
+            password_hash (str): Hashed password
+            is_admin (bool): Whether the user is an administrator
+            plan (str, optional): Study plan scope of the user's group
+
+        Returns:
+            User: The new user
+
+        Raises:
+            ValueError: If the username is taken
+        """
+        user_id = None
+        row = {
+            'username': username,
+            'password_hash': password_hash,
+            'is_admin': is_admin,
+            'plan': plan
+        }
+        while True:
+            # Read the generation first, so a user created after the check is noticed
+            generation = self.table.generation()
+            if self.table.find('username', username):
+                raise ValueError("用户名已存在")
+            user_id = user_id or self._next_id()
+            try:
+                self.table.compare_and_put([(user_id, row)], generation)
+                return User(user_id, username, password_hash, is_admin, plan)
+            except ConflictError:
+                continue
+
+    def update(self, user_id, **changes):
+        """
+        Change stored fields of a user.
+
+        Args:
+            user_id (str): User id
+            **changes: Fields to set, e.g. password_hash
+
+        Returns:
+            User: The updated user, or None if there is no such user
+        """
+        row = self.table.get(user_id)
+        if row is None:
+            return None
+        row = dict(row, **changes)
+        self.table.put(user_id, row)
+        with self._lock:
+            self._users.pop(user_id, None)
+        return User.from_row(user_id, row)
+
+    def delete(self, user_id):
+        """Delete a user; its id is not reused."""
+        self.table.delete(user_id)
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def stats(self):
+        """
+        Get store counters.
+
+        Returns:
+            dict: Number of users and of cached User objects
+        """
+        return {'users': len(self.table), 'cached': len(self._users)}
@@ -0,0 +1,268 @@
+"""
+Packed, read-only verse store opened with mmap.
+
+The store is a single file that every process maps read-only, so several
+web workers on one host share the same page-cache copy of the text instead
+of each holding its own dict of strings.
+
+File layout (little-endian):
+    header   magic b'BSVS', format version, verse count, reserved (4 x u32)
+    ids      count x u32, sorted packed verse IDs (see bible_data.make_verse_id)
+    offsets  (count + 1) x u32, byte offsets of each verse in the text blob
+    blob     UTF-8 verse text, concatenated
+
+Build a store with:
+    python verse_store.py <source.json> [output.bin]
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+from bible_data import ALL_BOOKS, BOOK_NUMBERS, make_verse_id
+
+DATA_DIR = os.environ.get('BIBLE_STUDY_DATA_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+STORE_FILE = os.path.join(DATA_DIR, 'verses.bin')
+
+MAGIC = b'BSVS'
+VERSION = 1
+HEADER = struct.Struct('<4sIII')
+
+
+class VerseStore:
+    """Read-only view of a packed verse store file."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, _ = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"Not a verse store: {path}")
+
+        ids_start = HEADER.size
+        offsets_start = ids_start + count * 4
+        self._blob_start = offsets_start + (count + 1) * 4
+
+        view = memoryview(self._mmap)
+        if sys.byteorder == 'little':
+            # Zero-copy views straight onto the mapped pages
+            self._ids = view[ids_start:offsets_start].cast('I')
+            self._offsets = view[offsets_start:self._blob_start].cast('I')
+        else:
+            self._ids = array('I', view[ids_start:offsets_start])
+            self._ids.byteswap()
+            self._offsets = array('I', view[offsets_start:self._blob_start])
+            self._offsets.byteswap()
+        self.path = path
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, verse_id):
+        return self._find(verse_id) is not None
+
+    def _find(self, verse_id):
+        index = bisect_left(self._ids, verse_id)
+        if index < len(self._ids) and self._ids[index] == verse_id:
+            return index
+        return None
+
+    def _text(self, lo, hi):
+        start = self._blob_start + self._offsets[lo]
+        end = self._blob_start + self._offsets[hi]
+        return self._mmap[start:end].decode('utf-8')
+
+    def get(self, verse_id):
+        """
+        Get the text of a single verse.
+
+        Args:
+            verse_id (int): Packed verse ID
+
+        Returns:
+            str: The verse text, or None if the verse is not stored
+        """
+        index = self._find(verse_id)
+        if index is None:
+            return None
+        return self._text(index, index + 1)
+
+    def get_range(self, start_id, end_id):
+        """
+        Get the texts of a contiguous verse range.
+
+        Args:
+            start_id (int): First packed verse ID
+            end_id (int): Last packed verse ID (inclusive)
+
+        Returns:
+            list: Verse texts in order, or None if any verse is missing
+        """
+        lo = bisect_left(self._ids, start_id)
+        hi = bisect_right(self._ids, end_id)
+        # IDs inside one chapter are consecutive, so a gap means a missing verse
+        if hi - lo != end_id - start_id + 1:
+            return None
+        return [self._text(i, i + 1) for i in range(lo, hi)]
+
+    def get_passage(self, book, chapter, verse_start, verse_end=None):
+        """
+        Get a verse or verse range as one string.
+
+        Args:
+            book (str): Bible book name
+            chapter (int): Chapter number
+            verse_start (int): Starting verse number
+            verse_end (int, optional): Ending verse number
+
+        Returns:
+            str: The passage text, or None if it is not fully stored
+        """
+        start_id = make_verse_id(book, chapter, verse_start)
+        if start_id is None:
+            return None
+        if not verse_end or verse_end == verse_start:
+            return self.get(start_id)
+        if verse_end < verse_start:
+            return None
+
+        verses = self.get_range(start_id, start_id + verse_end - verse_start)
+        if verses is None:
+            return None
+        return " ".join(verses)
+
+    def items(self):
+        """Iterate over (verse_id, text) pairs in canonical order."""
+        for index in range(len(self._ids)):
+            yield self._ids[index], self._text(index, index + 1)
+
+    def close(self):
+        """Release the memory map."""
+        for table in (self._ids, self._offsets):
+            if isinstance(table, memoryview):
+                table.release()
+        self._mmap.close()
+
+
+def open_store(path=STORE_FILE):
+    """
+    Open a verse store if one has been built.
+
+    Args:
+        path (str): Path to the store file
+
+    Returns:
+        VerseStore: The opened store, or None if it is missing or invalid
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        return VerseStore(path)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Error opening verse store: {str(e)}")
+        return None
+
+
+def build_store(verses, path=STORE_FILE):
+    """
+    Write a packed verse store.
+
+    Args:
+        verses (iterable): (verse_id, text) pairs in any order
+        path (str): Output path; replaced atomically
+
+    Returns:
+        int: Number of verses written
+
+    Raises:
+        ValueError: If a verse ID is None (make_verse_id rejected the verse)
+    """
+    entries = dict(verses)
+    if None in entries:
+        raise ValueError("verse IDs must be valid; filter out verses make_verse_id rejects")
+    entries = sorted(entries.items())
+
+    ids = array('I', (verse_id for verse_id, _ in entries))
+    offsets = array('I', [0])
+    blob = bytearray()
+    for _, text in entries:
+        blob += text.encode('utf-8')
+        offsets.append(len(blob))
+
+    if sys.byteorder != 'little':
+        ids.byteswap()
+        offsets.byteswap()
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(entries), 0))
+        f.write(ids.tobytes())
+        f.write(offsets.tobytes())
+        f.write(blob)
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+def iter_source(data):
+    """
+    Yield (verse_id, text) pairs from a parsed JSON source.
+
+    Verses that are not in the canon's verse counts (see bible_data) are
+    skipped with a warning rather than packed into a colliding ID.
+
+    Two shapes are accepted:
+        {"约翰福音": {"3": {"16": "..."}}}   nested by book name
+        {"books": [{"nr": 43, "chapters": [{"chapter": 3,
+            "verses": [{"verse": 16, "text": "..."}]}]}]}
+                                            a getbible.net v2 translation
+
+    Args:
+        data (dict): Parsed JSON source
+    """
+    for book, chapter, verse, text in _source_rows(data):
+        verse_id = make_verse_id(book, chapter, verse)
+        if verse_id is None:
+            print(f"Skipping {book} {chapter}:{verse}: not a verse in the canon")
+            continue
+        yield verse_id, text.strip()
+
+
+def _source_rows(data):
+    """Yield (book, chapter, verse, text) from either source shape."""
+    if 'books' in data:
+        for book_data in data['books']:
+            book_nr = int(book_data['nr'])
+            if not 1 <= book_nr <= len(ALL_BOOKS):
+                continue
+            book = ALL_BOOKS[book_nr - 1]
+            for chapter_data in book_data['chapters']:
+                chapter = int(chapter_data['chapter'])
+                for verse_data in chapter_data['verses']:
+                    yield book, chapter, int(verse_data['verse']), verse_data['text']
+        return
+
+    for book, chapters in data.items():
+        if book not in BOOK_NUMBERS:
+            continue
+        for chapter, verses in chapters.items():
+            for verse, text in verses.items():
+                yield book, int(chapter), int(verse), text
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python verse_store.py <source.json> [output.bin]")
+        sys.exit(1)
+
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        source = json.load(f)
+    output = sys.argv[2] if len(sys.argv) > 2 else STORE_FILE
+    count = build_store(iter_source(source), output)
+    print(f"Wrote {count} verses to {output}")
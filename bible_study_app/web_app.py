@@ -4,20 +4,65 @@ This provides a web interface for viewing daily Bible reading and memorization.
 """
 
 import os
-import json
 import datetime
+import math
 import secrets
-from flask import Flask, render_template, request, redirect, url_for, jsonify, flash, session
-from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+import threading
+import time
+from flask import (
+    Flask, render_template, request, redirect, url_for, jsonify, flash, session, abort,
+    make_response, Response, stream_with_context, g
+)
+from flask_login import LoginManager, login_user, logout_user, login_required, current_user
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import generate_password_hash
 
-from bible_data import format_reference, ALL_BOOKS, get_book_chapters
-from bible_api import get_verse
-from study_plan import StudyPlan
+from bible_data import format_reference, split_verse_id, ALL_BOOKS, get_book_chapters
+from bible_api import search_verses, warm_search_index
+from bible_reference import InvalidReference, format_verse_range, parse_reference
+from daily_content import DailyContent
+from events import ChangeSignal, format_comment, format_event
+from metrics import CONTENT_TYPE, register_process_metrics, registry
+from page_cache import PageCache
+from password_hasher import PASSWORD_HASH_METHOD, HasherBusyError, PasswordHasher
+from plan_generator import apply_schedule
+from rate_limit import RateLimiter
+from storage import check_scope
+from study_plan import PlanRegistry, StalePlanError
+from user_store import UserStore
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'bible-study-app-secret-key')
 
+# Reverse proxies in front of the app (e.g. 1 for nginx); their X-Forwarded-For
+# then gives request.remote_addr, which the login limiter is keyed on
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES)
+
+# Request latency and counts per route, exposed at /metrics
+register_process_metrics(registry)
+request_seconds = registry.histogram(
+    'http_request_duration_seconds', 'Time to build a response', ('method', 'route')
+)
+request_count = registry.counter(
+    'http_requests_total', 'Responses sent', ('method', 'route', 'status')
+)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        # The route pattern rather than the path keeps the number of series bounded
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_seconds.labels(request.method, route).observe(time.perf_counter() - started)
+        request_count.labels(request.method, route, str(response.status_code)).inc()
+    return response
+
 # 添加用户登录管理
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -25,62 +70,24 @@ login_manager.login_view = 'login'
 login_manager.login_message = '请先登录以访问此页面'
 
 # 数据目录
-DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DATA_DIR = os.environ.get('BIBLE_STUDY_DATA_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
 os.makedirs(DATA_DIR, exist_ok=True)
+# Used by the json storage backend
 USERS_FILE = os.path.join(DATA_DIR, 'users.json')
 
-# 用户类
-class User(UserMixin):
-    def __init__(self, id, username, password_hash, is_admin=False):
-        self.id = id
-        self.username = username
-        self.password_hash = password_hash
-        self.is_admin = is_admin
-
-# 用户存储
-users = {}
-# 初始管理员用户（如果用户文件不存在）
-default_admin = {
-    '1': {
-        'username': 'admin',
-        'password_hash': generate_password_hash('admin'),
-        'is_admin': True
-    }
-}
-
-# 加载用户
-def load_users():
-    global users
-    if os.path.exists(USERS_FILE):
-        try:
-            with open(USERS_FILE, 'r', encoding='utf-8') as f:
-                users = json.load(f)
-        except:
-            users = default_admin
-    else:
-        users = default_admin
-        save_users()
-
-# 保存用户
-def save_users():
-    with open(USERS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(users, f, ensure_ascii=False, indent=2)
-
-# 加载用户
-load_users()
+# 用户存储（按用户名建索引，缓存 User 对象）
+users = UserStore()
+# 没有任何用户时创建默认管理员
+try:
+    if len(users) == 0:
+        users.create('admin', generate_password_hash('admin', PASSWORD_HASH_METHOD), is_admin=True)
+except Exception as e:
+    print(f"Error loading users: {str(e)}")
 
 # 用户加载回调
 @login_manager.user_loader
 def load_user(user_id):
-    if user_id in users:
-        user_data = users[user_id]
-        return User(
-            id=user_id,
-            username=user_data['username'],
-            password_hash=user_data['password_hash'],
-            is_admin=user_data.get('is_admin', False)
-        )
-    return None
+    return users.get(user_id)
 
 # 管理员权限装饰器
 def admin_required(func):
@@ -92,14 +99,59 @@ def admin_required(func):
     wrapper.__name__ = func.__name__
     return wrapper
 
-# Initialize the study plan
-study_plan = StudyPlan()
+# Live study plans, one per user or group, loaded on first use
+plan_registry = PlanRegistry(autosave=os.environ.get('PLAN_AUTOSAVE', '1') != '0')
+
+def get_plan_scope():
+    """Scope of the plan this request works on; admins may pick one with ?plan=."""
+    if not current_user.is_authenticated:
+        return None
+    if current_user.is_admin and request.values.get('plan'):
+        return request.values.get('plan')
+    return current_user.plan
+
+def current_plan():
+    """The study plan for the current user or the group they belong to."""
+    try:
+        return plan_registry.get(get_plan_scope())
+    except ValueError:
+        abort(400)
+
+# Another worker saved the plan first; the change was not applied
+@app.errorhandler(StalePlanError)
+def handle_stale_plan(e):
+    return jsonify({
+        'success': False,
+        'message': str(e)
+    }), 409
 
 # Add current year to all templates
 @app.context_processor
 def inject_now():
     return {'now': datetime.datetime.now()}
 
+# Password hashing runs in a small process pool, off the request threads
+password_hasher = PasswordHasher()
+
+# Login attempts allowed per client IP and per username (per minute, and at once)
+login_ip_limiter = RateLimiter(
+    rate=float(os.environ.get('LOGIN_RATE_PER_IP', 20)) / 60,
+    burst=int(os.environ.get('LOGIN_BURST_PER_IP', 10))
+)
+login_user_limiter = RateLimiter(
+    rate=float(os.environ.get('LOGIN_RATE_PER_USER', 5)) / 60,
+    burst=int(os.environ.get('LOGIN_BURST_PER_USER', 5))
+)
+
+def rehash_password(user, password):
+    """Re-hash a correct password whose stored hash uses older parameters."""
+    try:
+        if password_hasher.needs_rehash(user.password_hash):
+            users.update(user.id, password_hash=password_hasher.hash(password))
+    except Exception as e:
+        # The old hash still works; try again at the next login
+        print(f"Error rehashing password: {str(e)}")
+
 # 登录页面
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -111,19 +163,26 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
         
-        user_id = None
-        for uid, user_data in users.items():
-            if user_data['username'] == username:
-                user_id = uid
-                break
+        # Throttle before any hashing happens
+        ip = request.remote_addr
+        if not (login_ip_limiter.allow(ip) and login_user_limiter.allow(username)):
+            retry_after = max(login_ip_limiter.retry_after(ip), login_user_limiter.retry_after(username))
+            flash('登录尝试过于频繁，请稍后再试', 'danger')
+            return render_template('login.html'), 429, {'Retry-After': str(math.ceil(retry_after))}
+        
+        user = users.find_by_username(username)
+        try:
+            if user is None:
+                valid = password_hasher.verify_unknown(password)
+            else:
+                valid = password_hasher.verify(user.password_hash, password)
+        except HasherBusyError:
+            flash('服务器繁忙，请稍后再试', 'danger')
+            return render_template('login.html'), 503
                 
-        if user_id and check_password_hash(users[user_id]['password_hash'], password):
-            user = User(
-                id=user_id,
-                username=users[user_id]['username'],
-                password_hash=users[user_id]['password_hash'],
-                is_admin=users[user_id].get('is_admin', False)
-            )
+        if valid:
+            login_user_limiter.reset(username)
+            rehash_password(user, password)
             login_user(user)
             next_page = request.args.get('next')
             if next_page:
@@ -156,101 +215,133 @@ def register():
         username = request.form.get('username')
         password = request.form.get('password')
         is_admin = 'is_admin' in request.form
+        plan = request.form.get('plan', '').strip() or None
         
-        # 检查用户名是否已存在
-        for user_data in users.values():
-            if user_data['username'] == username:
-                flash('用户名已存在', 'danger')
+        if plan:
+            try:
+                check_scope(plan)
+            except ValueError:
+                flash('学习计划名称只能包含字母、数字、汉字、下划线和连字符', 'danger')
                 return render_template('register.html')
+        
+        # 检查用户名是否已存在
+        if users.find_by_username(username):
+            flash('用户名已存在', 'danger')
+            return render_template('register.html')
                 
         # 创建新用户
-        user_id = str(len(users) + 1)
-        users[user_id] = {
-            'username': username,
-            'password_hash': generate_password_hash(password),
-            'is_admin': is_admin
-        }
-        save_users()
+        try:
+            users.create(username, password_hasher.hash(password), is_admin, plan)
+        except HasherBusyError:
+            flash('服务器繁忙，请稍后再试', 'danger')
+            return render_template('register.html'), 503
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return render_template('register.html')
         
         flash(f'用户 {username} 已成功创建', 'success')
         return redirect(url_for('index'))
         
     return render_template('register.html')
 
-@app.route('/')
-def index():
-    """Render the main page with daily Bible content."""
-    # Get current time and day of year
-    current_time = datetime.datetime.now()
-    day_of_year = current_time.timetuple().tm_yday
-    
-    # Format date and time
-    date_str = current_time.strftime("%Y年%m月%d日")
-    time_str = current_time.strftime("%H:%M:%S")
-    
-    # Get reading passages
-    reading_passages = study_plan.get_daily_reading_passages()
-    
-    # Get memorization verse for today
-    verse_dict = study_plan.get_daily_memorization_verses()
-    mem_ref = ""
-    mem_text = ""
-    has_custom_text = False
-    verse_index = -1
+# Daily view models shared by every page render in this worker
+daily_content = DailyContent(ttl=float(os.environ.get('PAGE_CACHE_TTL', 600)))
+
+# Rendered index pages. The key covers everything the page depends on, and
+# pages with verse text that failed to load are not cached at all
+index_cache = PageCache(
+    max_entries=int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', 1000)),
+    ttl=float(os.environ.get('PAGE_CACHE_TTL', 600))
+)
+
+# Seconds before midnight at which the next day's page is pre-rendered
+PRERENDER_LEAD = float(os.environ.get('PRERENDER_LEAD', 60))
+
+def index_cache_key(study_plan, date):
+    """
+    Everything the index page depends on: day, plan, role and user (shown in the nav).
     
-    if verse_dict:
-        try:
-            book = verse_dict['book']
-            chapter = verse_dict['chapter']
-            verse_start = verse_dict['verse_start']
-            verse_end = verse_dict['verse_end']
-            
-            if verse_end:
-                mem_ref = f"{book} {chapter}:{verse_start}-{verse_end}"
-            else:
-                mem_ref = f"{book} {chapter}:{verse_start}"
-            
-            # Check if we have custom text first
-            custom_text = verse_dict.get('custom_text', '')
-            if custom_text:
-                mem_text = custom_text
-                has_custom_text = True
-            else:
-                # Try to get verse text from API or cache
-                mem_text = get_verse(book, chapter, verse_start, verse_end)
-            
-            # Get verse index for editing
-            all_verses = study_plan.get_all_memorization_verses()
-            for i, verse in enumerate(all_verses):
-                if (verse['book'] == book and 
-                    verse['chapter'] == chapter and 
-                    verse['verse_start'] == verse_start and 
-                    verse['verse_end'] == verse_end):
-                    verse_index = i
-                    break
-                
-            # Ensure we have text content
-            if not mem_text:
-                mem_text = f"获取 {mem_ref} 内容时出现问题，请稍后再试。"
-        except Exception as e:
-            mem_ref = "读取经文时出现错误"
-            mem_text = f"应用程序出现问题：{str(e)}"
+    The plan is identified by its storage generation, which every worker sees
+    the same, so the key (and the ETag made from it) agrees across workers.
+    Changes not yet saved (PLAN_AUTOSAVE=0) only exist in this worker and
+    fall back to its revision.
+    """
+    if current_user.is_authenticated:
+        role = 'admin' if current_user.is_admin else 'user'
+        username = current_user.username
     else:
-        mem_ref = "未设置背诵经文"
-        mem_text = "请在设置页面添加经文进行背诵。"
-    
+        role = 'anonymous'
+        username = None
+    version = ('unsaved', study_plan.revision) if study_plan.dirty else study_plan.generation
+    return (date.isoformat(), study_plan.scope, version, role, username)
+
+def render_index(view):
+    """Render the main page for a day's view; the clock is filled in by the browser."""
     return render_template(
         'index.html',
-        date=date_str,
-        time=time_str,
-        day_of_year=day_of_year,
-        reading_passages=reading_passages,
-        mem_ref=mem_ref,
-        mem_text=mem_text,
-        has_custom_text=has_custom_text,
-        verse_index=verse_index
+        date=view.date_str,
+        day_of_year=view.day_of_year,
+        reading_passages=view.reading_passages,
+        mem_ref=view.mem_ref,
+        mem_text=view.mem_text if view.verse is not None else "请在设置页面添加经文进行背诵。",
+        has_custom_text=view.has_custom_text,
+        verse_index=view.verse_index
     )
 
+@app.route('/')
+def index():
+    """Render the main page with daily Bible content, from the page cache when possible."""
+    today = datetime.date.today()
+    study_plan = current_plan()
+    study_plan.refresh()
+    view = daily_content.get(study_plan, today)
+    
+    # Rendering consumes pending flash messages, so those pages are never cached;
+    # neither are pages showing an error in place of the verse text
+    if session.get('_flashes') or not view.complete:
+        return render_index(view)
+    
+    key = index_cache_key(study_plan, today)
+    page = index_cache.get_or_render(key, lambda: render_index(view))
+    
+    response = make_response(page.body)
+    response.set_etag(page.etag)
+    response.last_modified = page.last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
+def prerender_next_day():
+    """Render tomorrow's index page for anonymous visitors into the page cache."""
+    study_plan = plan_registry.get(None)
+    tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+    view = daily_content.get(study_plan, tomorrow)
+    if not view.complete:
+        return
+    with app.test_request_context('/'):
+        key = index_cache_key(study_plan, tomorrow)
+        index_cache.put(key, render_index(view))
+
+def _prerender_loop():
+    while True:
+        now = datetime.datetime.now()
+        midnight = datetime.datetime.combine(
+            now.date() + datetime.timedelta(days=1), datetime.time()
+        )
+        wait = (midnight - now).total_seconds() - PRERENDER_LEAD
+        if wait > 0:
+            time.sleep(wait)
+            try:
+                prerender_next_day()
+            except Exception as e:
+                print(f"Error pre-rendering index page: {str(e)}")
+        # Sleep past midnight before scheduling the next run
+        time.sleep(max(0, (midnight - datetime.datetime.now()).total_seconds()) + 1)
+
+def start_prerender():
+    """Pre-render the next day's index page shortly before each midnight."""
+    threading.Thread(target=_prerender_loop, name='index-prerender', daemon=True).start()
+
 @app.route('/settings')
 @login_required
 @admin_required
@@ -261,6 +352,7 @@ def settings():
     new_testament = ALL_BOOKS[39:]  # Rest are New Testament
     
     # Get current reading passages and memorization verses
+    study_plan = current_plan()
     reading_passages = study_plan.get_all_reading_passages()
     memorization_verses = study_plan.get_all_memorization_verses()
     
@@ -269,7 +361,11 @@ def settings():
         old_testament=old_testament,
         new_testament=new_testament,
         reading_passages=reading_passages,
-        memorization_verses=memorization_verses
+        memorization_verses=memorization_verses,
+        plan_scope=study_plan.scope,
+        schedule_days=len(study_plan.daily_schedule),
+        schedule_start=study_plan.schedule_start,
+        schedule_today=study_plan.get_schedule_day()
     )
 
 @app.route('/api/chapters/<book>')
@@ -279,6 +375,18 @@ def get_chapters(book):
     chapters = list(range(1, num_chapters + 1))
     return jsonify(chapters)
 
+@app.route('/api/search')
+def search():
+    """API endpoint to search verse text or look up a reference, e.g. /api/search?q=神爱世人 or ?q=约3:16"""
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    
+    results = search_verses(query, limit) if query else []
+    return jsonify({
+        'query': query,
+        'results': results
+    })
+
 @app.route('/api/add_reading', methods=['POST'])
 @login_required
 @admin_required
@@ -288,7 +396,7 @@ def add_reading():
     book = data.get('book')
     chapter = int(data.get('chapter'))
     
-    success = study_plan.add_reading_passage(book, chapter)
+    success = current_plan().add_reading_passage(book, chapter)
     
     return jsonify({
         'success': success,
@@ -300,39 +408,108 @@ def add_reading():
 @admin_required
 def remove_reading(index):
     """API endpoint to remove a reading passage. Requires admin privileges."""
-    success = study_plan.remove_reading_passage(index)
+    success = current_plan().remove_reading_passage(index)
     
     return jsonify({
         'success': success,
         'message': "已从阅读计划中删除所选章节" if success else "无法删除所选章节"
     })
 
+@app.route('/api/generate_plan', methods=['POST'])
+@login_required
+@admin_required
+def generate_plan():
+    """API endpoint to generate a balanced day-by-day reading schedule. Requires admin privileges."""
+    data = request.form
+    days = data.get('days', 365, type=int)
+    books = data.get('books', 'all')
+    weight = data.get('weight', 'verses')
+    start_date = data.get('start_date')
+    
+    try:
+        start_date = datetime.date.fromisoformat(start_date) if start_date else None
+        schedule = apply_schedule(current_plan(), days, books, weight, start_date)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': f"无法生成读经计划：{str(e)}"
+        })
+    
+    return jsonify({
+        'success': True,
+        'message': f"已生成 {len(schedule)} 天的读经计划"
+    })
+
+@app.route('/api/clear_schedule', methods=['POST'])
+@login_required
+@admin_required
+def clear_schedule():
+    """API endpoint to remove the generated reading schedule. Requires admin privileges."""
+    success = current_plan().clear_daily_schedule()
+    
+    return jsonify({
+        'success': success,
+        'message': "已取消读经计划" if success else "当前没有读经计划"
+    })
+
+def reference_to_verses(reference):
+    """
+    Parse a typed reference into the fields of a memorization verse.
+    
+    Args:
+        reference (str): e.g. "约3:16-18"
+        
+    Returns:
+        tuple: (book, chapter, verse_start, verse_end); verse_end is None for one verse
+        
+    Raises:
+        InvalidReference: If the text is not a single passage within one chapter
+    """
+    ranges = parse_reference(reference)
+    if len(ranges) != 1:
+        raise InvalidReference("一次只能添加一段经文")
+    start_id, end_id = ranges[0]
+    book, chapter, verse_start = split_verse_id(start_id)
+    end_book, end_chapter, verse_end = split_verse_id(end_id)
+    if (end_book, end_chapter) != (book, chapter):
+        raise InvalidReference(f"背诵经文不能跨章：{format_verse_range(start_id, end_id)}")
+    return book, chapter, verse_start, verse_end if verse_end != verse_start else None
+
 @app.route('/api/add_memorization', methods=['POST'])
 @login_required
 @admin_required
 def add_memorization():
     """API endpoint to add a memorization verse. Requires admin privileges."""
     data = request.form
-    book = data.get('book')
-    chapter = int(data.get('chapter'))
-    verse_start = int(data.get('verse_start'))
-    verse_end = data.get('verse_end')
+    reference = data.get('reference', '').strip()
     custom_text = data.get('custom_text', '')
     
-    # Convert verse_end to int if it exists
-    if verse_end and verse_end.strip():
-        verse_end = int(verse_end)
+    if reference:
+        # Typed reference such as "约3:16-18" instead of the book/chapter/verse fields
+        try:
+            book, chapter, verse_start, verse_end = reference_to_verses(reference)
+        except InvalidReference as e:
+            return jsonify({
+                'success': False,
+                'message': f"无法添加背诵经文：{str(e)}"
+            })
     else:
-        verse_end = None
+        book = data.get('book')
+        chapter = int(data.get('chapter'))
+        verse_start = int(data.get('verse_start'))
+        verse_end = data.get('verse_end')
+        
+        # Convert verse_end to int if it exists
+        if verse_end and verse_end.strip():
+            verse_end = int(verse_end)
+        else:
+            verse_end = None
     
-    success = study_plan.add_memorization_verse(book, chapter, verse_start, verse_end, custom_text)
+    success = current_plan().add_memorization_verse(book, chapter, verse_start, verse_end, custom_text)
     
     msg = ""
     if success:
-        if verse_end:
-            msg = f"已添加 {book} {chapter}:{verse_start}-{verse_end} 到背诵计划"
-        else:
-            msg = f"已添加 {book} {chapter}:{verse_start} 到背诵计划"
+        msg = f"已添加 {format_reference(book, chapter, verse_start, verse_end)} 到背诵计划"
     else:
         msg = "无法添加背诵经文，可能是无效章节或经节"
     
@@ -346,7 +523,7 @@ def add_memorization():
 @admin_required
 def remove_memorization(index):
     """API endpoint to remove a memorization verse. Requires admin privileges."""
-    success = study_plan.remove_memorization_verse(index)
+    success = current_plan().remove_memorization_verse(index)
     
     return jsonify({
         'success': success,
@@ -355,10 +532,102 @@ def remove_memorization(index):
 
 @app.route('/update_time')
 def update_time():
-    """API endpoint to get the current time."""
+    """API endpoint to get the current time, plus the clock sync the page uses without /events."""
     current_time = datetime.datetime.now()
     time_str = current_time.strftime("%H:%M:%S")
-    return jsonify({'time': time_str})
+    return jsonify(dict(time_sync(), time=time_str))
+
+# Event stream settings (seconds); each stream holds a worker thread, so streams
+# end after EVENTS_MAX_AGE and the browser reconnects
+EVENTS_ENABLED = os.environ.get('EVENTS_ENABLED', '1') != '0'
+EVENTS_HEARTBEAT = float(os.environ.get('EVENTS_HEARTBEAT', 15))
+EVENTS_POLL_INTERVAL = float(os.environ.get('EVENTS_POLL_INTERVAL', 5))
+EVENTS_MAX_AGE = float(os.environ.get('EVENTS_MAX_AGE', 60))
+EVENTS_RETRY_MS = int(os.environ.get('EVENTS_RETRY_MS', 3000))
+
+# Plan-changing endpoints; a successful call wakes every open event stream in this worker
+PLAN_ENDPOINTS = {
+    'add_reading', 'remove_reading', 'add_memorization', 'remove_memorization',
+    'update_verse_text', 'generate_plan', 'clear_schedule'
+}
+plan_changes = ChangeSignal()
+
+@app.after_request
+def notify_plan_change(response):
+    if request.endpoint in PLAN_ENDPOINTS and response.status_code == 200:
+        plan_changes.notify()
+    return response
+
+def time_sync():
+    """Server clock for clients: epoch milliseconds plus the local UTC offset."""
+    now = datetime.datetime.now().astimezone()
+    return {
+        'now': int(now.timestamp() * 1000),
+        'utc_offset': int(now.utcoffset().total_seconds() // 60),
+        'date': now.date().isoformat()
+    }
+
+open_streams = registry.gauge('event_streams_open', 'Event streams currently open in this worker')
+
+def count_open_stream(stream):
+    """Keep event_streams_open up to date while an event stream is consumed."""
+    open_streams.inc()
+    try:
+        yield from stream
+    finally:
+        open_streams.dec()
+
+@app.route('/events')
+def events():
+    """Server-sent events: a time sync on connect, then day rollover and plan or verse changes."""
+    # Without event streams (e.g. serverless) 204 tells the browser not to reconnect
+    if not EVENTS_ENABLED:
+        return Response(status=204)
+    
+    study_plan = current_plan()
+    
+    def stream():
+        today = datetime.date.today()
+        revision = study_plan.revision
+        verse = dict(study_plan.get_daily_memorization_verses() or {})
+        seq = plan_changes.seq
+        started = last_sent = time.monotonic()
+        
+        yield f"retry: {EVENTS_RETRY_MS}\n\n"
+        yield format_event('time', time_sync())
+        
+        while time.monotonic() - started < EVENTS_MAX_AGE:
+            # Wake for local changes, polls for other workers' changes, or just after midnight
+            now = datetime.datetime.now()
+            midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+            timeout = min(EVENTS_POLL_INTERVAL, (midnight - now).total_seconds() + 0.5)
+            seq = plan_changes.wait(seq, timeout)
+            
+            if datetime.date.today() != today:
+                today = datetime.date.today()
+                revision = study_plan.revision
+                verse = dict(study_plan.get_daily_memorization_verses() or {})
+                last_sent = time.monotonic()
+                yield format_event('day', time_sync())
+                continue
+            
+            study_plan.refresh()
+            if study_plan.revision != revision:
+                revision = study_plan.revision
+                new_verse = dict(study_plan.get_daily_memorization_verses() or {})
+                event = 'verse' if new_verse != verse else 'plan'
+                verse = new_verse
+                last_sent = time.monotonic()
+                yield format_event(event, {'revision': revision})
+            elif time.monotonic() - last_sent >= EVENTS_HEARTBEAT:
+                last_sent = time.monotonic()
+                yield format_comment('ping')
+    
+    return Response(
+        stream_with_context(count_open_stream(stream())),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/api/update_verse_text', methods=['POST'])
 @login_required
@@ -369,22 +638,82 @@ def update_verse_text():
     index = int(data.get('index'))
     custom_text = data.get('custom_text', '')
     
-    success = study_plan.update_verse_text(index, custom_text)
+    success = current_plan().update_verse_text(index, custom_text)
     
     return jsonify({
         'success': success,
         'message': "已更新经文内容" if success else "无法更新经文内容"
     })
 
-def create_app():
-    """Create and configure the Flask app."""
+# Worker state, read when /metrics is scraped
+registry.gauge('study_plans_loaded', 'Study plans held in memory', function=lambda: len(plan_registry))
+registry.counter('study_plan_write_back_failures_total', 'Unsaved plan changes that could not be written back',
+                 function=lambda: plan_registry.write_back_failures)
+registry.gauge('users_cached', 'User objects held in memory', function=lambda: users.stats()['cached'])
+registry.counter('page_cache_requests_total', 'Rendered page lookups by result', ('result',),
+                 function=lambda: {('hit',): index_cache.stats()['hits'], ('miss',): index_cache.stats()['misses']})
+registry.gauge('page_cache_entries', 'Rendered pages held in memory',
+               function=lambda: len(index_cache))
+registry.counter('login_throttled_total', 'Login attempts refused by the rate limiter', ('key',),
+                 function=lambda: {('ip',): login_ip_limiter.rejected, ('user',): login_user_limiter.rejected})
+registry.counter('password_hash_rejected_total', 'Password hashes refused because the pool was full',
+                 function=lambda: password_hasher.rejected)
+
+# Optional bearer token required to read /metrics
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+@app.route('/metrics')
+def metrics():
+    """Metrics of this worker in the Prometheus text format."""
+    if METRICS_TOKEN and not secrets.compare_digest(
+        request.headers.get('Authorization', ''), f"Bearer {METRICS_TOKEN}"
+    ):
+        abort(401)
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+# Background work in create_app(): password hashing processes, search index,
+# next-day pre-render and today's verse. Off unless asked for, so serverless
+# functions and the debug reloader's watcher process do not start threads
+BACKGROUND_TASKS = os.environ.get('BACKGROUND_TASKS', '0') != '0'
+
+def create_app(background=None):
+    """
+    Create and configure the Flask app.
+    
+    Args:
+        background (bool, optional): Start the background work; defaults to
+            the BACKGROUND_TASKS setting
+    """
     # Create template and static directories if they don't exist
     os.makedirs(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates'), exist_ok=True)
     os.makedirs(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'), exist_ok=True)
     
+    if background is None:
+        background = BACKGROUND_TASKS
+    if not background:
+        return app
+    
+    # Fork the password hashing processes before the background threads start
+    try:
+        password_hasher.start()
+    except Exception as e:
+        print(f"Error starting password hashing: {str(e)}")
+    
+    # Build the verse search index in the background so the first search is fast
+    warm_search_index()
+    
+    # Have tomorrow's page ready before the first visitor after midnight
+    start_prerender()
+    
+    # Fetch today's memorization verse before the first request needs it
+    if os.environ.get('DAILY_CONTENT_WARM', '1') != '0':
+        daily_content.warm(plan_registry.get(None))
+    
     return app
 
 if __name__ == '__main__':
-    create_app()
+    # With debug=True the reloader runs this file twice; only the process serving requests
+    # (WERKZEUG_RUN_MAIN) starts the background work
+    create_app(background=BACKGROUND_TASKS and os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
     # 在生产环境中，应该使用 app.run(debug=False, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
-    app.run(debug=True, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))